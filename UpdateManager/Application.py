@@ -51,12 +51,14 @@ from UpdateManager.Exceptions import LoadingFailedException
 from UpdateManager.Exceptions import InvalidBaseClass
 from UpdateManager.Frontend import FrontendBase
 from UpdateManager.Frontend.loader import FrontendLoader
-from UpdateManager.DistSpecific import DistBase
+from UpdateManager.DistSpecific import DistBase, UPDATE_CATEGORY
 from UpdateManager.DistSpecific.loader import DistLoader
 from UpdateManager.DistSpecific.Auto import AutoDist
+from UpdateManager.Util.enum import Enum
 from UpdateManager.Util.loader import LoaderException
 from UpdateManager.Util.loader import InvalidImplementationName
 from UpdateManager.Util.opts import OptParser, make_option
+from UpdateManager.Util.startup import StartupScheduler
 
 LOG = logging.getLogger('UpdateManager.Application')
 
@@ -66,6 +68,27 @@ DEFAULT_BACKEND = 'PythonApt'
 DEFAULT_DIST_SPECIFIC = 'Auto'
 """ Default distribution specific module name """
 
+CHECK_STATUS_CODES = Enum('NO_UPDATES', 'UPDATES_AVAILABLE',
+                          'SECURITY_UPDATES_AVAILABLE', 'CHECK_FAILED')
+""" Exit status codes of the update summary (--summary).
+
+The values follow the monitoring plugin convention of OK, WARNING,
+CRITICAL and UNKNOWN.
+
+.. versionadded:: 0.200.6
+"""
+
+CHECK_CATEGORIES = (('security', UPDATE_CATEGORY.SECURITY),
+                    ('recommended', UPDATE_CATEGORY.RECOMMENDED),
+                    ('distribution', UPDATE_CATEGORY.DEFAULT),
+                    ('proposed', UPDATE_CATEGORY.PROPOSED),
+                    ('backports', UPDATE_CATEGORY.BACKPORT),
+                    ('third-party', UPDATE_CATEGORY.THIRDPARTY))
+""" Keys and update categories printed by the update summary, in order.
+
+.. versionadded:: 0.200.6
+"""
+
 class Application(object):
     """
     update-manager application.
@@ -107,20 +130,17 @@ class Application(object):
         self._app_name = app_name
         self._locale_dir = locale_dir
         self._app_args = app_args
-        self._config = UpdateManagerConfig()
+        self._startup = StartupScheduler()
+        self._startup_reported = False
+        self._config = self._startup.run('config', UpdateManagerConfig)
 
         gettext.bindtextdomain(app_name, locale_dir)
         gettext.textdomain(app_name)
         
         # We need to initialize the BugHandler as early as possile.
-        BugHandler.initialize(self)
+        self._startup.run('bughandler', BugHandler.initialize, self)
                 
 
-        # We need to load all modules before building the option list
-        self._load_frontend(frontend)
-        self._load_backend(backend)
-        self._load_dist_specific(dist_specific)
-                                                          
         option_list = [
             make_option("-l", "--log-level",
                         dest = "loglevel", default="fatal", type="choice",
@@ -132,12 +152,45 @@ class Application(object):
             make_option("-c", "--check",
                         action="store_true", dest="run_check",
                         default=False,
-                        help = _("starts an update check"))
+                        help = _("starts an update check")),
+            make_option("--summary",
+                        action="store_true", dest="summary",
+                        default=False,
+                        help = _("prints the number of available updates "
+                                 "and exits")),
+            make_option("--startup-trace",
+                        action="store_true", dest="startup_trace",
+                        default=False,
+                        help = _("prints a timeline of the startup phases")),
+            make_option("--prefetch",
+                        action="store_true", dest="prefetch",
+                        default=False,
+                        help = _("downloads the selected updates in the "
+                                 "background"))
             ]
 
         option_parser = OptParser(option_list = option_list, prog = app_name)
         self._options = None
         self._handle_options(option_parser)
+
+        # Distribution detection and backend discovery do not depend on
+        # the frontend, so they run while the frontend is being loaded.
+        self._startup.start('dist-detection', self._load_dist_specific,
+                            dist_specific)
+        self._startup.start('backend-discovery', self._load_backend, backend)
+        if self.get_option('summary'):
+            # The update summary neither needs a frontend nor root
+            # privileges.
+            self._frontend = None
+            self._frontend_privileged = False
+        else:
+            self._startup.run('frontend-discovery', self._load_frontend,
+                              frontend)
+        self._startup.wait('backend-discovery')
+        self._startup.wait('dist-detection')
+
+        if self._frontend is None:
+            return
         
         # Frontend gettext initialization
         self._frontend.init_gettext(app_name, locale_dir)
@@ -299,10 +352,81 @@ class Application(object):
         except Exception, ex:
             self._frontend.handle_exception(ex)
 
+    def create_commit_plan(self, selected_updates):
+        """ Wrapper around the backend's create_commit_plan method.
+
+        :param selected_updates: List of updates that were selected for upgrade
+        :returns: :class:`UpdateManager.Backend.CommitPlan` object or None
+
+        .. versionadded:: 0.200.6
+        """
+        try:
+            return self._backend.create_commit_plan(selected_updates)
+        except Exception, ex:
+            self._frontend.handle_exception(ex)
+
+    def reset_selection_preview(self, selection):
+        """ Wrapper around the backend's reset_selection_preview method.
+
+        :param selection: List of (package, selected) tuples.
+        :returns: :class:`UpdateManager.Backend.DownloadPreview` object or
+          None
+
+        .. versionadded:: 0.200.6
+        """
+        try:
+            return self._backend.reset_selection_preview(selection)
+        except Exception, ex:
+            self._frontend.handle_exception(ex)
+
+    def update_selection_preview(self, changes):
+        """ Wrapper around the backend's update_selection_preview method.
+
+        :param changes: List of (package, selected) tuples.
+        :returns: :class:`UpdateManager.Backend.DownloadPreview` object or
+          None
+
+        .. versionadded:: 0.200.6
+        """
+        try:
+            return self._backend.update_selection_preview(changes)
+        except Exception, ex:
+            self._frontend.handle_exception(ex)
+
+    def is_prefetch_enabled(self):
+        """ Returns whether selected updates are to be downloaded in the
+        background, as set by the --prefetch switch or the prefetch option
+        in the defaults section of the configuration.
+
+        .. versionadded:: 0.200.6
+        """
+        return bool(self.get_option('prefetch')) \
+               or self._config.getboolean('defaults', 'prefetch',
+                                          default=False)
+
+    def prefetch(self, selected_updates, progress_handler=None):
+        """ Wrapper around the backend's prefetch method.
+
+        :param selected_updates: List of updates that were selected for upgrade
+        :param progress_handler:
+          :class:`UpdateManager.Backend.CommitProgressHandler` object or None
+
+        .. versionadded:: 0.200.6
+        """
+        if not self._frontend_privileged:
+            LOG.fatal('Frontend did not request privileged operation, but '+
+                      ' prefetch was called.')
+            return False
+        try:
+            return self._backend.prefetch(selected_updates, progress_handler)
+        except Exception, ex:
+            self._frontend.handle_exception(ex)
+
     def commit(self, selected_updates, writefd=None):
         """ Wrapper around the backend's commit method.
 
-        :param selected_updates: List of updates that were selected for upgrade
+        :param selected_updates: List of updates that were selected for
+          upgrade, or a :class:`UpdateManager.Backend.CommitPlan` object
         :param writefd: FD package manager messages get written to,
           may be None.
         """
@@ -344,6 +468,31 @@ class Application(object):
         except Exception, ex:
             self._frontend.handle_exception(ex)
 
+    def get_cached_updates(self, dist_upgrade=True):
+        """ Wrapper around the backend's get_cached_updates method.
+
+        :param dist_upgrade: Defines whether to do a dist upgrade or not.
+        :returns: A :class:`UpdateManager.Backend.PackageInfoStoreBase`
+          object or None.
+
+        .. versionadded:: 0.200.6
+        """
+        try:
+            return self._backend.get_cached_updates(
+                dist_upgrade=dist_upgrade)
+        except Exception, ex:
+            self._frontend.handle_exception(ex)
+
+    def save_update_snapshot(self):
+        """ Wrapper around the backend's save_update_snapshot method.
+
+        .. versionadded:: 0.200.6
+        """
+        try:
+            return self._backend.save_update_snapshot()
+        except Exception, ex:
+            self._frontend.handle_exception(ex)
+
     ### END: Backend wrappers
 
     ### BEGIN: DistSpecific wrappers
@@ -388,8 +537,35 @@ class Application(object):
     ### BEGIN: Frontend wrappers
 
     def uses_privileged_functions(self):
+        if self._frontend is None:
+            # Update summary (--summary) without a frontend.
+            return False
         return self._frontend.uses_privileged_functions()
 
+    def first_window_shown(self):
+        """
+        Called by the frontend once its first window has been drawn.
+
+        Marks the end of the startup and reports the startup timeline.
+        Only the first call has an effect.
+
+        .. versionadded:: 0.200.6
+        """
+        if self._startup_reported:
+            return
+        self._startup.mark('first-window')
+        self._report_startup()
+
+    def _report_startup(self):
+        """ Logs the startup timeline and prints it if requested by the
+        --startup-trace option.
+        """
+        self._startup_reported = True
+        timeline = self._startup.format_timeline()
+        LOG.debug(timeline)
+        if self.get_option('startup_trace'):
+            print >> sys.stderr, timeline
+
     ## END: Frontend wrappers
 
     def get_option(self, option_name):
@@ -410,18 +586,63 @@ class Application(object):
         """
         setattr(self._options, option_name, value)
                                                                     
+    def run_summary(self):
+        """
+        Prints the non-interactive update summary.
+
+        Prints the number of updates per update category, the number of
+        removals and the download size to stdout. Neither a frontend nor
+        the package manager lock are used.
+
+        :returns: A :data:`CHECK_STATUS_CODES` value.
+
+        .. versionadded:: 0.200.6
+        """
+        try:
+            summary = self._backend.get_update_summary(dist_upgrade=True)
+        except Exception, ex:
+            LOG.exception('Update check failed.')
+            print >> sys.stderr, 'Update check failed: %s' % (ex)
+            return CHECK_STATUS_CODES.CHECK_FAILED
+
+        LOG.debug('Update check result: %r', summary)
+        for key, cat_id in CHECK_CATEGORIES:
+            print '%s: %d' % (key, summary.get_category_count(cat_id))
+        print 'removals: %d' % (summary.get_removal_count())
+        print 'download-bytes: %d' % (summary.get_download_size())
+
+        if summary.get_category_count(UPDATE_CATEGORY.SECURITY):
+            return CHECK_STATUS_CODES.SECURITY_UPDATES_AVAILABLE
+        elif summary.get_update_count() or summary.get_removal_count():
+            return CHECK_STATUS_CODES.UPDATES_AVAILABLE
+        return CHECK_STATUS_CODES.NO_UPDATES
+
     def main(self):
         """
         Initializes the frontend, reloads the package cache and
         runs the frontend's main loop.
+
+        .. versionchanged:: 0.200.6
+          Prints the update summary instead if the --summary option was
+          given.
         """
         self._backend.init_backend(self)
+        if self.get_option('summary'):
+            raise ExitProgramException(self.run_summary())
+
         if self._frontend_privileged:
             self._backend.acquire_lock()
-        self._frontend.init_frontend()
+
+        # The package cache is opened while the frontend builds its user
+        # interface.
+        self._startup.start('cache-open', self._backend.preload_cache)
+        self._startup.run('frontend-init', self._frontend.init_frontend)
         
         self.reload_cache()
         res = self._frontend.main(self)
+        if not self._startup_reported:
+            # The frontend never reported its first window.
+            self._report_startup()
         if self._frontend_privileged:
             self._backend.release_lock()
         if type(res) != int:
@@ -24,6 +24,8 @@
 
 import logging
 import os
+import threading
+import time
 import urllib2
 import weakref
 
@@ -36,6 +38,11 @@ import apt_pkg
 from UpdateManager.Backend import PackageInfoBase, PackageInfoStoreBase
 from UpdateManager.Backend import BackendBase, DEP_RELATION
 from UpdateManager.Backend import PackageDependencyBase
+from UpdateManager.Backend import EMPTY_RELATION_VIEW, OriginInfo, StoreDiff
+from UpdateManager.Backend import CommitPlan, DownloadPreview, UpdateSummary
+from UpdateManager.Backend import CommitProgressHandler
+from UpdateManager.Backend.snapshot import get_cache_key, load_snapshot
+from UpdateManager.Backend.snapshot import save_snapshot
 from UpdateManager.BugHandler import Thread
 from UpdateManager.Util.enum import Enum
 
@@ -61,10 +68,21 @@ def _translate_relation(rel_string):
 class PackageInfoStore(PackageInfoStoreBase):
     """
     Implementation of :class:`UpdateManager.Backend.PackageInfoStoreBase`.
+
+    :param cache: :class:`apt.Cache` object
+    :param conflicts_cache: Dictionary parsed conflicts are cached in,
+      shared by the stores of one cache state.
     """
-    def __init__(self, cache, *args, **kwargs):
+    def __init__(self, cache, conflicts_cache=None, *args, **kwargs):
         PackageInfoStoreBase.__init__(self, *args, **kwargs)
         self._cache = cache
+        if conflicts_cache is None:
+            conflicts_cache = {}
+        self._conflicts_cache = conflicts_cache
+
+    def _create_dependency(self, name, relation, version):
+        """ Creates a :class:`PackageDependency` object. """
+        return PackageDependency(self._cache, name, relation, version)
 
 class PackageDependency(PackageDependencyBase):
     """
@@ -82,24 +100,241 @@ class PackageDependency(PackageDependencyBase):
                 else:
                     self._inst_version_matches = True
 
+CONFLICT_TYPES = ('Conflicts', 'Breaks')
+""" Dependency types handled as conflicts """
+
+def _get_conflicts(pyapt_package, conflicts_cache):
+    """ Helper function that returns the conflicts of a package's candidate.
+
+    The parsed dependency data of the candidate is used, so the package
+    record does not need to be loaded. Results are cached per package
+    name and candidate version.
+
+    :param pyapt_package: :class:`apt.package.Package` object
+    :param conflicts_cache: Dictionary the parsed conflicts are cached in.
+    :returns: A tuple of (name, relation, version) tuples, with relation
+      being one of :data:`UpdateManager.Backend.DEP_RELATION` or None.
+    """
+    candidate = pyapt_package.candidate
+    key = (pyapt_package.name, candidate.version)
+    conflicts = conflicts_cache.get(key)
+    if conflicts is not None:
+        return conflicts
+
+    conflicts = []
+    if hasattr(candidate, 'get_dependencies'):
+        for dep_info in candidate.get_dependencies(*CONFLICT_TYPES):
+            for dep in dep_info.or_dependencies:
+                conflicts.append((dep.name, _translate_relation(dep.relation),
+                                  dep.version or None))
+    else:
+        # Older python-apt versions do not provide
+        # Version.get_dependencies(), so the apt_pkg data is used.
+        depends_list = candidate._cand.depends_list
+        for dep_type in CONFLICT_TYPES:
+            for or_deps in depends_list.get(dep_type, ()):
+                for dep in or_deps:
+                    conflicts.append((dep.target_pkg.name,
+                                      _translate_relation(dep.comp_type),
+                                      dep.target_ver or None))
+
+    conflicts = tuple(conflicts)
+    conflicts_cache[key] = conflicts
+    return conflicts
+
+ARCHIVE_DIR = '/var/cache/apt/archives/'
+""" Directory downloaded package archives are stored in """
+
+_RECORDS_LOCK = threading.RLock()
+""" Serializes the package record lookups of :class:`PackageInfo` objects,
+which share the cache's record parser between threads.
+"""
+
+class ArchiveSnapshot(object):
+    """ Snapshot of the package archive directory and its partial/
+    subdirectory.
+
+    The directories are listed once and kept until their modification time
+    changes, turning download size calculations into dictionary lookups.
+    Modification times are checked at most once every
+    :attr:`CHECK_INTERVAL` seconds.
+
+    .. note:: Growing partial files do not change the directory's
+      modification time, so :meth:`invalidate` should be called after
+      downloading packages.
+    """
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        self._archive_dir = archive_dir
+        self._partial_dir = os.path.join(archive_dir, 'partial')
+        self._lock = threading.Lock()
+        self._mtimes = None
+        self._last_check = 0
+        self._complete = {}
+        self._partial = {}
+
+    @staticmethod
+    def _get_mtime(path):
+        """ Returns the modification time of path or None. """
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def _refresh(self):
+        """ Re-lists the directories if they have changed. """
+        now = time.time()
+        if self._mtimes is not None \
+               and now - self._last_check < self.CHECK_INTERVAL:
+            return
+
+        self._lock.acquire()
+        try:
+            self._last_check = now
+            mtimes = (self._get_mtime(self._archive_dir),
+                      self._get_mtime(self._partial_dir))
+            if mtimes == self._mtimes:
+                return
+
+            complete = {}
+            partial = {}
+            try:
+                for name in os.listdir(self._archive_dir):
+                    if name.endswith('.deb'):
+                        complete[name] = True
+            except OSError, e:
+                LOG.debug('Could not list %s: %s', self._archive_dir, e)
+            try:
+                for name in os.listdir(self._partial_dir):
+                    if not name.endswith('.deb'):
+                        continue
+                    try:
+                        path = os.path.join(self._partial_dir, name)
+                        partial[name] = os.stat(path).st_size
+                    except OSError:
+                        pass
+            except OSError, e:
+                LOG.debug('Could not list %s: %s', self._partial_dir, e)
+
+            self._complete = complete
+            self._partial = partial
+            self._mtimes = mtimes
+            LOG.debug('Archive snapshot updated (%d complete, %d partial).',
+                      len(complete), len(partial))
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        """ Forces the directories to be listed again on the next lookup. """
+        self._mtimes = None
+
+    def get_download_size(self, filename, size):
+        """ Returns the number of bytes that still need to be downloaded.
+
+        :param filename: The package archive's file name.
+        :param size: The package archive's full size in bytes.
+        """
+        self._refresh()
+        if filename in self._complete:
+            # File has been fully fetched.
+            return 0
+        part_size = self._partial.get(filename)
+        if part_size is not None:
+            # File has been partially fetched...
+            return size - part_size
+        return size
+
+ARCHIVE_SNAPSHOT = ArchiveSnapshot()
+""" :class:`ArchiveSnapshot` shared by all :class:`PackageInfo` objects """
+
+def _get_deb_filename(pkg):
+    """ Returns the file name of a package's candidate archive.
+
+    :param pkg: :class:`apt.package.Package` object
+    """
+    candidate = pkg.candidate
+    return '%s_%s_%s.deb' % (pkg.name,
+                             urllib2.quote(candidate.version).lower(),
+                             candidate.architecture)
+
+_UNRESOLVED = object()
+""" Marker for a not yet resolved candidate origin """
+
+RELATION = Enum('DEPENDS', 'RDEPENDS', 'SDEPENDS', 'RSDEPENDS', 'CONFLICTS',
+                'UNINST_DEPENDS')
+""" Relation kinds stored by :class:`PackageInfo` """
+
 class PackageInfo(PackageInfoBase):
     """
     Implementation of :class:`UpdateManager.Backend.PackageInfoBase`.
+
+    Relations are stored in the
+    :class:`UpdateManager.Backend.DependencyGraph` of the store, the
+    relation getters return views on it. The result of resolving the
+    dependencies is kept, so objects reused by an incremental refresh
+    only need to be resolved again if a package they refer to changed.
     """
+    __slots__ = ('_pyapt_package', '_app', '_graph', '_node_id', '_origin',
+                 '_update_category', '_broken', '_deb_filename',
+                 '_resolution', '_summary', '_source_name', '_candidate_uri',
+                 '__weakref__',
+                 # Selection state, set by the frontends.
+                 'active')
+
     def __init__(self, package_obj, app):
         PackageInfoBase.__init__(self)
 
         self._pyapt_package = package_obj
         self._app = app
-        self._dependencies = []
-        self._rdependencies = []
-        self._sdependencies = []
-        self._rsdependencies = []
-        self._conflicts = []
-        self._uninst_dependencies = []
-        self._update_category = app.get_update_category(self)
+        self._graph = None
+        self._node_id = None
+        self._origin = _UNRESOLVED
         self._broken = False
-        self._download_size = None
+        self._deb_filename = None
+        self._resolution = None
+        # Read from the package record on first use.
+        self._summary = None
+        self._source_name = None
+        self._candidate_uri = None
+        self._update_category = app.get_update_category(self)
+
+    def _rebind(self, package_obj):
+        """ Makes a reused object refer to the package of a reopened cache.
+
+        :param package_obj: :class:`apt.package.Package` object with the
+          same installed and candidate versions.
+        """
+        self._pyapt_package = package_obj
+        self._origin = _UNRESOLVED
+        self._update_category = self._app.get_update_category(self)
+
+    def _invalidate_resolution(self, package_names):
+        """ Drops the kept resolution if it refers to one of the given
+        packages.
+
+        :param package_names: A set of package names.
+        """
+        if self._resolution is None:
+            return
+        for name in self._resolution[2]:
+            if name in package_names:
+                self._resolution = None
+                return
+
+    def _set_graph_node(self, graph, node_id):
+        """ Sets the dependency graph the package is part of. """
+        self._graph = graph
+        self._node_id = node_id
+
+    def _get_relation(self, kind):
+        """ Returns a read-only view on the related packages of a kind.
+
+        :param kind: One of :data:`RELATION`
+        """
+        if self._graph is None:
+            return EMPTY_RELATION_VIEW
+        return self._graph.get_view(kind, self._node_id)
 
     def is_broken(self):
         """ Returns whether the package is broken or not """
@@ -127,28 +362,11 @@ class PackageInfo(PackageInfoBase):
 
     def get_download_size(self):
         """ Returns the download size in bytes """
-        quoted_version = urllib2.quote(self._pyapt_package.candidate.version)
-        filename = '%s_%s_%s.deb' \
-                   % (self._pyapt_package.name,
-                      quoted_version.lower(),
-                      self._pyapt_package.candidate.architecture)
-
-        archive_path = os.path.join('/var/cache/apt/archives/', filename)
-        partial_path = os.path.join('/var/cache/apt/archives/partial/',
-                                    filename)
-        if os.path.exists(archive_path):
-            # File has been fully fetched, return 0
-            return 0
-        elif os.path.exists(partial_path):
-            # File has been partially fetched...
-            try:
-                stat_info = os.stat(partial_path)
-                part_size = stat_info[os.path.stat.ST_SIZE]
-                return self._pyapt_package.candidate.size - part_size
-            except:
-                pass
-            
-        return self._pyapt_package.candidate.size
+        candidate = self._pyapt_package.candidate
+        if self._deb_filename is None:
+            self._deb_filename = _get_deb_filename(self._pyapt_package)
+        return ARCHIVE_SNAPSHOT.get_download_size(self._deb_filename,
+                                                  candidate.size)
 
     def get_update_category(self):
         """ Returns the update category """
@@ -156,126 +374,189 @@ class PackageInfo(PackageInfoBase):
 
     def get_summary(self):
         """ Returns the package summary (short description) """
-        return self._pyapt_package.candidate.summary
+        if self._summary is None:
+            _RECORDS_LOCK.acquire()
+            try:
+                self._summary = self._pyapt_package.candidate.summary
+            finally:
+                _RECORDS_LOCK.release()
+        return self._summary
 
-    def _get_nonlocal_origin(self):
-        """ Helper function that returns the first non-local origin """
-        for origin in self._pyapt_package.candidate.origins:
-            if origin.archive != 'now':
-                return origin
-        return None
+    def get_candidate_origin(self):
+        """ Returns the interned record of the first non-local origin.
+
+        The origin is resolved only once per package.
+        """
+        if self._origin is _UNRESOLVED:
+            self._origin = None
+            for origin in self._pyapt_package.candidate.origins:
+                if origin.archive != 'now':
+                    self._origin = OriginInfo.intern(origin.archive,
+                                                     origin.label,
+                                                     origin.origin,
+                                                     origin.component,
+                                                     origin.site,
+                                                     origin.trusted)
+                    break
+        return self._origin
 
     def get_candidate_archive_name(self):
         """ Returns the archive name """
-        origin = self._get_nonlocal_origin()
+        origin = self.get_candidate_origin()
         if not origin:
             return None
         return origin.archive
 
     def get_candidate_origin_label(self):
         """ Returns the origin label """
-        origin = self._get_nonlocal_origin()
+        origin = self.get_candidate_origin()
         if not origin:
             return None
         return origin.label
 
     def get_candidate_origin_name(self):
         """ Returns the origin name """
-        origin = self._get_nonlocal_origin()
+        origin = self.get_candidate_origin()
         if not origin:
             return None
         return origin.origin
 
     def get_candidate_component_name(self):
         """ Returns the component name """
-        origin = self._get_nonlocal_origin()
+        origin = self.get_candidate_origin()
         if not origin:
             return None
         return origin.component
 
     def candidate_origin_is_trusted(self):
         """ Returns true if the origin is trusted """
-        origin = self._get_nonlocal_origin()
+        origin = self.get_candidate_origin()
         if not origin:
             return False
         return origin.trusted
 
     def get_description(self):
         """ Returns the package description """
-        return self._pyapt_package.candidate.description
+        _RECORDS_LOCK.acquire()
+        try:
+            return self._pyapt_package.candidate.description
+        finally:
+            _RECORDS_LOCK.release()
 
     def get_source_package_name(self):
         """ Returns the source package name """
-        return self._pyapt_package.candidate.source_name
+        if self._source_name is None:
+            _RECORDS_LOCK.acquire()
+            try:
+                self._source_name = self._pyapt_package.candidate.source_name
+            finally:
+                _RECORDS_LOCK.release()
+        return self._source_name
 
     def get_candidate_uri(self):
         """ Returns the candidate uri """
-        return self._pyapt_package.candidate.uri
+        if self._candidate_uri is None:
+            _RECORDS_LOCK.acquire()
+            try:
+                self._candidate_uri = self._pyapt_package.candidate.uri
+            finally:
+                _RECORDS_LOCK.release()
+        return self._candidate_uri
+
+    def get_candidate_architecture(self):
+        """ Returns the candidate's architecture """
+        if self._pyapt_package.candidate:
+            return self._pyapt_package.candidate.architecture
+        return None
 
     def get_dependencies(self):
         """ Returns the list of dependencies """
-        return self._dependencies[:]
+        return self._get_relation(RELATION.DEPENDS)
 
     def get_strict_dependencies(self):
         """ Returns the list of strict dependencies (packages with an exact
         version this candidate depends on).
         """
-        return self._sdependencies[:]
+        return self._get_relation(RELATION.SDEPENDS)
 
     def get_uninstalled_dependencies(self):
         """ Returns a list of dependencies that are not installed. """
-        return self._uninst_dependencies[:]
+        return self._get_relation(RELATION.UNINST_DEPENDS)
 
     def get_reverse_dependencies(self):
         """ Returns list of reverse dependencies (packages that depend on this
         package).
         """
-        return self._rdependencies[:]
+        return self._get_relation(RELATION.RDEPENDS)
 
     def get_strict_reverse_dependencies(self):
         """ Returns list of strict reverse dependencies (packages that depend
         on the candidate version of this package).
         """
-        return self._rsdependencies[:]
+        return self._get_relation(RELATION.RSDEPENDS)
 
     def get_conflicts(self):
         """ Returns list of conflicting packages """
-        return self._conflicts[:]
+        return self._get_relation(RELATION.CONFLICTS)
 
     def _resolve_dependencies(self, pkginfo_store):
         """ Resolves the package's dependencies """
+        if self._resolution is None:
+            self._resolution = self._compute_resolution(pkginfo_store)
+        self._broken, edges, references = self._resolution
+
+        graph = self._graph
+        node_id = self._node_id
+        for kind, reverse_kind, name in edges:
+            target_id = graph.get_node_id(name)
+            if target_id is None:
+                # Installed packages without an upgrade are added to the
+                # graph once.
+                target_id = graph.add_node(
+                    PackageInfo(pkginfo_store._cache[name], self._app))
+            graph.add_edge(kind, node_id, target_id)
+            if reverse_kind is not None:
+                graph.add_edge(reverse_kind, target_id, node_id)
+
+    def _compute_resolution(self, pkginfo_store):
+        """ Checks the package's dependencies and conflicts.
+
+        :returns: A tuple of the broken state, a list of (kind, reverse
+          kind, package name) relations and a tuple of the names of all
+          packages checked.
+        """
+        broken = False
+        edges = []
+        references = []
+
         # Dependencies go first
         for dep_info in self._pyapt_package.candidate.dependencies:
-            relations = []
-            for dep in dep_info.or_dependencies:
-                rel = _translate_relation(dep.relation)
-
-                pkg_dep = PackageDependency(pkginfo_store._cache,
-                                            dep.name, rel, dep.version)
-                relations.append(pkg_dep)
-
             fulfilled_by_one = False
             # Multiple dependencies are handled as either-or ones, so
             # only one must be fulfilled.
-            for pkg_dep in relations:
+            for dep in dep_info.or_dependencies:
+                rel = _translate_relation(dep.relation)
+                references.append(dep.name)
+                pkg_dep, inst_matches, cand_matches = \
+                         pkginfo_store.check_dependency(dep.name, rel,
+                                                        dep.version)
+
                 # Check if the already installed version fulfills our
                 # dependency
-                if pkg_dep.fulfilled_by_installed_version():
+                if inst_matches:
                     fulfilled_by_one = True
                     # TODO: strict handling?
                     break
                 
                 # Check if there is a candidate for an upgrade
                 # that fulfills our dependency
-                elif pkg_dep.fulfilled_by_candidate_version(pkginfo_store):
-                    candidate = pkginfo_store.get_package(pkg_dep._name)
-
+                elif cand_matches:
                     if pkg_dep.is_strict():
-                        self._sdependencies.append(candidate)
-                        candidate._rsdependencies.append(weakref.proxy(self))
+                        edges.append((RELATION.SDEPENDS, RELATION.RSDEPENDS,
+                                      dep.name))
                     else:
-                        self._dependencies.append(candidate)
-                        candidate._rdependencies.append(weakref.proxy(self))
+                        edges.append((RELATION.DEPENDS, RELATION.RDEPENDS,
+                                      dep.name))
                     
                     fulfilled_by_one = True
                     break
@@ -286,68 +567,45 @@ class PackageInfo(PackageInfoBase):
             if not fulfilled_by_one:
                 LOG.warning('%s is broken (%s unfulfilled)', self,
                             dep)
-                self._broken = True
-
-        # Next step: check conflicts
-        # The method below is a workaround, accessing the record
-        # directly, because python-apt does not include support for
-        # accessing a package's conflicts record.
-        pyapt_record = self._pyapt_package.candidate.record
-        if 'Conflicts' in pyapt_record:
-            conflicts = pyapt_record['Conflicts'].split(',')
-            for co in conflicts:
-
-                co = co.strip() # Remove leading & trailing whitespace
-                
-                # No version requirement
-                if not '(' in co:
-                    name = co
-                    rel = None
-                    version = None
-                else:
-                    beginpos = co.find('(') + 1
-                    endpos = co.find(')')
-                    name = co[:beginpos-1].strip()
-                    info = co[beginpos:endpos].strip()
-                    try:
-                        rel_str, version = info.split(' ', 1)
-                        rel = _translate_relation(rel_str)
-                    except IndexError:
-                        rel = None
-                        version = info
-
-                pkg_dep = PackageDependency(pkginfo_store._cache,
-                                                name, rel, version)
-                # Now we have our conflict in a PackageDependency object.
-                # Reversing our dependency logic here should work just
-                # fine.
-
-                if name == self._pyapt_package.name:
-                    LOG.debug('%s conflicts with itself (%s)',
-                              name, pkg_dep)
-                    continue
+                broken = True
+
+        # Next step: check conflicts and breaks, which are both handled
+        # as conflicts.
+        for name, rel, version in _get_conflicts(
+            self._pyapt_package, pkginfo_store._conflicts_cache):
+            references.append(name)
+            pkg_dep, inst_matches, cand_matches = \
+                     pkginfo_store.check_dependency(name, rel, version)
+            # Now we have our conflict in a PackageDependency object.
+            # Reversing our dependency logic here should work just
+            # fine.
+
+            if name == self._pyapt_package.name:
+                LOG.debug('%s conflicts with itself (%s)',
+                          name, pkg_dep)
+                continue
+
+            conflict = (RELATION.CONFLICTS, None, name)
+            if conflict in edges:
+                # Check needed for multi-version conflicts
+                continue
                 
-                if pkg_dep.fulfilled_by_candidate_version(pkginfo_store):
-                    # Conflicts with a candidate
-                    pkg_info = pkginfo_store.get_package(pkg_dep._name)
-                    if not pkg_info in self._conflicts:
-                        self._conflicts.append(pkg_info)
-                else:
-                    # Check if the package is installed at all.
-                    if name in pkginfo_store._cache:
-                        c_pkg = pkginfo_store._cache[name]
-
-                        if c_pkg.is_installed:
-                            inst_version = c_pkg.installed.version
-                            if pkg_dep._cmp_helper(inst_version):
-                                # The package is installed and matches
-                                # the Conflict record: append to our
-                                # conflicts list
-                                pkg_info = PackageInfo(c_pkg, self._app)
-
-                                # Check needed for multi-version conflicts
-                                if not pkg_info in self._conflicts:
-                                    self._conflicts.append(pkg_info)
+            if cand_matches:
+                # Conflicts with a candidate
+                edges.append(conflict)
+            else:
+                # Check if the package is installed at all.
+                if name in pkginfo_store._cache:
+                    c_pkg = pkginfo_store._cache[name]
+                    if c_pkg.is_installed:
+                        inst_version = c_pkg.installed.version
+                        if pkg_dep._cmp_helper(inst_version):
+                            # The package is installed and matches
+                            # the Conflict record: append to our
+                            # conflicts list.
+                            edges.append(conflict)
+
+        return broken, edges, tuple(references)
 
 # Cache progress helper class
 class CacheProgressHelper(apt.progress.base.OpProgress):
@@ -424,8 +682,9 @@ class ListProgressHelper(apt.progress.base.AcquireProgress):
                 self._handler.list_item_update(worker.current_item.uri,
                                                worker.total_size,
                                                worker.current_size)
-                self._handler.list_update(self.current_cps, self.eta,
-                                          self._percent)
+            # Overall progress is reported once per pulse, not per worker.
+            self._handler.list_update(self.current_cps, self.eta,
+                                      self._percent)
         else:
             self._handler.list_aborted()
         return not self._abort
@@ -473,9 +732,19 @@ class ListProgressHelper(apt.progress.base.AcquireProgress):
 
 
 class DownloadProgressHelper(apt.progress.base.AcquireProgress):
-    """ Download progress helper """
-    def __init__(self, handler):
+    """ Download progress helper
+
+    :param handler: :class:`UpdateManager.Backend.CommitProgressHandler`
+      object
+    :param install_follows: Whether the installation begins once the
+      download has finished. False for prefetching.
+
+    .. versionchanged:: 0.200.6
+       Added the `install_follows` parameter.
+    """
+    def __init__(self, handler, install_follows=True):
         self._handler = handler
+        self._install_follows = install_follows
         self._abort = False
         self.eta = 0
         self.currentCPS = 0
@@ -510,8 +779,8 @@ class DownloadProgressHelper(apt.progress.base.AcquireProgress):
                 self._handler.download_item_update(worker.current_item.uri,
                                                    worker.total_size,
                                                    worker.current_size)
-                self._handler.download_update(self.current_cps, self.eta,
-                                              self._percent)
+            self._handler.download_update(self.current_cps, self.eta,
+                                          self._percent)
         return not self._abort
 
     def fail(self, item):
@@ -546,7 +815,34 @@ class DownloadProgressHelper(apt.progress.base.AcquireProgress):
         """
         if not self._abort:
             self._handler.download_finished()
-            self._handler.install_begin()
+            if self._install_follows:
+                self._handler.install_begin()
+
+class _QuietDownloadHandler(CommitProgressHandler):
+    """ Download handler of prefetches nobody watches. """
+    def download_begin(self, download_size, package_count, download_count):
+        pass
+
+    def download_update(self, download_speed, eta_seconds, percent):
+        pass
+
+    def download_finished(self):
+        pass
+
+    def download_aborted(self):
+        pass
+
+    def download_failed(self, failure_message):
+        pass
+
+    def download_item_begin(self, uri, item_size, downloaded_size):
+        pass
+
+    def download_item_update(self, uri, item_size, downloaded_size):
+        pass
+
+    def download_item_finished(self, uri):
+        pass
 
 class InstallProgressHelper(apt.progress.base.InstallProgress):
     """ Install progress helper """
@@ -595,6 +891,36 @@ class PythonAptBackend(BackendBase):
         BackendBase.__init__(self, requires_root=True)
         self._cache = None
         self._available_updates = None
+        # Safe-upgrade (False) and dist-upgrade (True) plans, computed
+        # together and valid until the cache is reloaded.
+        self._update_plans = None
+        self._previous_plans = None
+        self._available_plan = None
+        self._marked_plan = None
+        # Commit plan the cache is currently marked for.
+        self._commit_plan = None
+        # Shadow depcache the selection preview is marked in and the
+        # bytes of selected updates already found in the archive
+        # directory, by package name.
+        self._preview_depcache = None
+        self._preview_saved = {}
+        self._preview_saved_size = 0
+        # Parsed conflicts by package name and candidate version, valid
+        # until the cache is reopened.
+        self._conflicts_cache = {}
+        # Running prefetch as (thread, progress helper, selected names).
+        self._prefetch_lock = threading.Lock()
+        self._prefetch = None
+        # Cache state the plans were computed for, plans loaded from the
+        # snapshot of the previous run and whether the current plans still
+        # need to be saved.
+        self._cache_key = None
+        self._snapshot_plans = None
+        self._snapshot_pending = False
+        # Cache opened by preload_cache() and not yet used by
+        # reload_cache().
+        self._preload_lock = threading.Lock()
+        self._cache_preloaded = False
         self._fetch_operation = None
         self._operation_in_progress = False
         self._application = application
@@ -663,6 +989,21 @@ class PythonAptBackend(BackendBase):
                 return True
             return False
 
+    def preload_cache(self):
+        """
+        Opens the package cache ahead of :meth:`reload_cache`.
+
+        .. versionadded:: 0.200.6
+        """
+        self._preload_lock.acquire()
+        try:
+            if self._cache is None:
+                self._cache = apt.Cache()
+                self._cache_key = get_cache_key()
+                self._cache_preloaded = True
+        finally:
+            self._preload_lock.release()
+
     def reload_cache(self, cache_progress_handler):
         """
         Reloads the package cache.
@@ -674,17 +1015,36 @@ class PythonAptBackend(BackendBase):
         progress_helper = CacheProgressHelper(cache_progress_handler)
 
         def thread_helper():
+            self.cancel_prefetch()
             if not self.is_locked(by_us=True):
                 self.acquire_lock()
 
             self._available_updates = None
+            self._commit_plan = None
+            self._preview_depcache = None
+            self._conflicts_cache = {}
+            if self._update_plans is not None:
+                # Kept for an incremental refresh of the plans.
+                self._previous_plans = self._update_plans
+                self._update_plans = None
+            ARCHIVE_SNAPSHOT.invalidate()
             cache_progress_handler.cache_begin()
-            if not self._cache:
-                # Cache has not been opened before. 
-                self._cache = apt.Cache(progress_helper)
-            else:
-                # Reloading the cache.
-                self._cache.open(progress_helper)
+            # Waits for preload_cache() if it is still opening the cache.
+            self._preload_lock.acquire()
+            try:
+                if self._cache_preloaded:
+                    # Freshly opened by preload_cache().
+                    self._cache_preloaded = False
+                elif not self._cache:
+                    # Cache has not been opened before. 
+                    self._cache = apt.Cache(progress_helper)
+                    self._cache_key = get_cache_key()
+                else:
+                    # Reloading the cache.
+                    self._cache.open(progress_helper)
+                    self._cache_key = get_cache_key()
+            finally:
+                self._preload_lock.release()
 
             self._operation_in_progress = False
             cache_progress_handler.cache_finished()
@@ -704,6 +1064,7 @@ class PythonAptBackend(BackendBase):
         self._fetch_operation = progress_helper
 
         def thread_helper():
+            self.cancel_prefetch()
             if self.is_locked(by_us=True):
                 self.release_lock()
                 
@@ -737,6 +1098,74 @@ class PythonAptBackend(BackendBase):
         Thread(target = thread_helper, name = "PythonAptList").start()
         return True
 
+    def _build_update_plan(self, dist_upgrade, previous=None):
+        """ Marks the cache for an upgrade and builds a store of the
+        changes.
+
+        If a previous store is given, its :class:`PackageInfo` objects are
+        reused for packages with unchanged versions and only packages
+        referring to changed packages are resolved again. The differences
+        are available from the new store's
+        :meth:`UpdateManager.Backend.PackageInfoStoreBase.get_diff` method.
+
+        :param dist_upgrade: Defines whether to do a dist upgrade or not.
+        :param previous: :class:`PackageInfoStore` object of the same plan
+          built from the previously opened cache.
+        :returns: :class:`PackageInfoStore` object
+        """
+        # We need to reset the cache first.
+        self._cache.clear()
+        self._cache.upgrade(dist_upgrade=dist_upgrade)
+        self._marked_plan = dist_upgrade
+        self._commit_plan = None
+
+        old_packages = {}
+        if previous is not None:
+            for pkgs in previous.get_packages().values():
+                old_packages.update(pkgs)
+        added = []
+        changed = []
+        reused = []
+
+        store = PackageInfoStore(self._cache, self._conflicts_cache)
+        for pkg in self._cache.get_changes():
+            if pkg.marked_upgrade or pkg.marked_install or pkg.marked_downgrade:
+                old = old_packages.pop(pkg.name, None)
+                if old is None:
+                    pkg_info = PackageInfo(pkg, self._app)
+                    added.append(pkg_info)
+                elif old.get_candidate_version() == pkg.candidate.version \
+                         and old.get_installed_version() \
+                         == (pkg.installed and pkg.installed.version):
+                    old._rebind(pkg)
+                    pkg_info = old
+                    reused.append(pkg_info)
+                else:
+                    pkg_info = PackageInfo(pkg, self._app)
+                    changed.append((old, pkg_info))
+                store.add_package(pkg_info)
+            elif pkg.marked_delete:
+                pkg_info = PackageInfo(pkg, self._app)
+                store.add_removal(pkg_info)
+            elif pkg.marked_reinstall:
+                LOG.debug('Package %s marked as "reinstall": TODO', pkg)
+
+        if previous is not None:
+            removed = old_packages.values()
+            changed_names = set()
+            for pkg_info in added + removed:
+                changed_names.add(pkg_info.get_package_name())
+            for old, pkg_info in changed:
+                changed_names.add(pkg_info.get_package_name())
+            for pkg_info in reused:
+                pkg_info._invalidate_resolution(changed_names)
+            store._diff = StoreDiff(added, removed, changed)
+            LOG.debug('Refreshed update plan (dist_upgrade=%s): %s, '
+                      '%d reused.', dist_upgrade, store._diff, len(reused))
+            
+        store.resolve_dependencies()
+        return store
+
     def get_available_updates(self, dist_upgrade=True):
         """
         Returns a list containing
@@ -747,32 +1176,110 @@ class PythonAptBackend(BackendBase):
 
         .. versionchanged: 0.200.0~exp1
           Added the `dist_upgrade` parameter.
+
+        .. versionchanged:: 0.200.6
+          The safe-upgrade and dist-upgrade plans are computed together
+          and cached until the cache is reloaded, so switching between
+          them does not recompute anything. After a cache reload the
+          plans are refreshed incrementally, see
+          :meth:`UpdateManager.Backend.PackageInfoStoreBase.get_diff`.
         """
         if self._operation_in_progress:
             return PackageInfoStore(self._cache)
         elif not self._cache:
             return PackageInfoStore(self._cache)
 
-        # We need to reset the cache first.
-        self._cache.clear()
-        self._available_updates = PackageInfoStore(self._cache)
-        self._cache.upgrade(dist_upgrade=dist_upgrade)
-        for pkg in self._cache.get_changes():
-            if pkg.marked_upgrade or pkg.marked_install or pkg.marked_downgrade:
-                pkg_info = PackageInfo(pkg, self._app)
-                self._available_updates.add_package(pkg_info)
-            elif pkg.marked_delete:
-                pkg_info = PackageInfo(pkg, self._app)
-                self._available_updates.add_removal(pkg_info)
-            elif pkg.marked_reinstall:
-                LOG.debug('Package %s marked as "reinstall": TODO', pkg)
-            
-        self._available_updates.resolve_dependencies()
+        dist_upgrade = bool(dist_upgrade)
+        if self._update_plans is None:
+            previous_plans = self._previous_plans
+            self._previous_plans = None
+            self._update_plans = {}
+            for plan in (False, True):
+                previous = None
+                if previous_plans is not None:
+                    previous = previous_plans[plan]
+                self._update_plans[plan] = self._build_update_plan(plan,
+                                                                   previous)
+            # The snapshot of the previous run is outdated now. The new
+            # one is written by save_update_snapshot(), once the updates
+            # are shown.
+            self._snapshot_plans = {}
+            self._snapshot_pending = self._app.uses_privileged_functions()
+
+        self._available_plan = dist_upgrade
+        self._available_updates = self._update_plans[dist_upgrade]
         if not self.is_locked():
             self.acquire_lock()
             
         return self._available_updates
 
+    def get_update_summary(self, dist_upgrade=True):
+        """
+        Counts the available updates.
+
+        Opens the package cache if it has not been opened yet, without
+        taking the package manager lock. Packages are only classified by
+        their update category, no :class:`PackageInfoStore` is built and
+        no dependencies are resolved.
+
+        :param dist_upgrade: Defines whether to do a dist upgrade or not.
+        :returns: :class:`UpdateManager.Backend.UpdateSummary` object
+
+        .. versionadded:: 0.200.6
+        """
+        cache = self._cache
+        if cache is None:
+            cache = apt.Cache()
+        else:
+            self._marked_plan = bool(dist_upgrade)
+            self._commit_plan = None
+        cache.clear()
+        cache.upgrade(dist_upgrade=dist_upgrade)
+
+        category_counts = {}
+        removal_count = 0
+        for pkg in cache.get_changes():
+            if pkg.marked_upgrade or pkg.marked_install or pkg.marked_downgrade:
+                cat_id = PackageInfo(pkg, self._app).get_update_category()
+                category_counts[cat_id] = category_counts.get(cat_id, 0) + 1
+            elif pkg.marked_delete:
+                removal_count += 1
+        return UpdateSummary(category_counts, removal_count,
+                             cache.required_download)
+
+    def get_cached_updates(self, dist_upgrade=True):
+        """ Returns the updates found by the previous run if the package
+        cache has not changed since.
+
+        The snapshot is only read once.
+
+        :param dist_upgrade: Defines whether to return the dist upgrade
+          plan or the safe upgrade plan.
+        :returns: :class:`UpdateManager.Backend.snapshot.SnapshotStore`
+          object or None.
+        """
+        if self._snapshot_plans is None:
+            self._snapshot_plans = load_snapshot(get_cache_key()) or {}
+        return self._snapshot_plans.get(int(bool(dist_upgrade)))
+
+    def save_update_snapshot(self):
+        """ Saves the current update plans for :meth:`get_cached_updates`
+        in a background thread.
+
+        :returns: True if a snapshot is being written.
+
+        .. versionadded:: 0.200.6
+        """
+        if not self._snapshot_pending or self._update_plans is None:
+            return False
+        self._snapshot_pending = False
+        plans = {0: self._update_plans[False], 1: self._update_plans[True]}
+        thread = Thread(target=save_snapshot, args=(plans, self._cache_key),
+                        name="PythonAptSnapshot")
+        thread.setDaemon(True)
+        thread.start()
+        return True
+
     def abort_operation(self):
         """ Aborts a fetch operation. """
         if self._fetch_operation:
@@ -780,14 +1287,343 @@ class PythonAptBackend(BackendBase):
             return True
         return False
 
+    def create_commit_plan(self, selected_updates):
+        """ Marks the cache for the selected updates and computes the
+        resulting changes.
+
+        The returned plan may be passed to :meth:`commit`, which then
+        does not mark the cache again unless it has been changed in the
+        meantime.
+
+        :param selected_updates: List of :class:`PackageInfo` objects
+        :returns: :class:`UpdateManager.Backend.CommitPlan` object, or None
+          if no updates are available or an operation is in progress.
+
+        .. versionadded:: 0.200.6
+        """
+        if self._operation_in_progress or self._available_updates is None:
+            return None
+        names = set()
+        for pkg_info in selected_updates:
+            names.add(pkg_info.get_package_name())
+        return self._mark_commit_plan(names)
+
+    def _mark_commit_plan(self, names):
+        """ Marks the cache for the named updates of the available update
+        plan and builds a :class:`UpdateManager.Backend.CommitPlan` object
+        of the resulting changes.
+
+        :param names: Set of selected package names.
+        """
+        if self._marked_plan is not self._available_plan:
+            # The cache is marked for the other plan or for a previous
+            # selection.
+            self._cache.clear()
+            self._cache.upgrade(dist_upgrade=self._available_plan)
+        self._marked_plan = None
+        self._commit_plan = None
+        depcache = self._cache._depcache
+
+        # The actiongroup should speed up the operations below...
+        known = {}
+        for pkgs in self._available_updates.get_packages().values():
+            known.update(pkgs)
+        ag = apt_pkg.ActionGroup(depcache)
+        for pkg_info in known.values():
+            pkg = pkg_info._pyapt_package
+            if pkg.name in names:
+                pkg.mark_install(auto_fix=False, auto_inst=False)
+            elif not pkg.marked_keep:
+                pkg.mark_keep()
+        ag.release()
+        del ag
+        for pkg_info in self._available_updates.get_removals():
+            known[pkg_info.get_package_name()] = pkg_info
+
+        error = None
+        if depcache.broken_count > 0:
+            # This should never happen, but we still handle it.
+            # If there are broken packages the commit would not finish
+            # successfully.
+            LOG.fatal('BrokenCount > 0 (%d)!', depcache.broken_count)
+            LOG.debug('Trying to fix broken upgrades...')
+            try:
+                depcache.fix_broken()
+                if depcache.broken_count > 0:
+                    LOG.debug('Packages still broken after fix attempt.')
+                    error = _("The selected updates can not be installed "
+                              "because of broken dependencies.")
+            except SystemError, s_err:
+                error = s_err.message
+
+        change_count = 0
+        download_count = 0
+        download_size = 0
+        installs = []
+        removals = []
+        for pkg in self._cache.get_changes():
+            if pkg.marked_install or pkg.marked_upgrade:
+                change_count += 1
+                pkg_size = ARCHIVE_SNAPSHOT.get_download_size(
+                    _get_deb_filename(pkg), pkg.candidate.size)
+                if pkg_size > 0:
+                    download_size += pkg_size
+                    download_count += 1
+                if not pkg.is_installed:
+                    installs.append(self._get_package_info(pkg, known))
+            if pkg.marked_delete:
+                removals.append(self._get_package_info(pkg, known))
+
+        plan = CommitPlan(names, change_count, download_count,
+                          download_size, installs, removals, error)
+        LOG.debug('Created %r.', plan)
+        self._commit_plan = plan
+        return plan
+
+    def _get_package_info(self, pkg, known):
+        """ Returns the :class:`PackageInfo` object of a package, reusing
+        one of the available update plan if possible.
+
+        :param pkg: :class:`apt.package.Package` object
+        :param known: Dictionary mapping names to :class:`PackageInfo`
+          objects.
+        """
+        pkg_info = known.get(pkg.name)
+        if pkg_info is None:
+            pkg_info = PackageInfo(pkg, self._application)
+            LOG.debug('New change on %s.', pkg_info)
+        return pkg_info
+
+    def _create_preview_depcache(self):
+        """ Creates the shadow depcache selection previews are marked in,
+        leaving the cache's own depcache untouched.
+        """
+        return apt_pkg.DepCache(self._cache._cache)
+
+    def reset_selection_preview(self, selection):
+        """ Starts previewing selections of the available updates.
+
+        A shadow depcache is marked for the available update plan, and
+        then for the given selection.
+
+        :param selection: List of (:class:`PackageInfo`, selected) tuples.
+        :returns: :class:`UpdateManager.Backend.DownloadPreview` object, or
+          None if no updates are available or an operation is in
+          progress.
+
+        .. versionadded:: 0.200.6
+        """
+        self._preview_depcache = None
+        self._preview_saved = {}
+        self._preview_saved_size = 0
+        if self._operation_in_progress or self._available_updates is None:
+            return None
+        depcache = self._create_preview_depcache()
+        depcache.upgrade(self._available_plan)
+        self._preview_depcache = depcache
+        return self.update_selection_preview(selection)
+
+    def update_selection_preview(self, changes):
+        """ Marks or keeps the changed packages in the shadow depcache.
+
+        The cost only depends on the number of changes, as apt keeps the
+        sizes of a depcache up to date while marking packages. Packages
+        are marked like :meth:`create_commit_plan` does.
+
+        :param changes: List of (:class:`PackageInfo`, selected) tuples.
+        :returns: :class:`UpdateManager.Backend.DownloadPreview` object, or
+          None if no preview has been started or an operation is in
+          progress.
+
+        .. versionadded:: 0.200.6
+        """
+        depcache = self._preview_depcache
+        if depcache is None or self._operation_in_progress:
+            return None
+
+        saved = self._preview_saved
+        ag = apt_pkg.ActionGroup(depcache)
+        for pkg_info, selected in changes:
+            pkg = pkg_info._pyapt_package
+            self._preview_saved_size -= saved.pop(pkg.name, 0)
+            if selected:
+                depcache.mark_install(pkg._pkg, False)
+                size = pkg.candidate.size
+                saved[pkg.name] = size - ARCHIVE_SNAPSHOT.get_download_size(
+                    _get_deb_filename(pkg), size)
+                self._preview_saved_size += saved[pkg.name]
+            else:
+                depcache.mark_keep(pkg._pkg)
+        ag.release()
+        del ag
+        # Archives already downloaded are not fetched again.
+        return DownloadPreview(depcache.deb_size - self._preview_saved_size,
+                               depcache.usr_size)
+
+    def prefetch(self, selected_updates, progress_handler=None):
+        """ Starts downloading the archives of the selected updates in the
+        background.
+
+        The archives are fetched into the archive directory without taking
+        the package manager lock, so :meth:`commit` only needs to fetch
+        what is still missing. Calling this method again with a different
+        selection cancels the running prefetch, keeping the archives
+        fetched so far, and starts over with the new selection.
+
+        The selection is marked and fetched in the prefetch thread, which
+        waits for a cancelled prefetch to stop first, so this method
+        returns right away.
+
+        :param selected_updates: List of :class:`PackageInfo` objects
+        :param progress_handler:
+          :class:`UpdateManager.Backend.CommitProgressHandler` object. Only
+          its download methods are called. May be None.
+        :returns: True if a prefetch is running for the selection.
+
+        .. versionadded:: 0.200.6
+        """
+        if self._operation_in_progress or self._available_updates is None:
+            return False
+        names = set()
+        for pkg_info in selected_updates:
+            names.add(pkg_info.get_package_name())
+
+        if progress_handler is None:
+            progress_handler = _QuietDownloadHandler()
+        self._prefetch_lock.acquire()
+        try:
+            previous_thread = None
+            if self._prefetch is not None:
+                previous_thread, helper, prefetch_names = self._prefetch
+                if prefetch_names == names and previous_thread.isAlive():
+                    return True
+                helper.abort()
+                self._prefetch = None
+            if not names:
+                return False
+            helper = DownloadProgressHelper(progress_handler,
+                                            install_follows=False)
+            thread = Thread(target=self._prefetch_thread,
+                            args=(names, helper, progress_handler,
+                                  previous_thread),
+                            name='PythonAptPrefetch')
+            self._prefetch = (thread, helper, names)
+            thread.start()
+        finally:
+            self._prefetch_lock.release()
+        return True
+
+    def _mark_prefetch(self, names):
+        """ Marks the available update plan and the selected updates in a
+        shadow depcache.
+
+        :param names: Set of selected package names.
+        :returns: (depcache, sizes) tuple, sizes being the arguments to the
+          progress handler's download_begin method.
+        """
+        known = {}
+        for pkgs in self._available_updates.get_packages().values():
+            known.update(pkgs)
+        depcache = self._create_preview_depcache()
+        depcache.upgrade(self._available_plan)
+        ag = apt_pkg.ActionGroup(depcache)
+        download_count = 0
+        download_size = 0
+        for name, pkg_info in known.items():
+            pkg = pkg_info._pyapt_package
+            if name in names:
+                depcache.mark_install(pkg._pkg, False)
+                size = pkg_info.get_download_size()
+                if size > 0:
+                    download_count += 1
+                    download_size += size
+            else:
+                depcache.mark_keep(pkg._pkg)
+        ag.release()
+        del ag
+        return depcache, (download_size, len(names), download_count)
+
+    def _prefetch_thread(self, names, helper, progress_handler,
+                         previous_thread):
+        """ Marks the selected updates and fetches their archives.
+
+        The records and source list passed to the package manager are
+        private to this thread, as the cache's own ones are used by the
+        main thread meanwhile.
+
+        :param names: Set of selected package names.
+        :param helper: :class:`DownloadProgressHelper` object
+        :param progress_handler: The helper's handler.
+        :param previous_thread: Thread of the prefetch this one replaces,
+          or None.
+        """
+        if previous_thread is not None:
+            previous_thread.join()
+        depcache, sizes = self._mark_prefetch(names)
+        if helper._abort:
+            progress_handler.download_aborted()
+            return
+
+        archive_dir = apt_pkg.config.find_dir('Dir::Cache::Archives')
+        lock_fd = apt_pkg.get_lock(os.path.join(archive_dir, 'lock'))
+        if lock_fd < 0:
+            LOG.debug('Archive directory is locked, not prefetching.')
+            progress_handler.download_aborted()
+            return
+        try:
+            progress_handler.download_begin(*sizes)
+            try:
+                records = apt_pkg.PackageRecords(self._cache._cache)
+                source_list = apt_pkg.SourceList()
+                source_list.read_main_list()
+                fetcher = apt_pkg.Acquire(helper)
+                manager = apt_pkg.PackageManager(depcache)
+                manager.get_archives(fetcher, source_list, records)
+                fetcher.run()
+            except SystemError, ex:
+                LOG.debug('Prefetch failed: %s', ex)
+                progress_handler.download_failed(str(ex))
+            else:
+                if helper._abort:
+                    progress_handler.download_aborted()
+        finally:
+            os.close(lock_fd)
+            ARCHIVE_SNAPSHOT.invalidate()
+
+    def cancel_prefetch(self):
+        """ Cancels a running prefetch and waits for it to stop.
+
+        Archives fetched so far are kept. Only called by the threads of
+        operations using the cache, :meth:`prefetch` does not wait.
+
+        .. versionadded:: 0.200.6
+        """
+        self._prefetch_lock.acquire()
+        try:
+            prefetch = self._prefetch
+            self._prefetch = None
+        finally:
+            self._prefetch_lock.release()
+        if prefetch is None:
+            return
+        thread, helper, names = prefetch
+        helper.abort()
+        if thread is not threading.currentThread():
+            thread.join()
+
     def commit(self, selected_updates, commit_progress_handler,
                fork_func=os.fork):
         """ Downloads and installs the updates selected.
 
-        :param selected_updates: List of :class:`PackageInfo` objects
+        :param selected_updates: List of :class:`PackageInfo` objects, or a
+          :class:`UpdateManager.Backend.CommitPlan` object returned by
+          :meth:`create_commit_plan`.
         :param commit_progress_handler:
           :class:`UpdateManager.Backend.CommitHandlerBase` object
         :param fork_func: Function used for forking. Defaults to os.fork.
+
+        .. versionchanged:: 0.200.6
+           Accepts a :class:`UpdateManager.Backend.CommitPlan` object.
         """
         if self._operation_in_progress:
             return False
@@ -795,74 +1631,34 @@ class PythonAptBackend(BackendBase):
 
         def thread_helper():
             commit_progress_handler.preparation_begin()
-            # The actiongroup should speed up the operations below...
-            ag = apt_pkg.ActionGroup(self._cache._depcache)
-            
-            for pkg_info in self._available_updates.get_package_list():
-                found = False
-                
-                for spkg in selected_updates:
-                    if spkg.get_package_name() == pkg_info.get_package_name():
-                        found = True
-                        break
-
-                if not found and not pkg_info._pyapt_package.marked_keep:
-                    pkg_info._pyapt_package.mark_keep()
-                else:
-                    pkg_info._pyapt_package.mark_install(auto_fix=False,
-                                                        auto_inst=False)
-            ag.release()
-            del ag
-
-            if self._cache._depcache.broken_count > 0:
-                # This should never happen, but we still handle it.
-                # If there are broken packages the operations below will
-                # not finish successfully.
-                LOG.fatal('BrokenCount > 0 (%d)!',
-                              self._cache._depcache.broken_count)
-                LOG.debug('Trying to fix broken upgrades...')
-                changes_old = self._cache.get_changes()
-                try:
-                    self._cache._depcache.fix_broken()
-                    if self._cache._depcache.broken_count > 0:
-                        LOG.debug('Packages still broken after fix attempt.')
-                        self._operation_in_progress = False
-                        return
-                    changes_new = self._cache.get_changes()
-                    new_packages = []
-                    for new_pkg in changes_new:
-                        if not new_pkg in changes_old:
-                            pkg_info = PackageInfo(new_pkg, self._application)
-                            LOG.debug('New change on %s.', pkg_info)
-                            new_packages.append(pkg_info)
-                except SystemError, s_err:
-                    # TODO: Should we really call download_failed here?
-                    commit_progress_handler.download_failed(s_err.message)
-                    self._operation_in_progress = False
-                    return
-
-            size = 0
-            download_count = 0
-            selected_count = 0
-            removals = []
-            installs = []
-            for pkg in self._cache.get_changes():
-                if pkg.marked_install or pkg.marked_upgrade:
-                    selected_count += 1
-                    pkg_info = PackageInfo(pkg, self._application)
-                    pkg_size = pkg_info.get_download_size()
-                    if pkg_size > 0:
-                        size += pkg_size
-                        download_count += 1
-
-                    if not pkg.is_installed:
-                        installs.append(PackageInfo(pkg, self._application))
-                if pkg.marked_delete:
-                    removals.append(PackageInfo(pkg, self._application))
-
-            if len(removals) or len(installs):
+            # Archives fetched so far are kept, partial ones are resumed
+            # by the commit's own download.
+            self.cancel_prefetch()
+            plan = selected_updates
+            if not isinstance(plan, CommitPlan):
+                names = set()
+                for pkg_info in selected_updates:
+                    names.add(pkg_info.get_package_name())
+                plan = self._mark_commit_plan(names)
+            elif plan is not self._commit_plan:
+                # The cache has been marked again since the plan has been
+                # created.
+                plan = self._mark_commit_plan(plan.get_selected_names())
+            # The system is about to change, so the plans must be
+            # computed again from scratch.
+            self._update_plans = None
+            self._previous_plans = None
+            self._commit_plan = None
+
+            if plan.get_error() is not None:
+                # TODO: Should we really call download_failed here?
+                commit_progress_handler.download_failed(plan.get_error())
+                self._operation_in_progress = False
+                return
+
+            if plan.requires_confirmation():
                 res = commit_progress_handler.requires_removal_or_installation(
-                    removals, installs)
+                    plan.get_removals(), plan.get_installs())
                 if type(res) != bool:
                     LOG.debug('requires_removal_or_installation did not '+\
                               ' return bool value (%s)!', res)
@@ -875,8 +1671,9 @@ class PythonAptBackend(BackendBase):
                     self._operation_in_progress = False
                     return
             
-            commit_progress_handler.download_begin(size, selected_count,
-                                                   download_count)
+            commit_progress_handler.download_begin(
+                plan.get_download_size(), plan.get_change_count(),
+                plan.get_download_count())
             
             download_helper = DownloadProgressHelper(commit_progress_handler)
             self._fetch_operation = download_helper
@@ -894,6 +1691,7 @@ class PythonAptBackend(BackendBase):
             except SystemError, ex:
                 commit_progress_handler.download_failed(ex.message)
                 
+            ARCHIVE_SNAPSHOT.invalidate()
             self.acquire_lock()
             if not download_helper._abort:
                 commit_progress_handler.install_finished()
@@ -22,9 +22,11 @@
 
 """ Base classes for backend implementations and helpers."""
 
+import array
 import logging
 from gettext import gettext as _
 import os
+import threading
 import weakref
 
 import apt
@@ -44,22 +46,123 @@ class PackageInfoStoreBase(object):
         self._packages = {}
         self._removals = []
 
+        # Maintained counters, updated whenever a package is added so
+        # the getters below do not need to walk the store.
+        self._install_count = 0
+        self._upgrade_count = 0
+        self._download_size = 0
+        self._download_sizes = {}
+
+        # Secondary indexes. Just like _packages these contain weak
+        # references only, mapping a key to a dict of package names and
+        # package objects.
+        self._by_source = {}
+        self._by_archive = {}
+        self._by_origin = {}
+        self._by_installed = {True: {}, False: {}}
+
+        # Dependency graph and memoized dependency checks, both built by
+        # resolve_dependencies.
+        self._graph = None
+        self._dependency_checks = {}
+
+        # Set by backends when the store was refreshed incrementally.
+        self._diff = None
+
+    @staticmethod
+    def _index_add(index, key, pkg_name, pkg_ref):
+        """ Adds a package reference to a secondary index. """
+        if not index.has_key(key):
+            index[key] = {pkg_name: pkg_ref}
+        else:
+            index[key][pkg_name] = pkg_ref
+
+    @staticmethod
+    def _index_remove(index, key, pkg_name):
+        """ Removes a package reference from a secondary index. """
+        entries = index.get(key)
+        if entries is None:
+            return
+        entries.pop(pkg_name, None)
+        if not entries:
+            del index[key]
+
+    def _unindex_package(self, pkg_name):
+        """ Removes a package from all counters and indexes.
+
+        :param pkg_name: The package's name.
+        """
+        pkg_info = None
+        for cat_id in self._categories.keys():
+            pkgs = self._categories[cat_id]
+            if pkgs.has_key(pkg_name):
+                pkg_info = pkgs.pop(pkg_name)
+                if not pkgs:
+                    del self._categories[cat_id]
+                break
+
+        del self._packages[pkg_name]
+        if pkg_info is None:
+            return None
+
+        installed = pkg_info.is_installed()
+        if installed:
+            self._upgrade_count -= 1
+        else:
+            self._install_count -= 1
+        self._download_size -= self._download_sizes.pop(pkg_name, 0)
+        self._by_installed[installed].pop(pkg_name, None)
+        self._index_remove(self._by_source,
+                           pkg_info.get_source_package_name(), pkg_name)
+        self._index_remove(self._by_archive,
+                           pkg_info.get_candidate_archive_name(), pkg_name)
+        self._index_remove(self._by_origin,
+                           pkg_info.get_candidate_origin_name(), pkg_name)
+        return pkg_info
+
     def add_package(self, pkg_info):
         """
         Adds a package to the store.
 
         :param pkg_info: :class:`PackageInfoBase` object
+
+        .. versionchanged:: 0.200.6
+          Counters and secondary indexes are updated as well.
         """
         pkg_name = pkg_info.get_package_name()
+        if self._packages.has_key(pkg_name):
+            # Replacing an entry, so its old values must not be counted
+            # twice.
+            self._unindex_package(pkg_name)
 
         # We store weak references in _packages and hard references
         # in _categories.
-        self._packages[pkg_name] = weakref.proxy(pkg_info)
+        pkg_ref = weakref.proxy(pkg_info)
+        self._packages[pkg_name] = pkg_ref
         cat_id = pkg_info.get_update_category()
-        if not self._categories.has_key(cat_id):
-            self._categories[cat_id] = {pkg_name: pkg_info}
+        self._index_add(self._categories, cat_id, pkg_name, pkg_info)
+
+        installed = pkg_info.is_installed()
+        if installed:
+            self._upgrade_count += 1
         else:
-            self._categories[cat_id][pkg_name] = pkg_info
+            self._install_count += 1
+
+        # The size is remembered so the counter stays correct even if
+        # the package's download size changes while it is stored.
+        download_size = pkg_info.get_download_size()
+        self._download_sizes[pkg_name] = download_size
+        self._download_size += download_size
+
+        self._by_installed[installed][pkg_name] = pkg_ref
+        self._index_add(self._by_source, pkg_info.get_source_package_name(),
+                        pkg_name, pkg_ref)
+        self._index_add(self._by_archive,
+                        pkg_info.get_candidate_archive_name(), pkg_name,
+                        pkg_ref)
+        self._index_add(self._by_origin,
+                        pkg_info.get_candidate_origin_name(), pkg_name,
+                        pkg_ref)
 
     def add_removal(self, pkg_info):
         """
@@ -83,7 +186,7 @@ class PackageInfoStoreBase(object):
     def get_removal_count(self):
         """ Returns the number of packages marked for removal.
 
-        :returns: list of :class:`PackageInfoBase` objects
+        :returns: Number of packages marked for removal
 
         .. versionadded:: 0.200.0~exp1
         """
@@ -92,16 +195,83 @@ class PackageInfoStoreBase(object):
     def get_install_count(self):
         """ Returns the number of packages to be newly installed.
 
-        :returns: list of :class:`PackageInfoBase` objects
+        :returns: Number of packages to be newly installed
 
         .. versionadded:: 0.200.0~exp1
+        .. versionchanged:: 0.200.6
+          Uses a maintained counter instead of walking the store.
+        """
+        return self._install_count
+
+    def get_upgrade_count(self):
+        """ Returns the number of already installed packages to be upgraded.
+
+        :returns: Number of packages to be upgraded
+
+        .. versionadded:: 0.200.6
         """
-        count = 0
-        for pkg in self._packages:
-            pkg_info = self._packages[pkg]
-            if not pkg_info.is_installed():
-                count += 1
-        return count
+        return self._upgrade_count
+
+    def get_download_size(self):
+        """ Returns the overall download size of all packages in the store,
+        as calculated when the packages were added.
+
+        :returns: Download size in bytes
+
+        .. versionadded:: 0.200.6
+        """
+        return self._download_size
+
+    def get_packages_by_source(self, source_package_name):
+        """ Gets all packages built from a given source package.
+
+        :param source_package_name: The source package's name.
+        :returns: A list of :class:`PackageInfoBase` objects.
+
+        .. versionadded:: 0.200.6
+        """
+        return self._by_source.get(source_package_name, {}).values()
+
+    def get_packages_by_archive(self, archive_name):
+        """ Gets all packages whose candidate comes from a given archive.
+
+        :param archive_name: The archive's name (eg. lenny-updates).
+        :returns: A list of :class:`PackageInfoBase` objects.
+
+        .. versionadded:: 0.200.6
+        """
+        return self._by_archive.get(archive_name, {}).values()
+
+    def get_packages_by_origin(self, origin_name):
+        """ Gets all packages whose candidate comes from a given origin.
+
+        :param origin_name: The origin's name (eg. Debian).
+        :returns: A list of :class:`PackageInfoBase` objects.
+
+        .. versionadded:: 0.200.6
+        """
+        return self._by_origin.get(origin_name, {}).values()
+
+    def get_packages_by_category(self, category_id):
+        """ Gets all packages in a given update category.
+
+        :param category_id: The update category's ID.
+        :returns: A list of :class:`PackageInfoBase` objects.
+
+        .. versionadded:: 0.200.6
+        """
+        return self._categories.get(category_id, {}).values()
+
+    def get_packages_by_installed_state(self, installed):
+        """ Gets all packages that are either installed (upgrades) or not
+        (new installations).
+
+        :param installed: True for upgrades, False for new installations.
+        :returns: A list of :class:`PackageInfoBase` objects.
+
+        .. versionadded:: 0.200.6
+        """
+        return self._by_installed[bool(installed)].values()
     
     def get_package(self, package_name):
         """ Gets a package from the internal dictionary.
@@ -124,7 +294,7 @@ class PackageInfoStoreBase(object):
 
         :returns: Number of packages
         """
-        return len(self._packages.keys())
+        return len(self._packages)
 
     def get_packages(self):
         """ Gets a dict of packages.
@@ -142,13 +312,388 @@ class PackageInfoStoreBase(object):
         """
         return self._packages.values()
 
+    def _create_dependency(self, name, relation, version):
+        """ Creates a dependency object.
+
+        Backends override this method to return their
+        :class:`PackageDependencyBase` implementation.
+        """
+        return PackageDependencyBase(name, relation, version)
+
+    def check_dependency(self, name, relation, version):
+        """ Checks a dependency against the installed and candidate versions.
+
+        Results are memoized per (name, relation, version) triple until
+        dependencies are resolved again, as the same dependency is usually
+        shared by many packages.
+
+        :param name: Name of the package depended on.
+        :param relation: One of :data:`DEP_RELATION` or None.
+        :param version: Version string or None.
+        :returns: A tuple of the :class:`PackageDependencyBase` object and
+          whether the installed and the candidate version fulfill it.
+
+        .. versionadded:: 0.200.6
+        """
+        key = (name, relation, version)
+        result = self._dependency_checks.get(key)
+        if result is None:
+            pkg_dep = self._create_dependency(name, relation, version)
+            result = (pkg_dep, pkg_dep.fulfilled_by_installed_version(),
+                      pkg_dep.fulfilled_by_candidate_version(self))
+            self._dependency_checks[key] = result
+        return result
+
+    def get_diff(self):
+        """ Gets the differences to the store this store was refreshed from.
+
+        :returns: :class:`StoreDiff` object or None if the store was built
+          from scratch.
+
+        .. versionadded:: 0.200.6
+        """
+        return self._diff
+
+    def get_dependency_graph(self):
+        """ Gets the dependency graph.
+
+        :returns: :class:`DependencyGraph` object or None if dependencies
+          have not been resolved yet.
+
+        .. versionadded:: 0.200.6
+        """
+        return self._graph
+
     def resolve_dependencies(self):
-        """ Resolves dependencies of all packages. """
+        """ Resolves dependencies of all packages.
+
+        .. versionchanged:: 0.200.6
+          The relations of all packages are stored in a single
+          :class:`DependencyGraph`, which is rebuilt on every call.
+        """
+        graph = DependencyGraph()
         for pkg_info in self._packages.values():
-            pkg_info._resolve_dependencies(self)
+            graph.add_node(pkg_info)
+        self._graph = graph
+        self._dependency_checks = {}
+
+        for node_id in xrange(graph.node_count()):
+            graph.get_node(node_id)._resolve_dependencies(self)
+        LOG.debug('Resolved dependencies: %d dependency checks for %d '
+                  'packages, version comparisons: %d hits, %d misses.',
+                  len(self._dependency_checks), graph.node_count(),
+                  VERSION_COMPARATOR.get_hits(),
+                  VERSION_COMPARATOR.get_misses())
+
+class StoreDiff(object):
+    """ Differences between a :class:`PackageInfoStoreBase` and the store it
+    was refreshed from.
+
+    Frontends may use it to update their views instead of rebuilding them.
+
+    :param added: Packages only found in the new store.
+    :param removed: Packages only found in the previous store.
+    :param changed: (old, new) tuples of packages found in both stores
+      with a different version.
+
+    .. versionadded:: 0.200.6
+    """
+    def __init__(self, added, removed, changed):
+        self._added = added
+        self._removed = removed
+        self._changed = changed
+
+    def get_added(self):
+        """ Returns a list of added :class:`PackageInfoBase` objects. """
+        return self._added
+
+    def get_removed(self):
+        """ Returns a list of removed :class:`PackageInfoBase` objects,
+        as found in the previous store.
+        """
+        return self._removed
+
+    def get_changed(self):
+        """ Returns a list of (old, new) tuples of :class:`PackageInfoBase`
+        objects with changed versions.
+        """
+        return self._changed
+
+    def is_empty(self):
+        """ Returns whether both stores contain the same packages. """
+        return not (self._added or self._removed or self._changed)
+
+    def __repr__(self):
+        return '<StoreDiff: %d added, %d removed, %d changed>' \
+               % (len(self._added), len(self._removed), len(self._changed))
+
+class UpdateSummary(object):
+    """ Counts of the available updates, without the packages themselves.
+
+    :param category_counts: Dictionary mapping update category IDs to the
+      number of packages to be upgraded or installed in that category.
+    :param removal_count: Number of packages to be removed.
+    :param download_size: Overall download size in bytes.
+
+    .. versionadded:: 0.200.6
+    """
+    def __init__(self, category_counts, removal_count, download_size):
+        self._category_counts = category_counts
+        self._removal_count = removal_count
+        self._download_size = download_size
+
+    def get_category_count(self, category_id):
+        """ Returns the number of updates in an update category. """
+        return self._category_counts.get(category_id, 0)
+
+    def get_category_counts(self):
+        """ Returns a dictionary mapping update category IDs to the number
+        of updates in that category.
+        """
+        return self._category_counts.copy()
+
+    def get_update_count(self):
+        """ Returns the number of packages to be upgraded or installed. """
+        return sum(self._category_counts.values())
+
+    def get_removal_count(self):
+        """ Returns the number of packages to be removed. """
+        return self._removal_count
+
+    def get_download_size(self):
+        """ Returns the overall download size in bytes. """
+        return self._download_size
+
+    def __repr__(self):
+        return '<UpdateSummary: %d updates, %d removals, %d bytes>' \
+               % (self.get_update_count(), self._removal_count,
+                  self._download_size)
+
+class DownloadPreview(object):
+    """ Sizes resulting from a selection of updates, as returned by
+    :meth:`BackendBase.update_selection_preview`.
+
+    :param download_size: Number of bytes to be downloaded.
+    :param installed_size_delta: Change of the installed size in bytes,
+      negative if disk space is freed.
+
+    .. versionadded:: 0.200.6
+    """
+    def __init__(self, download_size, installed_size_delta):
+        self._download_size = download_size
+        self._installed_size_delta = installed_size_delta
+
+    def get_download_size(self):
+        """ Returns the number of bytes to be downloaded. """
+        return self._download_size
+
+    def get_installed_size_delta(self):
+        """ Returns the change of the installed size in bytes. """
+        return self._installed_size_delta
+
+    def __repr__(self):
+        return '<DownloadPreview: %d bytes, %+d bytes installed>' \
+               % (self._download_size, self._installed_size_delta)
+
+class CommitPlan(object):
+    """ The changes committing a selection of updates results in.
+
+    Plans are created by :meth:`BackendBase.create_commit_plan`, which
+    may be called as a dry run to show what a commit would do. The plan
+    can then be passed to :meth:`BackendBase.commit` instead of the list
+    of selected updates.
+
+    :param selected_names: Names of the selected updates.
+    :param change_count: Number of packages to be upgraded or installed.
+    :param download_count: Number of package archives to be downloaded.
+    :param download_size: Number of bytes to be downloaded.
+    :param installs: List of :class:`PackageInfoBase` objects of packages
+      to be newly installed.
+    :param removals: List of :class:`PackageInfoBase` objects of packages
+      to be removed.
+    :param error: Message describing why the selection can not be
+      committed, or None.
+
+    .. versionadded:: 0.200.6
+    """
+    def __init__(self, selected_names, change_count, download_count,
+                 download_size, installs, removals, error=None):
+        self._selected_names = frozenset(selected_names)
+        self._change_count = change_count
+        self._download_count = download_count
+        self._download_size = download_size
+        self._installs = installs
+        self._removals = removals
+        self._error = error
+
+    def get_selected_names(self):
+        """ Returns a frozenset of the selected updates' names. """
+        return self._selected_names
+
+    def get_change_count(self):
+        """ Returns the number of packages to be upgraded or installed. """
+        return self._change_count
+
+    def get_download_count(self):
+        """ Returns the number of package archives to be downloaded. """
+        return self._download_count
+
+    def get_download_size(self):
+        """ Returns the number of bytes to be downloaded. """
+        return self._download_size
+
+    def get_installs(self):
+        """ Returns a list of :class:`PackageInfoBase` objects of packages
+        to be newly installed.
+        """
+        return self._installs
+
+    def get_removals(self):
+        """ Returns a list of :class:`PackageInfoBase` objects of packages
+        to be removed.
+        """
+        return self._removals
+
+    def requires_confirmation(self):
+        """ Returns whether packages other than the selected updates are
+        installed or removed.
+        """
+        return bool(self._installs or self._removals)
+
+    def get_error(self):
+        """ Returns a message describing why the selection can not be
+        committed, or None.
+        """
+        return self._error
+
+    def __repr__(self):
+        return '<CommitPlan: %d changes, %d downloads (%d bytes), ' \
+               '%d installs, %d removals>' \
+               % (self._change_count, self._download_count,
+                  self._download_size, len(self._installs),
+                  len(self._removals))
 
 DEP_RELATION = Enum('EQ', 'LT', 'GT', 'GTE', 'LTE')
 
+# Predicates on the result of a version comparison, one per relation.
+_RELATION_PREDICATES = {
+    DEP_RELATION.EQ: lambda cmp_res: cmp_res == 0,
+    DEP_RELATION.LT: lambda cmp_res: cmp_res < 0,
+    DEP_RELATION.GT: lambda cmp_res: cmp_res > 0,
+    DEP_RELATION.GTE: lambda cmp_res: cmp_res >= 0,
+    DEP_RELATION.LTE: lambda cmp_res: cmp_res <= 0,
+    }
+
+class VersionComparator(object):
+    """ Memoizing version comparison service.
+
+    The results of :func:`apt_pkg.version_compare` are kept in a least
+    recently used cache of at most max_size version pairs, as the same
+    pairs are compared many times while resolving dependencies.
+
+    :param max_size: Maximum number of cached comparisons.
+
+    .. versionadded:: 0.200.6
+    """
+    def __init__(self, max_size=4096):
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self.clear()
+
+    def clear(self):
+        """ Removes all cached comparisons. """
+        self._lock.acquire()
+        try:
+            self._cache = {}
+            # Circular doubly linked list of [prev, next, key, result]
+            # entries, ordered from least to most recently used.
+            self._root = root = []
+            root[:] = [root, root, None, None]
+        finally:
+            self._lock.release()
+
+    def compare(self, version_a, version_b):
+        """ Compares two version strings.
+
+        :returns: A negative number if version_a is lower than version_b,
+          0 if both are equal and a positive number otherwise.
+        """
+        key = (version_a, version_b)
+        self._lock.acquire()
+        try:
+            entry = self._cache.get(key)
+            if entry is not None:
+                # Move the entry to the most recently used end.
+                prev_entry, next_entry = entry[0], entry[1]
+                prev_entry[1] = next_entry
+                next_entry[0] = prev_entry
+                root = self._root
+                last = root[0]
+                last[1] = root[0] = entry
+                entry[0] = last
+                entry[1] = root
+                self._hits += 1
+                return entry[3]
+        finally:
+            self._lock.release()
+
+        result = apt_pkg.version_compare(version_a, version_b)
+
+        self._lock.acquire()
+        try:
+            self._misses += 1
+            if self._cache.has_key(key):
+                # Added by another thread in the meantime.
+                return result
+            root = self._root
+            if len(self._cache) >= self._max_size:
+                # Drop the least recently used entry.
+                oldest = root[1]
+                root[1] = oldest[1]
+                oldest[1][0] = root
+                del self._cache[oldest[2]]
+            last = root[0]
+            entry = [last, root, key, result]
+            last[1] = root[0] = entry
+            self._cache[key] = entry
+        finally:
+            self._lock.release()
+        return result
+
+    def satisfies(self, version, relation, required_version):
+        """ Checks if a version satisfies a versioned relation.
+
+        :param version: Version to check, as a string.
+        :param relation: One of :data:`DEP_RELATION`.
+        :param required_version: Version required by the relation.
+        :returns: True if the version matches, False otherwise.
+        """
+        if not required_version:
+            # No version information means we just depend on the package
+            # being installed.
+            return True
+        predicate = _RELATION_PREDICATES.get(relation)
+        if predicate is None:
+            return False
+        return predicate(self.compare(version, required_version))
+
+    def get_hits(self):
+        """ Returns the number of comparisons answered from the cache. """
+        return self._hits
+
+    def get_misses(self):
+        """ Returns the number of comparisons not found in the cache. """
+        return self._misses
+
+    def get_size(self):
+        """ Returns the number of cached comparisons. """
+        return len(self._cache)
+
+VERSION_COMPARATOR = VersionComparator()
+""" :class:`VersionComparator` shared by all dependency checks """
+
 class PackageDependencyBase(object):
     """ Package dependency representation """
     def __init__(self, name, relation, version):
@@ -195,36 +740,446 @@ class PackageDependencyBase(object):
 
         :param other_version: Version to compare, as a string.
         :returns: True if version matches, False otherwise
-        """
-        if not self._version:
-            # No version information means we just depend on the package being
-            # installed.
-            return True
-        cmp_res = apt_pkg.version_compare(other_version, self._version)
 
-        if cmp_res == 0 and self._relation in [DEP_RELATION.EQ,
-                                               DEP_RELATION.GTE,
-                                               DEP_RELATION.LTE]:
-            return True
-        elif cmp_res < 0 and self._relation in [DEP_RELATION.LT,
-                                                DEP_RELATION.LTE]:
-            return True
-        elif cmp_res > 0 and self._relation in [DEP_RELATION.GT,
-                                                DEP_RELATION.GTE]:
-            return True
-        return False
+        .. versionchanged:: 0.200.6
+          Comparisons are done by :data:`VERSION_COMPARATOR`.
+        """
+        return VERSION_COMPARATOR.satisfies(other_version, self._relation,
+                                            self._version)
 
     def __repr__(self):
         return '<PackageDependency: %s (%s %s)' % (self._name, self._relation,
                                                    self._version)
         
+class RelationView(object):
+    """ Read-only view on a list of related packages.
+
+    Instances are handed out by the relation getters of
+    :class:`PackageInfoBase` implementations, so the underlying list does
+    not need to be copied on every call. Slicing returns a plain list.
+
+    If nodes is given, items contains node IDs which are looked up in
+    nodes, as done by :class:`DependencyGraph`.
+
+    .. versionadded:: 0.200.6
+    """
+    __slots__ = ('_items', '_nodes')
+
+    def __init__(self, items=(), nodes=None):
+        self._items = items
+        self._nodes = nodes
+
+    def __iter__(self):
+        if self._nodes is None:
+            return iter(self._items)
+        nodes = self._nodes
+        return (nodes[node_id] for node_id in self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if self._nodes is None:
+            return self._items[index]
+        if isinstance(index, slice):
+            return [self._nodes[node_id] for node_id in self._items[index]]
+        return self._nodes[self._items[index]]
+
+    def __contains__(self, item):
+        if self._nodes is None:
+            return item in self._items
+        # Weak proxies do not compare equal to the objects they refer to,
+        # so packages are compared by name, which is unique in a graph.
+        pkg_name = item.get_package_name()
+        for other in self:
+            if other.get_package_name() == pkg_name:
+                return True
+        return False
+
+    def __nonzero__(self):
+        return len(self._items) > 0
+
+    def __repr__(self):
+        return '<RelationView: %r>' % (list(self))
+
+EMPTY_RELATION_VIEW = RelationView()
+""" Shared :class:`RelationView` used for packages without relations. """
+
+class DependencyGraph(object):
+    """ Relation graph of the packages in a :class:`PackageInfoStoreBase`.
+
+    Packages are numbered with dense integer IDs in the order they are
+    added. For every relation kind the graph keeps one array of target IDs
+    per package, which is only created once the package has a relation of
+    that kind. Relation kinds are defined by the backends.
+
+    Package objects are stored as passed to :meth:`add_node`, so the
+    store passes weak references for its packages.
+
+    .. versionadded:: 0.200.6
+    """
+    def __init__(self):
+        self._nodes = []
+        self._ids = {}
+        self._edges = {}
+
+    def add_node(self, pkg_info):
+        """ Adds a package to the graph.
+
+        Only the first package added with a given name can be looked up
+        by name.
+
+        :param pkg_info: :class:`PackageInfoBase` object
+        :returns: The package's node ID.
+        """
+        node_id = len(self._nodes)
+        self._nodes.append(pkg_info)
+        pkg_name = pkg_info.get_package_name()
+        if not self._ids.has_key(pkg_name):
+            self._ids[pkg_name] = node_id
+        for adjacency in self._edges.itervalues():
+            adjacency.append(None)
+        pkg_info._set_graph_node(self, node_id)
+        return node_id
+
+    def get_node_id(self, package_name):
+        """ Gets the node ID of a package.
+
+        :param package_name: The package's name.
+        :returns: Node ID or None if the package is not part of the graph.
+        """
+        return self._ids.get(package_name)
+
+    def get_node(self, node_id):
+        """ Gets a package by its node ID.
+
+        :param node_id: Node ID
+        :returns: :class:`PackageInfoBase` object
+        """
+        return self._nodes[node_id]
+
+    def node_count(self):
+        """ Gets the number of packages in the graph. """
+        return len(self._nodes)
+
+    def add_edge(self, kind, source_id, target_id, unique=False):
+        """ Adds a relation between two packages.
+
+        :param kind: Relation kind, as defined by the backend.
+        :param source_id: Node ID of the package the relation belongs to.
+        :param target_id: Node ID of the related package.
+        :param unique: Do not add the relation if it is already present.
+        """
+        adjacency = self._edges.get(kind)
+        if adjacency is None:
+            adjacency = [None] * len(self._nodes)
+            self._edges[kind] = adjacency
+        targets = adjacency[source_id]
+        if targets is None:
+            adjacency[source_id] = array.array('i', (target_id,))
+        elif not unique or not target_id in targets:
+            targets.append(target_id)
+
+    def get_edges(self, kind, node_id):
+        """ Gets the node IDs of a package's related packages.
+
+        :param kind: Relation kind
+        :param node_id: Node ID of the package.
+        :returns: A sequence of node IDs.
+        """
+        adjacency = self._edges.get(kind)
+        if adjacency is None or adjacency[node_id] is None:
+            return ()
+        return adjacency[node_id]
+
+    def get_view(self, kind, node_id):
+        """ Gets a package's related packages.
+
+        :param kind: Relation kind
+        :param node_id: Node ID of the package.
+        :returns: :class:`RelationView` object
+        """
+        adjacency = self._edges.get(kind)
+        if adjacency is None or adjacency[node_id] is None:
+            return EMPTY_RELATION_VIEW
+        return RelationView(adjacency[node_id], self._nodes)
+
+class SelectionSolver(object):
+    """ Computes package selections for the packages of a
+    :class:`PackageInfoStoreBase`.
+
+    Packages connected by strict dependencies can only be selected
+    together, so they are collapsed into groups first. Selecting a
+    package selects its group and, transitively, the groups it depends
+    on, and deselects conflicting packages together with everything that
+    depends on them. Deselecting a package deselects its group and all
+    groups depending on it. Each operation only visits the groups it
+    changes.
+
+    The selection is stored in the packages' active attribute, which is
+    read by the frontends.
+
+    :param pkginfo_store: :class:`PackageInfoStoreBase` object with
+      resolved dependencies.
+
+    .. versionadded:: 0.200.6
+    """
+    def __init__(self, pkginfo_store):
+        self._store = pkginfo_store
+        self._packages = pkginfo_store.get_package_list()
+        self._ids = {}
+        for pkg_id in xrange(len(self._packages)):
+            pkg_name = self._packages[pkg_id].get_package_name()
+            self._ids[pkg_name] = pkg_id
+
+        # Union-find over strict dependencies.
+        parent = range(len(self._packages))
+        def find(pkg_id):
+            root = pkg_id
+            while parent[root] != root:
+                root = parent[root]
+            while parent[pkg_id] != root:
+                parent[pkg_id], pkg_id = root, parent[pkg_id]
+            return root
+
+        for pkg_id in xrange(len(self._packages)):
+            pkg_info = self._packages[pkg_id]
+            for other_id in self._related_ids(
+                pkg_info.get_strict_dependencies()):
+                root, other_root = find(pkg_id), find(other_id)
+                if root != other_root:
+                    parent[other_root] = root
+
+        # Dense group IDs and group members.
+        self._group_of = []
+        self._members = []
+        group_ids = {}
+        for pkg_id in xrange(len(self._packages)):
+            root = find(pkg_id)
+            group_id = group_ids.get(root)
+            if group_id is None:
+                group_id = len(self._members)
+                group_ids[root] = group_id
+                self._members.append([])
+            self._group_of.append(group_id)
+            self._members[group_id].append(pkg_id)
+
+        # Relations between groups.
+        self._depends = self._group_relations('get_dependencies')
+        self._rdepends = self._group_relations('get_reverse_dependencies')
+        self._conflicts = self._group_relations('get_conflicts')
+        LOG.debug('Selection solver: %d packages in %d groups.',
+                  len(self._packages), len(self._members))
+
+    def _related_ids(self, related):
+        """ Returns the IDs of the related packages that are part of the
+        store.
+        """
+        ids = []
+        for pkg_info in related:
+            pkg_id = self._ids.get(pkg_info.get_package_name())
+            if pkg_id is not None:
+                ids.append(pkg_id)
+        return ids
+
+    def _group_relations(self, getter_name):
+        """ Returns a list of related group IDs for every group.
+
+        :param getter_name: Name of the :class:`PackageInfoBase` relation
+          getter to use.
+        """
+        relations = [None] * len(self._members)
+        for group_id in xrange(len(self._members)):
+            related = set()
+            for pkg_id in self._members[group_id]:
+                getter = getattr(self._packages[pkg_id], getter_name)
+                for other_id in self._related_ids(getter()):
+                    related.add(self._group_of[other_id])
+            related.discard(group_id)
+            relations[group_id] = tuple(related)
+        return relations
+
+    def _closure(self, group_ids, relations):
+        """ Returns the groups reachable from group_ids, including them.
+
+        :param group_ids: Iterable of group IDs.
+        :param relations: Group relations to follow.
+        """
+        seen = set(group_ids)
+        pending = list(seen)
+        while pending:
+            for other_id in relations[pending.pop()]:
+                if not other_id in seen:
+                    seen.add(other_id)
+                    pending.append(other_id)
+        return seen
+
+    def _apply(self, group_ids, selected, changed):
+        """ Sets the selection of all packages in the given groups and
+        appends changed packages to changed.
+        """
+        for group_id in group_ids:
+            for pkg_id in self._members[group_id]:
+                pkg_info = self._packages[pkg_id]
+                if getattr(pkg_info, 'active', None) != selected:
+                    pkg_info.active = selected
+                    changed.append(pkg_info)
+
+    def get_group(self, pkg_info):
+        """ Gets the packages that can only be selected together with a
+        package.
+
+        :param pkg_info: :class:`PackageInfoBase` object
+        :returns: A list of :class:`PackageInfoBase` objects, including
+          pkg_info.
+        """
+        group_id = self._group_of[self._ids[pkg_info.get_package_name()]]
+        return [self._packages[pkg_id] for pkg_id in self._members[group_id]]
+
+    def set_selection(self, pkg_infos, selected=True):
+        """ Selects or deselects packages and everything they require.
+
+        Packages needed by a selected package are never deselected
+        because of a conflict.
+
+        :param pkg_infos: Iterable of :class:`PackageInfoBase` objects.
+        :param selected: Whether to select or to deselect the packages.
+        :returns: A list of :class:`PackageInfoBase` objects whose
+          selection changed.
+        """
+        group_ids = set()
+        for pkg_info in pkg_infos:
+            pkg_id = self._ids.get(pkg_info.get_package_name())
+            if pkg_id is not None:
+                group_ids.add(self._group_of[pkg_id])
+
+        changed = []
+        if selected:
+            selection = self._closure(group_ids, self._depends)
+            conflicting = set()
+            for group_id in selection:
+                conflicting.update(self._conflicts[group_id])
+            conflicting.difference_update(selection)
+            if conflicting:
+                deselection = self._closure(conflicting, self._rdepends)
+                deselection.difference_update(selection)
+                self._apply(deselection, False, changed)
+            self._apply(selection, True, changed)
+        else:
+            self._apply(self._closure(group_ids, self._rdepends), False,
+                        changed)
+        return changed
+
+    def select_all(self, selected=True):
+        """ Selects or deselects all packages.
+
+        :param selected: Whether to select or to deselect the packages.
+        :returns: A list of :class:`PackageInfoBase` objects whose
+          selection changed.
+        """
+        return self.set_selection(self._packages, selected)
+
+    def deselect_all(self):
+        """ Deselects all packages.
+
+        :returns: A list of :class:`PackageInfoBase` objects whose
+          selection changed.
+        """
+        return self.select_all(False)
+
+    def select_category(self, category_id, selected=True):
+        """ Selects or deselects all packages of a category.
+
+        :param category_id: The category's ID.
+        :param selected: Whether to select or to deselect the packages.
+        :returns: A list of :class:`PackageInfoBase` objects whose
+          selection changed.
+        """
+        return self.set_selection(
+            self._store.get_packages_by_category(category_id), selected)
+
+    def apply_default_selection(self):
+        """ Selects upgrades of installed packages whose selection has not
+        been set yet and deselects the remaining packages without a
+        selection.
+
+        :returns: A list of :class:`PackageInfoBase` objects whose
+          selection changed.
+        """
+        upgrades = []
+        for pkg_info in self._packages:
+            if getattr(pkg_info, 'active', None) is None \
+                   and pkg_info.is_installed():
+                upgrades.append(pkg_info)
+        changed = self.set_selection(upgrades)
+
+        unset = []
+        for pkg_info in self._packages:
+            if getattr(pkg_info, 'active', None) is None:
+                unset.append(pkg_info)
+        return changed + self.set_selection(unset, False)
+
+class OriginInfo(object):
+    """ Read-only repository origin record.
+
+    Records are interned via :meth:`intern`, so all packages coming from
+    the same archive share a single object.
+
+    .. versionadded:: 0.200.6
+    """
+    __slots__ = ('archive', 'label', 'origin', 'component', 'site', 'trusted')
+
+    _interned = {}
+
+    def __init__(self, archive, label, origin, component, site, trusted):
+        object.__setattr__(self, 'archive', archive)
+        object.__setattr__(self, 'label', label)
+        object.__setattr__(self, 'origin', origin)
+        object.__setattr__(self, 'component', component)
+        object.__setattr__(self, 'site', site)
+        object.__setattr__(self, 'trusted', trusted)
+
+    @classmethod
+    def intern(cls, archive, label, origin, component, site, trusted):
+        """ Returns the shared record for the given origin values.
+
+        :param archive: Archive name
+        :param label: Origin label
+        :param origin: Origin name
+        :param component: Component name
+        :param site: Repository host name
+        :param trusted: Whether the repository is trusted
+        :returns: :class:`OriginInfo` object
+        """
+        key = (archive, label, origin, component, site, bool(trusted))
+        record = cls._interned.get(key)
+        if record is None:
+            record = cls._interned.setdefault(key, cls(*key))
+        return record
+
+    def __setattr__(self, name, value):
+        """ Origin records are immutable """
+        raise TypeError('Cannot set values of %s objects.' \
+                        % (self.__class__.__name__))
+
+    def __repr__(self):
+        return '<OriginInfo: %s %s/%s (%s)>' % (self.origin, self.archive,
+                                                self.component, self.label)
+
 class PackageInfoBase(object):
     """
     Package info base class.
 
     All PackageInfo implementations *must* subclass this
     class and override *all* its methods.
+
+    .. versionchanged:: 0.200.6
+      The base class defines empty __slots__, so implementations may
+      use __slots__ to avoid a per-instance __dict__. The relation getters
+      may return a read-only :class:`RelationView` instead of a list.
     """
+    __slots__ = ()
+
     def is_broken(self):
         """ Returns whether the package is broken or not """
         return self._broken
@@ -255,6 +1210,14 @@ class PackageInfoBase(object):
         """
         raise NotImplementedError
 
+    def get_candidate_origin(self):
+        """ The candidate's repository origin as a :class:`OriginInfo`
+        object, or None if the candidate is only available locally.
+
+        .. versionadded:: 0.200.6
+        """
+        raise NotImplementedError
+
     def get_candidate_archive_name(self):
         """ The candidate's repository archive name. """
         raise NotImplementedError
@@ -296,12 +1259,30 @@ class PackageInfoBase(object):
         """
         raise NotImplementedError
 
+    def get_candidate_architecture(self):
+        """
+        Return the candidate's architecture, e.g. "i386" or "all".
+
+        .. versionadded:: 0.200.6
+        """
+        raise NotImplementedError
+
     def _resolve_dependencies(self, pkginfo_store):
         """ Resolves the package's dependencies and adds all upgradable
         dependencies to the store.
         """
         raise NotImplementedError
 
+    def _set_graph_node(self, graph, node_id):
+        """ Called by :class:`DependencyGraph` when the package is added.
+
+        :param graph: :class:`DependencyGraph` object
+        :param node_id: The package's node ID.
+
+        .. versionadded:: 0.200.6
+        """
+        raise NotImplementedError
+
     def is_installed(self):
         """ Returns whether the package is already installed or not. """
         raise NotImplementedError
@@ -579,6 +1560,74 @@ class BackendBase(object):
         """
         raise NotImplementedError
 
+    def get_update_summary(self, dist_upgrade=True):
+        """
+        Counts the available updates (synchronous).
+
+        Used by the non-interactive update check. Backends should override
+        this method with an implementation that neither takes the package
+        manager lock nor builds a :class:`PackageInfoStoreBase`. The
+        default implementation counts the packages returned by
+        :meth:`get_available_updates`.
+
+        :param dist_upgrade: Defines whether to do a dist upgrade or not.
+        :returns: :class:`UpdateSummary` object
+
+        .. versionadded:: 0.200.6
+        """
+        store = self.get_available_updates(dist_upgrade)
+        category_counts = {}
+        for cat_id, pkgs in store.get_packages().items():
+            category_counts[cat_id] = len(pkgs)
+        return UpdateSummary(category_counts, store.get_removal_count(),
+                             store.get_download_size())
+
+    def preload_cache(self):
+        """
+        Opens the package cache ahead of :meth:`reload_cache` (synchronous).
+
+        The application calls this method in a separate thread while the
+        frontend is being initialized. :meth:`reload_cache` may then use
+        the preloaded cache instead of opening it again. Backends that do
+        not support this do not need to override this method.
+
+        .. versionadded:: 0.200.6
+        """
+        pass
+
+    def get_cached_updates(self, dist_upgrade=True):
+        """
+        Gets the updates found by a previous run, if they are still valid
+        for the current package cache state.
+
+        Frontends may show these updates while the package cache is being
+        opened. The returned packages can not be committed.
+
+        Backends that do not keep such a snapshot do not need to override
+        this method.
+
+        :param dist_upgrade: Defines whether to return the dist upgrade
+          plan or the safe upgrade plan.
+        :returns: :class:`PackageInfoStoreBase` object or None
+
+        .. versionadded:: 0.200.6
+        """
+        return None
+
+    def save_update_snapshot(self):
+        """
+        Saves the current update plans for :meth:`get_cached_updates` of
+        the next run, in the background.
+
+        Frontends call this once the available updates are shown, so
+        writing the snapshot does not delay them.
+
+        :returns: True if a snapshot is being written, False otherwise.
+
+        .. versionadded:: 0.200.6
+        """
+        return False
+
     def reload_cache(self, cache_progress_handler):
         """
         Reloads the package cache (asynchronous).
@@ -597,16 +1646,112 @@ class BackendBase(object):
         """
         raise NotImplementedError
 
+    def create_commit_plan(self, selected_updates):
+        """
+        Computes the changes committing the selected updates results in
+        (synchronous).
+
+        The default implementation only sums up the selected updates'
+        download sizes. Backends should override this method with an
+        implementation that resolves the selection like :meth:`commit`
+        does.
+
+        :param selected_updates: List of
+          :class:`UpdateManager.Backend.PackageInfoBase` objects
+        :returns: :class:`CommitPlan` object
+
+        .. versionadded:: 0.200.6
+        """
+        names = []
+        download_count = 0
+        download_size = 0
+        for pkg_info in selected_updates:
+            names.append(pkg_info.get_package_name())
+            size = pkg_info.get_download_size()
+            if size > 0:
+                download_count += 1
+                download_size += size
+        return CommitPlan(names, len(names), download_count, download_size,
+                          [], [])
+
+    def reset_selection_preview(self, selection):
+        """
+        Starts previewing selections of the available updates
+        (synchronous).
+
+        Frontends call this method whenever a new list of available
+        updates is shown, passing the state of every update, and
+        :meth:`update_selection_preview` whenever the selection changes.
+        Backends that can not compute previews do not need to override
+        this method.
+
+        :param selection: List of (:class:`PackageInfoBase`, selected)
+          tuples.
+        :returns: :class:`DownloadPreview` object, or None if previews are
+          not supported.
+
+        .. versionadded:: 0.200.6
+        """
+        return None
+
+    def update_selection_preview(self, changes):
+        """
+        Applies selection changes to the preview started by
+        :meth:`reset_selection_preview` (synchronous).
+
+        :param changes: List of (:class:`PackageInfoBase`, selected)
+          tuples of the packages whose selection changed.
+        :returns: :class:`DownloadPreview` object, or None if previews are
+          not supported or no preview has been started.
+
+        .. versionadded:: 0.200.6
+        """
+        return None
+
+    def prefetch(self, selected_updates, progress_handler=None):
+        """
+        Starts downloading the archives of the selected updates in the
+        background, so that :meth:`commit` only has to install them
+        (asynchronous).
+
+        Calling this method again with a different selection replaces the
+        running prefetch. Frontends call this method from their main loop,
+        so it must not wait for a replaced prefetch to stop. Backends that
+        do not support prefetching do not need to override this method.
+
+        :param selected_updates: List of
+          :class:`UpdateManager.Backend.PackageInfoBase` objects
+        :param progress_handler: :class:`CommitProgressHandler` object, of
+          which only the download methods are called, or None.
+        :returns: True if a prefetch has been started or is running.
+
+        .. versionadded:: 0.200.6
+        """
+        return False
+
+    def cancel_prefetch(self):
+        """
+        Cancels a prefetch started by :meth:`prefetch` (synchronous).
+
+        .. versionadded:: 0.200.6
+        """
+        pass
+
     def commit(self, selected_updates, commit_progress_handler,
                fork_func=os.fork):
         """
         Downloads and installs the packages specified in selcted_updates
         (asynchronous).
 
-        :param selected_updates: List of :class:`UpdateManager.Backend.PackageInfoBase` objects
+        :param selected_updates: List of :class:`UpdateManager.Backend.PackageInfoBase` objects,
+          or a :class:`CommitPlan` object returned by
+          :meth:`create_commit_plan`.
         :param commit_progress_handler: :class:`CommitProgressHandler`
           implementation
         :param fork_func: Function used for forking. Defaults to os.fork.
+
+        .. versionchanged:: 0.200.6
+           Accepts a :class:`CommitPlan` object.
         """
         raise NotImplementedError
 
@@ -0,0 +1,411 @@
+# UpdateManager/Backend/snapshot.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+""" Persistent snapshots of update plans.
+
+A snapshot stores the packages of one or more
+:class:`UpdateManager.Backend.PackageInfoStoreBase` objects column by
+column, together with their relations. It is keyed by the state of the
+package cache, so frontends can show the updates of the last run while the
+package cache is still being opened.
+
+.. versionadded:: 0.200.6
+"""
+
+import logging
+import marshal
+import os
+import tempfile
+
+from UpdateManager.Backend import PackageInfoBase, PackageInfoStoreBase
+from UpdateManager.Backend import DependencyGraph, OriginInfo
+from UpdateManager.Backend import EMPTY_RELATION_VIEW
+
+LOG = logging.getLogger('UpdateManager.Backend.snapshot')
+
+SNAPSHOT_PATH = '/var/cache/update-manager/update-plans'
+""" Default snapshot file path """
+
+KEY_PATHS = ('/var/cache/apt/pkgcache.bin', '/var/lib/dpkg/status',
+             '/var/lib/apt/lists')
+""" Paths whose modification times and sizes form the snapshot key """
+
+FORMAT_VERSION = 2
+""" Snapshot file format version """
+
+COLUMNS = ('name', 'installed_version', 'candidate_version',
+           'download_size', 'category', 'summary', 'source', 'uri',
+           'origin', 'installed', 'broken')
+""" Per-package columns stored in a snapshot.
+
+Descriptions are not stored, and summaries and source package names only
+for the packages of a plan, not for those referenced by relations only:
+they are read from the package records, which writing a snapshot should
+not have to load.
+"""
+
+RELATION_GETTERS = ('get_dependencies', 'get_strict_dependencies',
+                    'get_reverse_dependencies',
+                    'get_strict_reverse_dependencies',
+                    'get_uninstalled_dependencies', 'get_conflicts')
+""" :class:`UpdateManager.Backend.PackageInfoBase` relation getters stored in
+a snapshot. Their names are used as relation kinds in the graphs of loaded
+stores.
+"""
+
+def get_cache_key(paths=KEY_PATHS):
+    """ Returns the snapshot key for the current package cache state.
+
+    :param paths: Paths to include in the key.
+    :returns: A tuple of (path, modification time, size) tuples, with None
+      as time and size for missing paths.
+    """
+    key = []
+    for path in paths:
+        try:
+            stat_info = os.stat(path)
+            key.append((path, stat_info.st_mtime, stat_info.st_size))
+        except OSError:
+            key.append((path, None, None))
+    return tuple(key)
+
+def _encode_plan(pkginfo_store):
+    """ Converts a store to a dictionary of columns and relations. """
+    columns = {}
+    for column in COLUMNS:
+        columns[column] = []
+    origins = []
+    origin_ids = {}
+    rows = {}
+
+    def add_row(pkg_info, listed=False):
+        pkg_name = pkg_info.get_package_name()
+        row = rows.get(pkg_name)
+        if row is not None:
+            return row
+        row = len(columns['name'])
+        rows[pkg_name] = row
+
+        origin = pkg_info.get_candidate_origin()
+        origin_id = -1
+        if origin is not None:
+            origin_key = (origin.archive, origin.label, origin.origin,
+                          origin.component, origin.site, origin.trusted)
+            origin_id = origin_ids.get(origin_key)
+            if origin_id is None:
+                origin_id = len(origins)
+                origin_ids[origin_key] = origin_id
+                origins.append(origin_key)
+
+        columns['name'].append(pkg_name)
+        columns['installed_version'].append(
+            pkg_info.get_installed_version())
+        columns['candidate_version'].append(
+            pkg_info.get_candidate_version())
+        columns['download_size'].append(pkg_info.get_download_size())
+        columns['category'].append(pkg_info.get_update_category())
+        if listed:
+            columns['summary'].append(pkg_info.get_summary())
+            columns['source'].append(pkg_info.get_source_package_name())
+        else:
+            columns['summary'].append(None)
+            columns['source'].append(None)
+        columns['uri'].append(pkg_info.get_candidate_uri())
+        columns['origin'].append(origin_id)
+        columns['installed'].append(pkg_info.is_installed())
+        columns['broken'].append(pkg_info.is_broken())
+        return row
+
+    packages = pkginfo_store.get_package_list()
+    for pkg_info in packages:
+        add_row(pkg_info, True)
+    package_count = len(packages)
+    removals = [add_row(pkg_info) for pkg_info in
+                pkginfo_store.get_removals()]
+
+    relations = {}
+    for getter_name in RELATION_GETTERS:
+        sources = []
+        targets = []
+        for pkg_info in packages:
+            row = rows[pkg_info.get_package_name()]
+            for other in getattr(pkg_info, getter_name)():
+                sources.append(row)
+                targets.append(add_row(other))
+        relations[getter_name] = (sources, targets)
+
+    return {'columns': columns, 'origins': origins,
+            'package_count': package_count, 'removals': removals,
+            'relations': relations}
+
+def save_snapshot(plans, key, path=SNAPSHOT_PATH):
+    """ Saves update plans.
+
+    The file is replaced atomically. Errors are logged and ignored.
+
+    :param plans: A dictionary of plan IDs (integers) and
+      :class:`UpdateManager.Backend.PackageInfoStoreBase` objects.
+    :param key: Cache key, as returned by :func:`get_cache_key`.
+    :param path: Snapshot file path.
+    :returns: True if the snapshot has been written, False otherwise.
+    """
+    data = {'version': FORMAT_VERSION, 'key': key, 'plans': {}}
+    for plan_id, pkginfo_store in plans.items():
+        data['plans'][plan_id] = _encode_plan(pkginfo_store)
+
+    directory = os.path.dirname(path)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            os.write(fd, marshal.dumps(data))
+        finally:
+            os.close(fd)
+        os.rename(tmp_path, path)
+    except (IOError, OSError, ValueError), e:
+        LOG.debug('Could not write snapshot %s: %s', path, e)
+        return False
+    LOG.debug('Snapshot written to %s.', path)
+    return True
+
+def load_snapshot(key, path=SNAPSHOT_PATH):
+    """ Loads update plans.
+
+    :param key: Expected cache key, as returned by :func:`get_cache_key`.
+    :param path: Snapshot file path.
+    :returns: A dictionary of plan IDs and :class:`SnapshotStore` objects
+      or None if there is no snapshot for the given key.
+    """
+    try:
+        snapshot_file = open(path, 'rb')
+        try:
+            data = marshal.load(snapshot_file)
+        finally:
+            snapshot_file.close()
+    except (IOError, OSError, EOFError, ValueError, TypeError), e:
+        LOG.debug('Could not read snapshot %s: %s', path, e)
+        return None
+
+    if not isinstance(data, dict) \
+           or data.get('version') != FORMAT_VERSION:
+        LOG.debug('Ignoring snapshot %s with unknown format.', path)
+        return None
+    if data.get('key') != key:
+        LOG.debug('Ignoring outdated snapshot %s.', path)
+        return None
+
+    plans = {}
+    for plan_id, plan in data['plans'].items():
+        plans[plan_id] = SnapshotStore(plan)
+    return plans
+
+class SnapshotPackageInfo(PackageInfoBase):
+    """ Read-only :class:`UpdateManager.Backend.PackageInfoBase`
+    implementation backed by the columns of a snapshot.
+
+    Objects of this class cannot be committed, they are only meant to be
+    displayed.
+    """
+    __slots__ = ('_columns', '_row', '_origin', '_graph', '_node_id',
+                 '__weakref__',
+                 # Selection state, set by the frontends.
+                 'active')
+
+    def __init__(self, columns, row, origin):
+        PackageInfoBase.__init__(self)
+        self._columns = columns
+        self._row = row
+        self._origin = origin
+        self._graph = None
+        self._node_id = None
+
+    def _set_graph_node(self, graph, node_id):
+        """ Sets the dependency graph the package is part of. """
+        self._graph = graph
+        self._node_id = node_id
+
+    def _get_relation(self, kind):
+        """ Returns a read-only view on the related packages of a kind. """
+        if self._graph is None:
+            return EMPTY_RELATION_VIEW
+        return self._graph.get_view(kind, self._node_id)
+
+    def _resolve_dependencies(self, pkginfo_store):
+        """ Relations are loaded with the snapshot. """
+        pass
+
+    def is_broken(self):
+        """ Returns whether the package is broken or not """
+        return self._columns['broken'][self._row]
+
+    def get_package_name(self):
+        """ Returns the package name """
+        return self._columns['name'][self._row]
+
+    def get_installed_version(self):
+        """ Returns the installed version """
+        return self._columns['installed_version'][self._row]
+
+    def get_candidate_version(self):
+        """ Returns the candidate version """
+        return self._columns['candidate_version'][self._row]
+
+    def get_update_category(self):
+        """ Returns the update category """
+        return self._columns['category'][self._row]
+
+    def get_download_size(self):
+        """ Returns the download size in bytes """
+        return self._columns['download_size'][self._row]
+
+    def get_summary(self):
+        """ Returns the package summary (short description) """
+        return self._columns['summary'][self._row]
+
+    def get_candidate_origin(self):
+        """ Returns the interned origin record """
+        return self._origin
+
+    def get_candidate_archive_name(self):
+        """ Returns the archive name """
+        if not self._origin:
+            return None
+        return self._origin.archive
+
+    def get_candidate_origin_label(self):
+        """ Returns the origin label """
+        if not self._origin:
+            return None
+        return self._origin.label
+
+    def get_candidate_origin_name(self):
+        """ Returns the origin name """
+        if not self._origin:
+            return None
+        return self._origin.origin
+
+    def get_candidate_component_name(self):
+        """ Returns the component name """
+        if not self._origin:
+            return None
+        return self._origin.component
+
+    def candidate_origin_is_trusted(self):
+        """ Returns true if the origin is trusted """
+        if not self._origin:
+            return False
+        return self._origin.trusted
+
+    def get_description(self):
+        """ Returns the package summary, descriptions are not stored in
+        snapshots.
+        """
+        return self._columns['summary'][self._row]
+
+    def get_source_package_name(self):
+        """ Returns the source package name """
+        return self._columns['source'][self._row]
+
+    def get_candidate_uri(self):
+        """ Returns the candidate uri """
+        return self._columns['uri'][self._row]
+
+    def get_candidate_architecture(self):
+        """ Returns the candidate's architecture, taken from the archive
+        file name of the candidate uri.
+        """
+        uri = self.get_candidate_uri()
+        if not uri or not uri.endswith('.deb'):
+            return None
+        return uri[uri.rfind('_') + 1:-len('.deb')]
+
+    def is_installed(self):
+        """ Returns whether the package is installed or not """
+        return self._columns['installed'][self._row]
+
+    def get_dependencies(self):
+        """ Returns the list of dependencies """
+        return self._get_relation('get_dependencies')
+
+    def get_strict_dependencies(self):
+        """ Returns the list of strict dependencies """
+        return self._get_relation('get_strict_dependencies')
+
+    def get_reverse_dependencies(self):
+        """ Returns the list of reverse dependencies """
+        return self._get_relation('get_reverse_dependencies')
+
+    def get_strict_reverse_dependencies(self):
+        """ Returns the list of strict reverse dependencies """
+        return self._get_relation('get_strict_reverse_dependencies')
+
+    def get_uninstalled_dependencies(self):
+        """ Returns a list of dependencies that are not installed. """
+        return self._get_relation('get_uninstalled_dependencies')
+
+    def get_conflicts(self):
+        """ Returns list of conflicting packages """
+        return self._get_relation('get_conflicts')
+
+class SnapshotStore(PackageInfoStoreBase):
+    """ :class:`UpdateManager.Backend.PackageInfoStoreBase` holding the
+    packages of a loaded snapshot plan.
+
+    :param plan: Plan data, as stored in the snapshot file.
+    """
+    def __init__(self, plan, *args, **kwargs):
+        PackageInfoStoreBase.__init__(self, *args, **kwargs)
+        columns = plan['columns']
+        origins = []
+        for origin in plan['origins']:
+            origins.append(OriginInfo.intern(*origin))
+
+        # Rows without a package in the store are referenced by relations
+        # only. The graph keeps hard references to them.
+        rows = []
+        graph = DependencyGraph()
+        for row in xrange(len(columns['name'])):
+            origin_id = columns['origin'][row]
+            origin = None
+            if origin_id >= 0:
+                origin = origins[origin_id]
+            pkg_info = SnapshotPackageInfo(columns, row, origin)
+            rows.append(pkg_info)
+            if row < plan['package_count']:
+                self.add_package(pkg_info)
+                graph.add_node(self.get_package(pkg_info.get_package_name()))
+            else:
+                graph.add_node(pkg_info)
+        for row in plan['removals']:
+            self.add_removal(rows[row])
+
+        for kind, (sources, targets) in plan['relations'].items():
+            for index in xrange(len(sources)):
+                graph.add_edge(kind, sources[index], targets[index])
+        self._graph = graph
+
+    def resolve_dependencies(self):
+        """ Relations are loaded with the snapshot, so there is nothing to
+        resolve.
+        """
+        pass
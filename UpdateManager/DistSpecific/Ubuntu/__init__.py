@@ -43,13 +43,30 @@ class UbuntuDist(DistBase):
 
     def get_update_category(self, pkg_info):
         """ Returns the update category """
+        origin_info = pkg_info.get_candidate_origin()
+        if not origin_info:
+            return UPDATE_CATEGORY.THIRDPARTY
+
+        # Origin records are shared between packages, so the category
+        # only needs to be detected once per origin.
+        cat_id = self._origin_categories.get(origin_info)
+        if cat_id is None:
+            cat_id = self._get_origin_category(origin_info)
+            self._origin_categories[origin_info] = cat_id
+        return cat_id
+
+    def _get_origin_category(self, origin_info):
+        """ Returns the update category for a given origin
+
+        :param origin_info: :class:`UpdateManager.Backend.OriginInfo` object
+        """
         # We detect the update category using the
         # origin's label, archive name and whether its
         # trusted or not.
-        label = pkg_info.get_candidate_origin_label()
-        archive = pkg_info.get_candidate_archive_name()
-        origin = pkg_info.get_candidate_origin_name()
-        trusted = pkg_info.candidate_origin_is_trusted()
+        label = origin_info.label
+        archive = origin_info.archive
+        origin = origin_info.origin
+        trusted = origin_info.trusted
         
         # Untrusted updates are most likely unofficial ones, so
         # we only need to check whether the source is trusted first.
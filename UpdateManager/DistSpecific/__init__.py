@@ -22,6 +22,8 @@
 
 from gettext import gettext as _
 
+from UpdateManager.DistSpecific.changelog import get_changelog_key
+from UpdateManager.DistSpecific.changelogcache import get_changelog_cache
 from UpdateManager.Util.enum import Enum
 
 """ Distribution specific functionality """
@@ -53,14 +55,23 @@ class DistBase(object):
     This class defines the API available to update-manager's core.
     
     Implementations *must* be subclasses of this base class.
+
+    .. versionchanged:: 0.200.6
+       Added the changelog_cache parameter.
     """
     def __init__(self, name=None, changelog_fetcher=None,
-                 distupgrade_check=False):
+                 distupgrade_check=False, changelog_cache=None):
         assert(name != None)
         assert(changelog_fetcher != None)
         self._name = name
         self._changelog_fetcher = changelog_fetcher
+        if changelog_cache is None:
+            changelog_cache = get_changelog_cache()
+        self._changelog_cache = changelog_cache
         self._distupgrade_check = distupgrade_check
+        # Update category cache for implementations classifying updates
+        # by their (interned) origin record.
+        self._origin_categories = {}
         
     @classmethod
     def has_distupgrade_check(cls):
@@ -110,16 +121,27 @@ class DistBase(object):
 
     def get_changelog(self, pkg_info, changelog_handler):
         """
-        Starts a changelog fetch thread and calls the given
-        handler object accordingly.
+        Starts a changelog fetch and calls the given handler object
+        accordingly.
+
+        Entries in the changelog cache that do not need to be revalidated
+        are passed to the handler right away, without a fetch.
 
         :param pkg_info: :class:`UpdateManager.Backend.PackageInfoBase`
           object
         :param changelog_handler:
           :class:`UpdateManager.DistSpecific.changelog.ChangelogHandler`
           object
+
+        .. versionchanged:: 0.200.6
+           Uses the changelog cache.
         """
-        self._changelog_fetcher(pkg_info, changelog_handler)
+        text = self._changelog_cache.get(get_changelog_key(pkg_info))
+        if text is not None:
+            changelog_handler.changelog_finished(pkg_info, text)
+            return
+        self._changelog_fetcher(pkg_info, changelog_handler,
+                                cache=self._changelog_cache)
 
     def get_bug_script_name(self):
         """ Optionally returns the name of a bug script to use for bug
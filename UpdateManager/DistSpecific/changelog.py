@@ -20,13 +20,19 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
 #  USA.
 
-""" Changelog fetcher functionality """
+""" Changelog fetcher functionality
+
+Changelog entries are fetched by a shared, bounded pool of worker threads
+(see :class:`ChangelogFetchPool`). Requests for the same source package
+version are merged while a fetch is in flight, and its result is passed
+on to every handler waiting for it.
+"""
 
 import logging
+import threading
 import urllib2
 
-from threading import Thread
-
+from UpdateManager.DistSpecific.localchangelog import LocalChangelogSource
 from UpdateManager.Util.enum import Enum
 
 LOG = logging.getLogger('UpdateManager.DistSpecific.changelog')
@@ -36,12 +42,33 @@ CHANGELOG_FETCH_STATUS = Enum(
     DONE = "Fetching finished")
 """ Changelog fetcher status """
 
+MAX_FETCH_WORKERS = 3
+""" Maximum number of changelog entries fetched concurrently
+
+.. versionadded:: 0.200.6
+"""
+
+PREFETCH_RESERVED_WORKERS = 1
+""" Number of fetch workers :class:`ChangelogPrefetcher` leaves idle for
+requests of the user
+
+.. versionadded:: 0.200.6
+"""
+
 class ChangelogFetcherException(Exception):
     """ Changelog fetcher exception """
     pass
 
 class ChangelogHandler(object):
     """ Changelog result handler """
+
+    low_priority = False
+    """ Whether the requests of this handler are speculative and fetched
+    after all others.
+
+    .. versionadded:: 0.200.6
+    """
+
     def changelog_finished(self, pkg_info, raw_changelog):
         """ Changelog fetching finished notification
 
@@ -58,54 +85,357 @@ class ChangelogHandler(object):
         """
         raise NotImplementedError
 
+def get_changelog_key(pkg_info):
+    """ Returns the key changelog requests are merged by.
+
+    :param pkg_info: :class:`UpdateManager.Backend.PackageInfoBase` object
+    :returns: (source package name, candidate version) tuple
+
+    .. versionadded:: 0.200.6
+    """
+    return (pkg_info.get_source_package_name(),
+            pkg_info.get_candidate_version())
+
+class _FetchJob(object):
+    """ A queued or running fetch and the requests waiting for it. """
+    def __init__(self, fetcher, low_priority):
+        self.fetcher = fetcher
+        self.low_priority = low_priority
+        self.waiters = []
+
+    def add_waiter(self, pkg_info, handler):
+        """ Adds a request, unless the same one is already waiting. """
+        for waiting_pkg_info, waiting_handler in self.waiters:
+            if waiting_pkg_info is pkg_info and waiting_handler is handler:
+                return
+        self.waiters.append((pkg_info, handler))
+
+class ChangelogFetchPool(object):
+    """ Bounded pool of changelog fetch workers.
+
+    Worker threads are started on demand, up to max_workers of them, and
+    exit once no fetches are queued. Requests with a key of a queued or
+    running fetch do not start another one but wait for its result.
+
+    Queued fetches requested by low priority handlers only (see
+    :attr:`ChangelogHandler.low_priority`) are started after all others.
+
+    :param max_workers: Maximum number of concurrent fetches.
+
+    .. versionadded:: 0.200.6
+    """
+    def __init__(self, max_workers=MAX_FETCH_WORKERS):
+        self._max_workers = max(1, max_workers)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._queue = []
+        self._workers = 0
+        self._busy = 0
+
+    def submit(self, key, fetcher, pkg_info, handler):
+        """ Requests a changelog fetch.
+
+        :param key: Key the request is merged by, see
+          :func:`get_changelog_key`.
+        :param fetcher: :class:`ChangelogFetcher` object doing the fetch
+          if none is in flight for key.
+        :param pkg_info: :class:`UpdateManager.Backend.PackageInfoBase`
+          object passed to the handler.
+        :param handler: :class:`ChangelogHandler` object.
+        :returns: True if a new fetch has been queued, False if the
+          request has been merged with one in flight.
+        """
+        low_priority = getattr(handler, 'low_priority', False)
+        self._lock.acquire()
+        try:
+            if self._jobs.has_key(key):
+                LOG.debug("Changelog fetch for %s %s already in flight.",
+                          key[0], key[1])
+                job = self._jobs[key]
+                job.add_waiter(pkg_info, handler)
+                if job.low_priority and not low_priority:
+                    job.low_priority = False
+                    if key in self._queue:
+                        self._queue.remove(key)
+                        self._enqueue(key, job)
+                return False
+            job = _FetchJob(fetcher, low_priority)
+            job.add_waiter(pkg_info, handler)
+            self._jobs[key] = job
+            self._enqueue(key, job)
+            start_worker = self._workers < self._max_workers
+            if start_worker:
+                self._workers += 1
+        finally:
+            self._lock.release()
+
+        if start_worker:
+            thread = threading.Thread(target=self._work,
+                                      name="changelogfetcher")
+            thread.setDaemon(True)
+            thread.start()
+        return True
+
+    def _enqueue(self, key, job):
+        """ Queues a fetch behind all others of the same or a higher
+        priority. Must be called with the lock held.
+        """
+        if job.low_priority:
+            self._queue.append(key)
+            return
+        index = 0
+        for queued_key in self._queue:
+            if self._jobs[queued_key].low_priority:
+                break
+            index += 1
+        self._queue.insert(index, key)
+
+    def withdraw(self, handler):
+        """ Withdraws all requests of a handler.
+
+        The handler is not notified about the fetches it has requested
+        anymore. Queued fetches no other handler waits for are dropped,
+        running ones are finished.
+
+        :param handler: :class:`ChangelogHandler` object.
+        """
+        self._lock.acquire()
+        try:
+            for key, job in self._jobs.items():
+                waiters = []
+                for waiter in job.waiters:
+                    if waiter[1] is not handler:
+                        waiters.append(waiter)
+                job.waiters = waiters
+                if not waiters and key in self._queue:
+                    self._queue.remove(key)
+                    del self._jobs[key]
+        finally:
+            self._lock.release()
+
+    def is_in_flight(self, key):
+        """ Returns whether a fetch for key is queued or running.
+
+        :param key: Request key, see :func:`get_changelog_key`.
+        """
+        self._lock.acquire()
+        try:
+            return self._jobs.has_key(key)
+        finally:
+            self._lock.release()
+
+    def get_idle_capacity(self):
+        """ Returns the number of fetches that could be started without
+        waiting for a running one.
+        """
+        self._lock.acquire()
+        try:
+            return max(0, self._max_workers - self._busy - len(self._queue))
+        finally:
+            self._lock.release()
+
+    def _work(self):
+        """ Worker thread main loop """
+        exited = False
+        try:
+            while True:
+                self._lock.acquire()
+                try:
+                    if not self._queue:
+                        self._workers -= 1
+                        exited = True
+                        return
+                    key = self._queue.pop(0)
+                    job = self._jobs[key]
+                    self._busy += 1
+                finally:
+                    self._lock.release()
+
+                text = None
+                error_message = None
+                try:
+                    try:
+                        text = job.fetcher._do_fetch()
+                    except ChangelogFetcherException, exc:
+                        error_message = str(exc)
+                    except Exception, exc:
+                        LOG.exception('Fetching the changelog entry for %s '
+                                      'failed.', key[0])
+                        error_message = str(exc)
+                finally:
+                    self._lock.acquire()
+                    try:
+                        del self._jobs[key]
+                        self._busy -= 1
+                        waiters = job.waiters
+                    finally:
+                        self._lock.release()
+
+                for pkg_info, handler in waiters:
+                    self._notify(key, pkg_info, handler, text, error_message)
+        finally:
+            if not exited:
+                # The worker died, free its slot.
+                self._lock.acquire()
+                try:
+                    self._workers -= 1
+                finally:
+                    self._lock.release()
+
+    def _notify(self, key, pkg_info, handler, text, error_message):
+        """ Passes the result of a fetch to a handler.
+
+        Exceptions raised by the handler are logged, so they neither end
+        the worker nor keep other handlers from being notified.
+        """
+        try:
+            if error_message is None:
+                handler.changelog_finished(pkg_info, text)
+            else:
+                handler.changelog_failure(pkg_info, error_message)
+        except Exception:
+            LOG.exception('Changelog handler %r failed for %s.', handler,
+                          key[0])
+
+_FETCH_POOL = None
+_FETCH_POOL_LOCK = threading.Lock()
+
+def get_fetch_pool():
+    """ Returns the :class:`ChangelogFetchPool` object shared by all
+    changelog fetchers.
+
+    .. versionadded:: 0.200.6
+    """
+    global _FETCH_POOL
+    _FETCH_POOL_LOCK.acquire()
+    try:
+        if _FETCH_POOL is None:
+            _FETCH_POOL = ChangelogFetchPool()
+        return _FETCH_POOL
+    finally:
+        _FETCH_POOL_LOCK.release()
+
 class ChangelogFetcher(object):
     """ Changelog Fetcher base class.
 
     This class must be subclassed by all ChangelogFetcher implementations.
+
+    :param pkg_info: :class:`UpdateManager.Backend.PackageInfoBase` object
+    :param changelog_handler: :class:`ChangelogHandler` object
+    :param pool: :class:`ChangelogFetchPool` object, defaults to the
+      shared pool.
+    :param cache:
+      :class:`UpdateManager.DistSpecific.changelogcache.ChangelogCache`
+      object fetched entries are stored in, or None.
+
+    .. versionchanged:: 0.200.6
+       Fetches are run by a :class:`ChangelogFetchPool` instead of a
+       thread per request. Added the cache parameter.
     """
-    def __init__(self, pkg_info, changelog_handler):
+    def __init__(self, pkg_info, changelog_handler, pool=None, cache=None):
         self._pkg_info = pkg_info
         self._handler = changelog_handler
+        self._cache = cache
 
-        LOG.debug("Fetching changelog entry for %s.",
-                  pkg_info.get_package_name())
-        name = "changelogfetcher-%s" % (pkg_info.get_package_name())
-        Thread(target = self._do_fetch, name = name).start()
+        if pool is None:
+            pool = get_fetch_pool()
+        if pool.submit(get_changelog_key(pkg_info), self, pkg_info,
+                       changelog_handler):
+            LOG.debug("Fetching changelog entry for %s.",
+                      pkg_info.get_package_name())
 
     def _do_fetch(self):
-        """ The actual worker method.
+        """ The actual worker method, called in a pool worker thread.
 
         This method must be overridden.
+
+        :returns: The changelog entry as a string.
+        :raises: :class:`ChangelogFetcherException` if fetching failed.
+
+        .. versionchanged:: 0.200.6
+           Returns the entry instead of calling the handler.
         """
         raise NotImplementedError
     
 class HTTPChangelogFetcher(ChangelogFetcher):
-    """ Simple HTTP Changelog Fetcher """
+    """ Simple HTTP Changelog Fetcher
+
+    .. versionchanged:: 0.200.6
+       Entries are stored in the cache, and cached entries are
+       revalidated with conditional requests. A cached entry is used if
+       the server cannot be reached or answers with an error. Entries
+       available from :attr:`local_source` are not fetched at all.
+    """
+
+    local_source = LocalChangelogSource()
+    """ :class:`UpdateManager.DistSpecific.localchangelog.LocalChangelogSource`
+    object looked up before fetching an entry, or None.
+
+    .. versionadded:: 0.200.6
+    """
 
     def _do_fetch(self):
         """ HTTP worker implementation """
+        key = get_changelog_key(self._pkg_info)
+        if self.local_source is not None:
+            text = self.local_source.get_changelog(self._pkg_info)
+            if text is not None:
+                if self._cache is not None:
+                    self._cache.store(key, text)
+                return text
+
         LOG.debug("Getting changelog URL for package %r", self._pkg_info)
         url = self._get_changelog_url(self._pkg_info)
+        cached = None
+        if self._cache is not None:
+            cached = self._cache.lookup(key)
+        request = urllib2.Request(url)
+        if cached is not None:
+            for header, value in cached.get_validators().items():
+                request.add_header(header, value)
         found_double_dash = False
         try:
             LOG.debug("Fetching %s...", url)
-            connection = urllib2.urlopen(url)
+            connection = urllib2.urlopen(request)
             text = ""
             
             while not found_double_dash:
                 line = connection.readline()
+                if not line:
+                    break
                 if line.startswith(' -- '):
                     LOG.debug("Found double-dash sequence, closing stream.")
                     found_double_dash = True
                 text += line
                 
+            headers = connection.info()
             connection.close()
-            
-            self._handler.changelog_finished(self._pkg_info, text)
+
+            if self._cache is not None:
+                self._cache.store(key, text, headers.getheader('ETag'),
+                                  headers.getheader('Last-Modified'))
+            return text
+        except urllib2.HTTPError, exc:
+            if exc.code == 304 and cached is not None:
+                LOG.debug("Cached changelog of %s %s is still valid.",
+                          key[0], key[1])
+                self._cache.refresh(key)
+                return cached.text
+            if cached is not None:
+                LOG.warning('Revalidating the cached changelog entry '
+                            'failed, using it anyway: %s', exc)
+                return cached.text
+            LOG.error('Fetching the changelog entry via HTTP failed: %s',
+                      exc)
+            raise ChangelogFetcherException(exc.message)
         except urllib2.URLError, exc:
+            if cached is not None:
+                LOG.warning('Revalidating the cached changelog entry '
+                            'failed, using it anyway: %s', exc)
+                return cached.text
             LOG.error('Fetching the changelog entry via HTTP failed: %s',
                       exc)
-            self._handler.changelog_failure(self._pkg_info, exc.message)
+            raise ChangelogFetcherException(exc.message)
 
     def _get_changelog_url(self, pkg_info):
         """ Gets the (distribution-specific) changelog URL.
@@ -116,3 +446,134 @@ class HTTPChangelogFetcher(ChangelogFetcher):
         This method must be overridden.
         """
         raise NotImplementedError
+
+class ChangelogPrefetcher(ChangelogHandler):
+    """ Speculatively fetches changelog entries.
+
+    Entries are requested through get_changelog, one after another, with
+    low priority and only as long as the pool has more than
+    :data:`PREFETCH_RESERVED_WORKERS` idle workers. Entries fetched are
+    passed on to the handler. Failures are not, so the entry is requested
+    again once it is actually needed.
+
+    :param get_changelog: Function requesting a changelog entry, called as
+      ``get_changelog(pkg_info, changelog_handler)``, usually
+      :meth:`UpdateManager.DistSpecific.DistBase.get_changelog`.
+    :param changelog_handler: :class:`ChangelogHandler` object results are
+      passed on to.
+    :param pool: :class:`ChangelogFetchPool` object, defaults to the
+      shared pool.
+    :param reserved_workers: Number of workers to leave idle.
+
+    .. versionadded:: 0.200.6
+    """
+
+    low_priority = True
+
+    def __init__(self, get_changelog, changelog_handler, pool=None,
+                 reserved_workers=PREFETCH_RESERVED_WORKERS):
+        self._get_changelog = get_changelog
+        self._handler = changelog_handler
+        if pool is None:
+            pool = get_fetch_pool()
+        self._pool = pool
+        self._reserved_workers = reserved_workers
+        self._lock = threading.Lock()
+        self._queue = []
+        # Packages requested since the last cancellation, by request key.
+        self._requested = {}
+        self._filling = False
+        self._refill = False
+
+    def prefetch(self, pkg_infos):
+        """ Replaces the packages waiting to be prefetched.
+
+        Entries already requested are neither requested again nor
+        withdrawn.
+
+        :param pkg_infos: List of
+          :class:`UpdateManager.Backend.PackageInfoBase` objects, in the
+          order they should be fetched in.
+        """
+        self._lock.acquire()
+        try:
+            self._queue = list(pkg_infos)
+        finally:
+            self._lock.release()
+        self._fill()
+
+    def cancel(self):
+        """ Drops all waiting packages and withdraws the requests made.
+
+        Results of requests made before are not passed on anymore.
+        """
+        self._lock.acquire()
+        try:
+            self._queue = []
+            self._requested = {}
+        finally:
+            self._lock.release()
+        self._pool.withdraw(self)
+
+    def _next(self):
+        """ Returns the next package to request or None. Must be called
+        with the lock held.
+        """
+        while self._queue:
+            if self._pool.get_idle_capacity() <= self._reserved_workers:
+                return None
+            pkg_info = self._queue.pop(0)
+            key = get_changelog_key(pkg_info)
+            if not self._requested.has_key(key):
+                self._requested[key] = pkg_info
+                return pkg_info
+        return None
+
+    def _fill(self):
+        """ Requests waiting packages while the pool has idle workers. """
+        self._lock.acquire()
+        try:
+            if self._filling:
+                # Results arriving while requesting may free workers.
+                self._refill = True
+                return
+            self._filling = True
+        finally:
+            self._lock.release()
+
+        while True:
+            self._lock.acquire()
+            try:
+                pkg_info = self._next()
+                if pkg_info is None:
+                    if not self._refill:
+                        self._filling = False
+                        return
+                    self._refill = False
+                    continue
+            finally:
+                self._lock.release()
+            self._get_changelog(pkg_info, self)
+
+    def _is_current(self, pkg_info):
+        """ Returns whether pkg_info has been requested since the last
+        cancellation.
+        """
+        self._lock.acquire()
+        try:
+            return self._requested.get(get_changelog_key(pkg_info)) \
+                   is pkg_info
+        finally:
+            self._lock.release()
+
+    def changelog_finished(self, pkg_info, raw_changelog):
+        """ ChangelogHandler changelog_finished method """
+        if self._is_current(pkg_info):
+            self._handler.changelog_finished(pkg_info, raw_changelog)
+        self._fill()
+
+    def changelog_failure(self, pkg_info, error_message):
+        """ ChangelogHandler changelog_failure method """
+        LOG.debug("Prefetching the changelog entry of %s failed: %s",
+                  pkg_info.get_package_name(), error_message)
+        self._fill()
@@ -0,0 +1,320 @@
+# UpdateManager/DistSpecific/changelogcache.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+""" Persistent changelog cache
+
+Fetched changelog entries are stored on disk, keyed by source package name
+and version (see :func:`UpdateManager.DistSpecific.changelog.get_changelog_key`),
+so they are available in later sessions without network access. The cache
+size is limited by evicting the least recently used entries.
+
+Entries younger than the maximum age are served without any network
+request. Older entries are revalidated by the fetchers, using the ETag
+and Last-Modified values stored with them.
+
+.. versionadded:: 0.200.6
+"""
+
+import atexit
+import logging
+import marshal
+import os
+import tempfile
+import threading
+import time
+import urllib
+
+LOG = logging.getLogger('UpdateManager.DistSpecific.changelogcache')
+
+CACHE_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+    'update-manager', 'changelogs')
+""" Default cache directory """
+
+MAX_CACHE_SIZE = 4 * 1024 * 1024
+""" Default maximum size of all cached entries, in bytes """
+
+MAX_AGE = 7 * 24 * 60 * 60
+""" Default time in seconds an entry is used without revalidation """
+
+INDEX_NAME = 'index'
+""" Name of the index file in the cache directory """
+
+FORMAT_VERSION = 1
+""" Index file format version """
+
+class ChangelogCacheEntry(object):
+    """ A cached changelog entry.
+
+    :param text: Changelog entry text.
+    :param fetched: Time the entry has been fetched or revalidated.
+    :param etag: ETag header value of the response, or None.
+    :param last_modified: Last-Modified header value of the response, or
+      None.
+    """
+    def __init__(self, text, fetched, etag=None, last_modified=None):
+        self.text = text
+        self.fetched = fetched
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def get_validators(self):
+        """ Returns the conditional request headers revalidating the entry
+        as a dictionary.
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class ChangelogCache(object):
+    """ On-disk changelog cache with LRU eviction.
+
+    Every entry is stored in a file of its own. The index file maps keys to
+    file name, size, validators and access times, and is replaced
+    atomically whenever an entry is stored or revalidated. Access times
+    updated by lookups are only written along with these changes or by
+    :meth:`flush`. The cache directory is read lazily, on first use. Errors
+    are logged and ignored, a failing cache behaves like an empty one.
+
+    :param path: Cache directory.
+    :param max_size: Maximum size of all entries in bytes.
+    :param max_age: Time in seconds an entry is used without revalidation.
+    """
+    def __init__(self, path=CACHE_PATH, max_size=MAX_CACHE_SIZE,
+                 max_age=MAX_AGE):
+        self._path = path
+        self._max_size = max_size
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._index = None
+        self._dirty = False
+
+    @staticmethod
+    def _get_file_name(key):
+        """ Returns the name of the file an entry is stored in. """
+        return urllib.quote('%s_%s' % key, safe='')
+
+    def _load_index(self):
+        """ Loads the index unless it has been loaded already.
+
+        Must be called with the lock held.
+        """
+        if self._index is not None:
+            return
+        self._index = {}
+        index_path = os.path.join(self._path, INDEX_NAME)
+        try:
+            index_file = open(index_path, 'rb')
+            try:
+                data = marshal.load(index_file)
+            finally:
+                index_file.close()
+        except (IOError, OSError, EOFError, ValueError, TypeError), e:
+            LOG.debug('Could not read changelog cache index %s: %s',
+                      index_path, e)
+            return
+        if not isinstance(data, dict) \
+               or data.get('version') != FORMAT_VERSION:
+            LOG.debug('Ignoring changelog cache index %s with unknown '
+                      'format.', index_path)
+            return
+        self._index = data['entries']
+
+    def _save_index(self):
+        """ Writes the index. Must be called with the lock held. """
+        data = {'version': FORMAT_VERSION, 'entries': self._index}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self._path)
+            try:
+                os.write(fd, marshal.dumps(data))
+            finally:
+                os.close(fd)
+            os.rename(tmp_path, os.path.join(self._path, INDEX_NAME))
+        except (IOError, OSError, ValueError), e:
+            LOG.debug('Could not write changelog cache index: %s', e)
+            return
+        self._dirty = False
+
+    def _remove(self, key):
+        """ Removes an entry. Must be called with the lock held. """
+        record = self._index.pop(key)
+        try:
+            os.unlink(os.path.join(self._path, record['file']))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """ Removes the least recently used entries until the cache fits
+        into the size limit. Must be called with the lock held.
+        """
+        total_size = 0
+        for record in self._index.values():
+            total_size += record['size']
+        if total_size <= self._max_size:
+            return
+        keys = self._index.keys()
+        keys.sort(key=lambda key: self._index[key]['accessed'])
+        for key in keys:
+            if total_size <= self._max_size:
+                break
+            LOG.debug('Evicting changelog of %s %s from cache.', key[0],
+                      key[1])
+            total_size -= self._index[key]['size']
+            self._remove(key)
+
+    def lookup(self, key):
+        """ Returns a cached entry, regardless of its age.
+
+        Looking up an entry counts as a use for the LRU order.
+
+        :param key: (source package name, version) tuple.
+        :returns: :class:`ChangelogCacheEntry` object or None.
+        """
+        self._lock.acquire()
+        try:
+            self._load_index()
+            record = self._index.get(key)
+            if record is None:
+                return None
+            try:
+                entry_file = open(os.path.join(self._path, record['file']),
+                                  'rb')
+                try:
+                    text = entry_file.read()
+                finally:
+                    entry_file.close()
+            except (IOError, OSError), e:
+                LOG.debug('Could not read cached changelog of %s %s: %s',
+                          key[0], key[1], e)
+                del self._index[key]
+                self._dirty = True
+                return None
+            record['accessed'] = time.time()
+            self._dirty = True
+            return ChangelogCacheEntry(text, record['fetched'],
+                                       record['etag'],
+                                       record['last_modified'])
+        finally:
+            self._lock.release()
+
+    def is_fresh(self, entry):
+        """ Returns whether an entry may be used without revalidation.
+
+        :param entry: :class:`ChangelogCacheEntry` object.
+        """
+        age = time.time() - entry.fetched
+        return 0 <= age < self._max_age
+
+    def get(self, key):
+        """ Returns the text of a cached entry that does not need to be
+        revalidated.
+
+        :param key: (source package name, version) tuple.
+        :returns: The changelog entry text, or None.
+        """
+        entry = self.lookup(key)
+        if entry is None or not self.is_fresh(entry):
+            return None
+        return entry.text
+
+    def store(self, key, text, etag=None, last_modified=None):
+        """ Stores an entry, evicting others if necessary.
+
+        :param key: (source package name, version) tuple.
+        :param text: Changelog entry text.
+        :param etag: ETag header value of the response.
+        :param last_modified: Last-Modified header value of the response.
+        """
+        self._lock.acquire()
+        try:
+            self._load_index()
+            file_name = self._get_file_name(key)
+            try:
+                if not os.path.isdir(self._path):
+                    os.makedirs(self._path)
+                fd, tmp_path = tempfile.mkstemp(dir=self._path)
+                try:
+                    os.write(fd, text)
+                finally:
+                    os.close(fd)
+                os.rename(tmp_path, os.path.join(self._path, file_name))
+            except (IOError, OSError), e:
+                LOG.debug('Could not cache changelog of %s %s: %s', key[0],
+                          key[1], e)
+                return
+            now = time.time()
+            self._index[key] = {'file': file_name, 'size': len(text),
+                                'fetched': now, 'accessed': now,
+                                'etag': etag,
+                                'last_modified': last_modified}
+            self._evict()
+            self._save_index()
+        finally:
+            self._lock.release()
+
+    def refresh(self, key):
+        """ Marks an entry as revalidated.
+
+        :param key: (source package name, version) tuple.
+        """
+        self._lock.acquire()
+        try:
+            self._load_index()
+            record = self._index.get(key)
+            if record is not None:
+                record['fetched'] = time.time()
+                self._save_index()
+        finally:
+            self._lock.release()
+
+    def flush(self):
+        """ Writes the index if lookups have changed it since it has been
+        written last.
+        """
+        self._lock.acquire()
+        try:
+            if self._dirty:
+                self._save_index()
+        finally:
+            self._lock.release()
+
+_CHANGELOG_CACHE = None
+_CHANGELOG_CACHE_LOCK = threading.Lock()
+
+def get_changelog_cache():
+    """ Returns the :class:`ChangelogCache` object shared by all
+    distributions and fetchers.
+
+    The cache's index is flushed when the interpreter exits.
+    """
+    global _CHANGELOG_CACHE
+    _CHANGELOG_CACHE_LOCK.acquire()
+    try:
+        if _CHANGELOG_CACHE is None:
+            _CHANGELOG_CACHE = ChangelogCache()
+            atexit.register(_CHANGELOG_CACHE.flush)
+        return _CHANGELOG_CACHE
+    finally:
+        _CHANGELOG_CACHE_LOCK.release()
@@ -0,0 +1,316 @@
+# UpdateManager/DistSpecific/localchangelog.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+""" Local changelog source
+
+Reads changelog entries from package archives that have already been
+downloaded, for example by a prefetch or an interrupted commit, and from
+the documentation of unpacked packages. Archives are read as a stream:
+the ar container and the data tarball are walked member by member and
+decompression stops at the end of the first changelog entry, nothing is
+extracted to disk.
+
+.. versionadded:: 0.200.6
+"""
+
+import logging
+import os
+import subprocess
+import tarfile
+import threading
+import zlib
+
+LOG = logging.getLogger('UpdateManager.DistSpecific.localchangelog')
+
+ARCHIVE_DIR = '/var/cache/apt/archives'
+""" Directory downloaded package archives are stored in """
+
+DOC_DIR = '/usr/share/doc'
+""" Directory package documentation is installed to """
+
+CHANGELOG_NAMES = ('changelog.Debian.gz', 'changelog.gz')
+""" Changelog file names in a package's documentation directory, in the
+order they are looked for
+"""
+
+TAR_MODES = {
+    '': 'r|',
+    '.gz': 'r|gz',
+    '.bz2': 'r|bz2',
+    }
+""" tarfile stream modes of the data tarball compressions tarfile can read
+itself, by file name extension
+"""
+
+DECOMPRESSORS = {
+    '.xz': ('xz', '--decompress', '--stdout'),
+    '.lzma': ('xz', '--format=lzma', '--decompress', '--stdout'),
+    '.zst': ('zstd', '--decompress', '--stdout'),
+    }
+""" Commands decompressing data tarballs tarfile cannot read, by file
+name extension. Archives needing a command that is not installed are
+treated like archives without a changelog.
+"""
+
+AR_MAGIC = '!<arch>\n'
+AR_HEADER_SIZE = 60
+READ_SIZE = 16384
+
+class _MemberReader(object):
+    """ File-like object reading a single member of an ar archive. """
+    def __init__(self, fileobj, size):
+        self._fileobj = fileobj
+        self._remaining = size
+
+    def read(self, size=-1):
+        """ Reads up to size bytes, or the rest of the member. """
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._fileobj.read(size)
+        self._remaining -= len(data)
+        return data
+
+def _read_first_entry(fileobj):
+    """ Decompresses a gzip-compressed changelog up to the end of its first
+    entry.
+
+    :param fileobj: File-like object providing the compressed changelog.
+    :returns: The first entry as a string, or None if none has been found.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    text = ''
+    offset = 0
+    while True:
+        data = fileobj.read(READ_SIZE)
+        if data:
+            text += decompressor.decompress(data)
+        else:
+            text += decompressor.flush()
+        while True:
+            end = text.find('\n', offset)
+            if end < 0:
+                break
+            if text.startswith(' -- ', offset):
+                return text[:end + 1]
+            offset = end + 1
+        if not data:
+            return None
+
+def _get_entry_version(text):
+    """ Returns the version in the header line of a changelog entry. """
+    start = text.find('(')
+    end = text.find(')', start)
+    if start < 0 or end < 0 or text.find('\n') < end:
+        return None
+    return text[start + 1:end]
+
+def _is_entry_of(text, version):
+    """ Returns whether text is the changelog entry of a version. """
+    entry_version = _get_entry_version(text)
+    if entry_version == version:
+        return True
+    # Binary-only rebuilds (1.0-1+b2) are described by the entry of the
+    # version they are based on.
+    base_version, separator, rebuild = version.rpartition('+b')
+    return bool(separator) and rebuild.isdigit() \
+           and entry_version == base_version
+
+def _find_in_tar(tar_stream, mode, member_paths):
+    """ Returns the first entry of the changelog found in a tar stream. """
+    tar = tarfile.open(fileobj=tar_stream, mode=mode)
+    try:
+        for member in tar:
+            name = member.name
+            if name.startswith('./'):
+                name = name[2:]
+            if name in member_paths and member.isfile():
+                return _read_first_entry(tar.extractfile(member))
+    finally:
+        tar.close()
+    return None
+
+def read_archive_changelog(path, pkg_name):
+    """ Reads the first changelog entry of a package archive.
+
+    :param path: Path of the package archive.
+    :param pkg_name: Name of the binary package.
+    :returns: The entry as a string, or None if the archive could not be
+      read or does not contain a changelog.
+    """
+    member_paths = []
+    for changelog_name in CHANGELOG_NAMES:
+        member_paths.append('usr/share/doc/%s/%s' % (pkg_name,
+                                                     changelog_name))
+    try:
+        deb_file = open(path, 'rb')
+    except IOError, e:
+        LOG.debug('Could not open %s: %s', path, e)
+        return None
+    try:
+        try:
+            if deb_file.read(len(AR_MAGIC)) != AR_MAGIC:
+                LOG.debug('%s is not an ar archive.', path)
+                return None
+            while True:
+                header = deb_file.read(AR_HEADER_SIZE)
+                if len(header) < AR_HEADER_SIZE:
+                    return None
+                name = header[:16].rstrip().rstrip('/')
+                size = int(header[48:58])
+                if not name.startswith('data.tar'):
+                    deb_file.seek(size + size % 2, 1)
+                    continue
+
+                extension = name[len('data.tar'):]
+                if TAR_MODES.has_key(extension):
+                    return _find_in_tar(_MemberReader(deb_file, size),
+                                        TAR_MODES[extension], member_paths)
+                if not DECOMPRESSORS.has_key(extension):
+                    LOG.debug('Unsupported data member %s in %s.', name,
+                              path)
+                    return None
+                return _decompress_and_find(deb_file, size, extension,
+                                            member_paths)
+        except (IOError, OSError, ValueError, EOFError, zlib.error,
+                tarfile.TarError), e:
+            LOG.debug('Could not read the changelog from %s: %s', path, e)
+            return None
+    finally:
+        deb_file.close()
+
+def _decompress_and_find(deb_file, size, extension, member_paths):
+    """ Pipes a data member through its decompression command and looks
+    for the changelog in the output.
+    """
+    command = DECOMPRESSORS[extension]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               stderr=open(os.devnull, 'w'))
+    reader = _MemberReader(deb_file, size)
+
+    # Feeding the decompressor from a thread keeps both pipes moving.
+    def feed():
+        try:
+            while True:
+                data = reader.read(READ_SIZE)
+                if not data:
+                    break
+                process.stdin.write(data)
+        except (IOError, OSError, ValueError):
+            pass
+        try:
+            process.stdin.close()
+        except (IOError, OSError):
+            pass
+    feeder = threading.Thread(target=feed, name='changelogdecompressor')
+    feeder.setDaemon(True)
+    feeder.start()
+    try:
+        return _find_in_tar(process.stdout, 'r|', member_paths)
+    finally:
+        if process.poll() is None:
+            try:
+                process.terminate()
+            except OSError:
+                pass
+        process.stdout.close()
+        feeder.join()
+        process.wait()
+
+def read_installed_changelog(pkg_name, version, doc_dir=DOC_DIR):
+    """ Reads the first changelog entry of an unpacked package if it
+    belongs to the given version.
+
+    :param pkg_name: Name of the binary package.
+    :param version: Expected version.
+    :param doc_dir: Documentation directory.
+    :returns: The entry as a string, or None.
+    """
+    for changelog_name in CHANGELOG_NAMES:
+        path = os.path.join(doc_dir, pkg_name, changelog_name)
+        try:
+            changelog_file = open(path, 'rb')
+        except IOError:
+            continue
+        try:
+            try:
+                text = _read_first_entry(changelog_file)
+            except (IOError, zlib.error), e:
+                LOG.debug('Could not read %s: %s', path, e)
+                continue
+        finally:
+            changelog_file.close()
+        if text is not None and _is_entry_of(text, version):
+            return text
+        return None
+    return None
+
+def get_archive_names(pkg_info):
+    """ Returns the file names the candidate archive of a package may be
+    stored under.
+
+    The name is built the way apt names downloaded archives, so the
+    package record, which is shared with other threads, is not read.
+
+    :param pkg_info: :class:`UpdateManager.Backend.PackageInfoBase` object
+    :returns: List of file names.
+    """
+    version = pkg_info.get_candidate_version()
+    architecture = pkg_info.get_candidate_architecture()
+    if not version or not architecture:
+        return []
+    # apt quotes the epoch separator of the version.
+    return ['%s_%s_%s.deb' % (pkg_info.get_package_name(),
+                              version.replace(':', '%3a'), architecture)]
+
+class LocalChangelogSource(object):
+    """ Looks up changelog entries on the local system.
+
+    Completely downloaded candidate archives are searched first, the
+    documentation of unpacked packages second.
+
+    :param archive_dir: Directory downloaded archives are stored in.
+    :param doc_dir: Documentation directory.
+    """
+    def __init__(self, archive_dir=ARCHIVE_DIR, doc_dir=DOC_DIR):
+        self._archive_dir = archive_dir
+        self._doc_dir = doc_dir
+
+    def get_changelog(self, pkg_info):
+        """ Returns the candidate's changelog entry, if available locally.
+
+        :param pkg_info: :class:`UpdateManager.Backend.PackageInfoBase`
+          object
+        :returns: The entry as a string, or None.
+        """
+        pkg_name = pkg_info.get_package_name()
+        for archive_name in get_archive_names(pkg_info):
+            path = os.path.join(self._archive_dir, archive_name)
+            if not os.path.isfile(path):
+                continue
+            text = read_archive_changelog(path, pkg_name)
+            if text is not None:
+                LOG.debug('Read changelog of %s from %s.', pkg_name, path)
+                return text
+        return read_installed_changelog(pkg_name,
+                                        pkg_info.get_candidate_version(),
+                                        self._doc_dir)
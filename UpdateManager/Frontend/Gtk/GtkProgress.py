@@ -36,10 +36,24 @@ import vte
 from UpdateManager.Util.enum import Enum
 from UpdateManager.Backend import CacheProgressHandler, ListProgressHandler
 from UpdateManager.Backend import CommitProgressHandler
+from UpdateManager.Util.eventbus import ProgressEventBus
 from UpdateManager.Util.humanize import humanize_size, humanize_seconds
 
 LOG = logging.getLogger('UpdateManager.Frontend.Gtk.GtkProgress')
 
+def schedule_in_main_loop(delay, func):
+    """ Event bus schedule function running func in the glib main loop.
+
+    :param delay: Delay in seconds.
+    :param func: Function to run.
+
+    .. versionadded:: 0.200.6
+    """
+    if delay > 0:
+        gobject.timeout_add(int(delay * 1000), func)
+    else:
+        gobject.idle_add(func)
+
 class GtkCacheProgress(CacheProgressHandler):
     """
     Gtk :class:`UpdateManager.Backend.CacheProgressHandler` implementation.
@@ -53,40 +67,57 @@ class GtkCacheProgress(CacheProgressHandler):
         self._window.realize()
         host_window.window.set_functions(gtk.gdk.FUNC_MOVE)
         self._window.set_transient_for(parent)
+        self._bus = ProgressEventBus(self._deliver,
+                                     schedule=schedule_in_main_loop)
         LOG.debug('GtkOpProgress initialized.')
 
     def cache_begin(self):
         """ Begin handler """
-        def update_func():
-            self._parent.set_sensitive(False)
-            self._window.show()
-            LOG.debug('Cache loading begin.')
-        gobject.idle_add(update_func)
+        self._bus.post('cache_begin')
 
     def cache_finished(self):
         """ Finished handler """
-        def update_func():
-            self._parent.set_sensitive(True)
-            self._window.hide()
-            if self._ui._application.get_option('run_check'):
-                LOG.debug('Checking for updates requested via commandline' +
-                          ' switch.')
-                self._ui._application.set_option('run_check', False)
-                self._ui._application.reload_package_list()
-            else:
-                self._ui.update_package_list()
         LOG.debug('Cache loading finished.')
-        gobject.idle_add(update_func)
+        self._bus.post('cache_finished')
 
     def cache_operation(self, operation):
-        def update_func():
-            self._status.set_markup("<i>%s</i>" % operation)
-        gobject.idle_add(update_func)
+        self._bus.post('cache_operation', operation)
 
     def cache_update(self, progress):
-        def update_func():
-            self._progressbar.set_fraction(float(progress)/100.0)
-        gobject.idle_add(update_func)
+        self._bus.post('cache_update', progress)
+
+    def _deliver(self, batch):
+        """ Applies a batch of events delivered by the event bus.
+
+        :param batch: List of (name, args, time) tuples.
+        """
+        for name, args, event_time in batch:
+            getattr(self, '_do_' + name)(*args)
+
+    def _do_cache_begin(self):
+        self._parent.set_sensitive(False)
+        # The cached updates of the previous run are shown instead of
+        # the progress window if they are still valid.
+        if not self._ui.show_cached_updates():
+            self._window.show()
+        LOG.debug('Cache loading begin.')
+
+    def _do_cache_finished(self):
+        self._parent.set_sensitive(True)
+        self._window.hide()
+        if self._ui._application.get_option('run_check'):
+            LOG.debug('Checking for updates requested via commandline' +
+                      ' switch.')
+            self._ui._application.set_option('run_check', False)
+            self._ui._application.reload_package_list()
+        else:
+            self._ui.update_package_list()
+
+    def _do_cache_operation(self, operation):
+        self._status.set_markup("<i>%s</i>" % operation)
+
+    def _do_cache_update(self, progress):
+        self._progressbar.set_fraction(float(progress)/100.0)
 
 class BackendProgressHandlerObject(CommitProgressHandler, ListProgressHandler,
                                    gobject.GObject):
@@ -139,13 +170,30 @@ class BackendProgressHandlerObject(CommitProgressHandler, ListProgressHandler,
         gobject.GObject.__init__(self)
         self._removal_answer = False
         self._removal_event = threading.Event()
+        self._bus = ProgressEventBus(self._deliver,
+                                     schedule=schedule_in_main_loop)
 
     def emit(self, *args):
-        """ Emits signal in main thread, using gobject.idle_add.
-        
+        """ Emits signal in main thread, using the progress event bus.
+
+        Progress updates are coalesced and emitted at most
+        :data:`UpdateManager.Util.eventbus.FRAME_RATE` times per second.
+
         :param args: Arguments passed to gobject.Gobject.emit
+
+        .. versionchanged:: 0.200.6
+           Signals are emitted in batches through
+           :class:`UpdateManager.Util.eventbus.ProgressEventBus`.
+        """
+        self._bus.post(*args)
+
+    def _deliver(self, batch):
+        """ Emits a batch of signals delivered by the event bus.
+
+        :param batch: List of (name, args, time) tuples.
         """
-        gobject.idle_add(gobject.GObject.emit, self, *args)
+        for name, args, event_time in batch:
+            gobject.GObject.emit(self, name, *args)
 
     def preparation_begin(self):
         """ 
@@ -327,6 +375,12 @@ class GtkListProgress(BackendProgressHandlerObject):
                 DOWNLOAD_LIST="List download mode", HIDDEN="Hidden mode",
                 INSTALL="Install mode",
                 INSTALL_FINISHED="Install finished mode")
+    LOCAL_URI_PREFIXES = ('gpgv:/', 'bzip2:/', 'gzip:/', 'rred:/')
+    """ Prefixes of URIs of local list file operations """
+    LIST_COMPRESSION_SUFFIXES = ('.bz2', '.gz', '.xz', '.lzma')
+    """ Suffixes of compressed list files """
+    _remote_uri_cache = {}
+    """ URI scheme (including ":/") to remote flag mapping """
     
     def __init__(self, host_window, progressbar, summary, status, expander,
                  cancel_button, treeview, vb_details, scrolled, parent):
@@ -390,6 +444,7 @@ class GtkListProgress(BackendProgressHandlerObject):
         self._finish_event = threading.Event()
         self._finish_event.clear()
         self._store_map = {}
+        self._store_index = {}
         self._terminal = vte.Terminal()
         self._current_items = {}
 
@@ -513,13 +568,51 @@ class GtkListProgress(BackendProgressHandlerObject):
         """ Helper classmethod that checks whether a given URI is remote or
         local.
 
+        .. versionchanged:: 0.200.6
+           The result is cached per URI scheme.
+
         :param item_uri: Item URI
         """
-        if item_uri.startswith('gpgv:/') or item_uri.startswith('bzip2:/') \
-               or item_uri.startswith('gzip:/') \
-               or item_uri.startswith('rred:/'):
-            return False
-        return True
+        # All local prefixes are a scheme followed by ":/", so the result
+        # only depends on this part of the URI.
+        scheme = item_uri[:item_uri.find(':') + 2]
+        try:
+            return cls._remote_uri_cache[scheme]
+        except KeyError:
+            is_remote = not scheme.startswith(cls.LOCAL_URI_PREFIXES)
+            cls._remote_uri_cache[scheme] = is_remote
+            return is_remote
+
+    @classmethod
+    def _get_list_key(cls, path):
+        """ Helper classmethod returning the key a list file is indexed by.
+
+        The remote path of a list file (without the protocol) and the name
+        of its local copy, in which slashes are escaped as underscores,
+        result in the same key. Compression suffixes are ignored.
+
+        :param path: Remote path or local file name.
+
+        .. versionadded:: 0.200.6
+        """
+        for suffix in cls.LIST_COMPRESSION_SUFFIXES:
+            if path.endswith(suffix):
+                path = path[:-len(suffix)]
+                break
+        return path.replace('_', '/')
+
+    def _add_store_row(self, item_uri, it):
+        """ Registers a row of the item store.
+
+        :param item_uri: The row's remote URI.
+        :param it: The row's iterator.
+        """
+        self._store_map[item_uri] = it
+        try:
+            self._store_index[self._get_list_key(
+                item_uri.rsplit('//', 1)[1])] = it
+        except IndexError:
+            LOG.debug('Could not split uri %s', item_uri)
     
     def _sig_list_finished(self, src):
         """ List finished signal handler """
@@ -528,6 +621,7 @@ class GtkListProgress(BackendProgressHandlerObject):
         self._finish_event.set()
         self._store.clear()
         self._store_map = {}
+        self._store_index = {}
         self._current_items = {}
 
     def _sig_list_aborted(self, src):
@@ -584,7 +678,7 @@ class GtkListProgress(BackendProgressHandlerObject):
                     uri_source += '/'
                     it = self._store.prepend([percent, uri_source, uri_file,
                                               item_partial_size, item_size])
-                    self._store_map[item_uri] = it
+                    self._add_store_row(item_uri, it)
                 except ValueError, v_err:
                     LOG.debug('Splitting uri %s failed: %s', item_uri,
                               v_err.message)
@@ -604,30 +698,18 @@ class GtkListProgress(BackendProgressHandlerObject):
             # Local URI means remote side has finished, let's try to find
             # the matching remote uri.
             try:
-                remote_uri_part = item_uri.rsplit('/', 1)[1].replace('_', '/')
-                remote_uri_part2 = remote_uri_part + '.bz2'
-            except ValueError, v_err:
-                LOG.debug('Splitting uri %s failed: %s', item_uri, v_err)
+                it = self._store_index.get(
+                    self._get_list_key(item_uri.rsplit('/', 1)[1]))
+            except IndexError:
+                LOG.debug('Splitting uri %s failed', item_uri)
                 return False
-            
-            for uri in self._store_map:
-                try:
-                    proto, uri_part = uri.rsplit('//', 1)
-                    if uri_part == remote_uri_part or \
-                           uri_part == remote_uri_part2:
-                        it = self._store_map[uri]
-                        percent = self._store.get_value(
-                            it, self.LIST_COL.PERCENTAGE)
-                        if percent < 100:
-                            self._store.set_value(
-                                it, self.LIST_COL.PERCENTAGE, 100)
-                            size = self._store.get_value(
-                                it, self.LIST_COL.FILE_SIZE)
-                            self._store.set_value(
-                                it, self.LIST_COL.PART_SIZE, size)
-                        break
-                except ValueError, v_err:
-                    LOG.debug('Could not split uri %s: %s', uri, v_err.message)
+
+            if it is not None:
+                percent = self._store.get_value(it, self.LIST_COL.PERCENTAGE)
+                if percent < 100:
+                    self._store.set_value(it, self.LIST_COL.PERCENTAGE, 100)
+                    size = self._store.get_value(it, self.LIST_COL.FILE_SIZE)
+                    self._store.set_value(it, self.LIST_COL.PART_SIZE, size)
                 
         return False
 
@@ -654,7 +736,7 @@ class GtkListProgress(BackendProgressHandlerObject):
                 uri_source, uri_file = item_uri.rsplit('/', 1)
                 uri_source += '/'
                 it = self._store.prepend([100, uri_source, uri_file, 0, 0])
-                self._store_map[item_uri] = it
+                self._add_store_row(item_uri, it)
             except ValueError, v_err:
                 LOG.debug('Splitting uri %s failed: %s', item_uri,
                           v_err)
@@ -957,6 +1039,7 @@ class GtkListProgress(BackendProgressHandlerObject):
         if self._mode in [self.MODE.DOWNLOAD_LIST, self.MODE.DOWNLOAD_PKG]:
             self._current_items = {}
             self._store_map = {}
+            self._store_index = {}
             LOG.debug('Changing to download mode.')
             self._expander.set_label(_('Show progress of individual files'))
             self._show_widgets('expander', 'treeview', 'progressbar',
@@ -971,6 +1054,7 @@ class GtkListProgress(BackendProgressHandlerObject):
         elif self._mode == self.MODE.INSTALL:
             self._current_items = {}
             self._store_map = {}
+            self._store_index = {}
             self._expander.set_label(_('Show terminal'))
             self._summary.set_markup('<b>%s</b>'  % _('Installing updates'))
             LOG.debug('Changing to install mode')
@@ -986,6 +1070,7 @@ class GtkListProgress(BackendProgressHandlerObject):
         elif self._mode == self.MODE.INSTALL_FINISHED:
             self._current_items = {}
             self._store_map = {}
+            self._store_index = {}
             self._expander.set_label(_('Show terminal'))
             LOG.debug('Changing to install finished mode.')
             self._show_widgets('expander', 'terminal', 'progressbar',
@@ -996,6 +1081,7 @@ class GtkListProgress(BackendProgressHandlerObject):
         elif self._mode == self.MODE.HIDDEN:
             self._current_items = {}
             self._store_map = {}
+            self._store_index = {}
             LOG.debug('Changing to hidden mode.')
             self._hide_widgets('treeview', 'progressbar', 'terminal',
                                'expander', 'progressbar', 'summary', 'status',
@@ -75,6 +75,12 @@ class GtkFrontend(FrontendBase):
     def main(self, application):
         """ Gtk/Glade main loop invocation. """
         self._ui._application = application
+
+        def first_window_shown():
+            # Idle callbacks run after the window's first redraw.
+            application.first_window_shown()
+            return False
+        gobject.idle_add(first_window_shown)
         self._ui.run()
         return 0
 
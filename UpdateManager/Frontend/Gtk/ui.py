@@ -51,6 +51,7 @@ import gconf
 from gettext import gettext as _
 
 from UpdateManager import __version__ as um_version
+from UpdateManager.Backend import SelectionSolver
 from UpdateManager.Util.enum import Enum
 from UpdateManager.Exceptions import ExitProgramException
 from UpdateManager.Frontend.Gtk.GtkProgress import GtkCacheProgress
@@ -59,13 +60,22 @@ from UpdateManager.Frontend.GtkCommon.SimpleGtkbuilderApp import SimpleGtkbuilde
 from UpdateManager.Frontend.GtkCommon import get_ui_path
 from UpdateManager.Frontend.Gtk.ChangelogViewer import ChangelogViewer
 from UpdateManager.Frontend.Gtk.utils import init_proxy
+from UpdateManager.DistSpecific import UPDATE_CATEGORY
 from UpdateManager.DistSpecific.changelog import ChangelogHandler
+from UpdateManager.DistSpecific.changelog import ChangelogPrefetcher
 from UpdateManager.Util.humanize import humanize_size
 
 LOG = logging.getLogger("UpdateManager.Frontend.Gtk.ui")
 
 LIST_COL = Enum("CONTENTS", "NAME", "PKG_INFO", "CATEGORY_ID")
 
+CHANGELOG_PREFETCH_AHEAD = 5
+""" Number of rows below the visible ones changelogs are prefetched for """
+
+ARCHIVE_PREFETCH_DELAY = 1500
+""" Time in milliseconds the selection must stay unchanged before the
+archives of the selected updates are prefetched """
+
 class GtkDbusController(dbus.service.Object):
     """ Helper class to provide UpdateManagerIFace via dbus. """
     def __init__(self, parent, bus_name,
@@ -91,8 +101,18 @@ class UpdateListControl(ChangelogHandler):
         self._treeview = treeview
         self._ui = userinterface
         self._current_pkg = None
+        self._solver = None
+        # Download size preview of the backend, None if not supported.
+        self._preview = None
+        # Paths of package rows, by package name.
+        self._rows = {}
 
         self._changelogs = {}
+        # Speculative changelog fetches, created on first use.
+        self._prefetcher = None
+        self._prefetch_scheduled = False
+        # Source id of the pending archive prefetch, or None.
+        self._archive_prefetch_timeout = None
         self._store = gtk.ListStore(str, str, gobject.TYPE_PYOBJECT,
                                     gobject.TYPE_PYOBJECT)
         self._treeview.set_model(self._store)
@@ -130,6 +150,11 @@ class UpdateListControl(ChangelogHandler):
                                      self.show_context_menu)
         self._treeview.connect("cursor-changed", self.cursor_changed)
         self._treeview.connect("row-activated", self.row_activated)
+        vadjustment = self._treeview.get_vadjustment()
+        if vadjustment:
+            vadjustment.connect("changed", self.schedule_changelog_prefetch)
+            vadjustment.connect("value-changed",
+                                self.schedule_changelog_prefetch)
 
     def get_store(self):
         """ Returns the store. """
@@ -185,27 +210,113 @@ class UpdateListControl(ChangelogHandler):
     def select_all_rows(self, widget):
         """ Handler for select all function. """
         self._ui.set_busy_status()
-        for row in self._store:
-            if row[LIST_COL.PKG_INFO] and not row[LIST_COL.PKG_INFO].active:
-                row[LIST_COL.PKG_INFO].active = True
+        if self._solver:
+            self.apply_selection_changes(self._solver.select_all())
         self.update_download_size()
-        self._treeview.queue_draw()
         self._ui.clear_busy_status()
 
     def deselect_all_rows(self, widget):
         """ Handler for deselect all function. """
         self._ui.set_busy_status()
-        for row in self._store:
-            if row[LIST_COL.PKG_INFO] and row[LIST_COL.PKG_INFO].active:
-                row[LIST_COL.PKG_INFO].active = False
-                
+        if self._solver:
+            self.apply_selection_changes(self._solver.deselect_all())
         self.update_download_size()
-        self._treeview.queue_draw()
         self._ui.clear_busy_status()
 
+    def set_package_store(self, pkg_info_store):
+        """ Sets the store packages are selected from and applies the
+        default selection.
+
+        :param pkg_info_store:
+          :class:`UpdateManager.Backend.PackageInfoStoreBase` object
+
+        .. versionadded:: 0.200.6
+        """
+        self._solver = SelectionSolver(pkg_info_store)
+        self._solver.apply_default_selection()
+        selection = []
+        for pkg_info in pkg_info_store.get_package_list():
+            selection.append((pkg_info, pkg_info.active))
+        self._preview = self._ui._application.reset_selection_preview(
+            selection)
+
+    def update_rows(self, pkg_infos):
+        """ Redraws the rows of the given packages.
+
+        :param pkg_infos: List of
+          :class:`UpdateManager.Backend.PackageInfoBase` objects.
+
+        .. versionadded:: 0.200.6
+        """
+        for pkg_info in pkg_infos:
+            path = self._rows.get(pkg_info.get_package_name())
+            if path is not None:
+                self._store.row_changed(path, self._store.get_iter(path))
+
+    def apply_selection_changes(self, pkg_infos):
+        """ Redraws the rows of packages whose selection changed and
+        updates the backend's download size preview.
+
+        :param pkg_infos: List of
+          :class:`UpdateManager.Backend.PackageInfoBase` objects.
+
+        .. versionadded:: 0.200.6
+        """
+        self.update_rows(pkg_infos)
+        if self._preview is not None and pkg_infos:
+            changes = []
+            for pkg_info in pkg_infos:
+                changes.append((pkg_info, pkg_info.active))
+            self._preview = self._ui._application.update_selection_preview(
+                changes)
+        if pkg_infos:
+            self.prefetch_selection()
+
+    def prefetch_selection(self):
+        """ Lets the backend download the selected updates in the
+        background, if enabled, once the selection has not changed for
+        :data:`ARCHIVE_PREFETCH_DELAY` milliseconds.
+
+        .. versionadded:: 0.200.6
+        """
+        app = self._ui._application
+        if self._solver is None or not app.is_prefetch_enabled():
+            return
+        self._cancel_archive_prefetch()
+        self._archive_prefetch_timeout = gobject.timeout_add(
+            ARCHIVE_PREFETCH_DELAY, self._prefetch_archives)
+
+    def _cancel_archive_prefetch(self):
+        """ Removes a pending archive prefetch from the main loop. """
+        if self._archive_prefetch_timeout is not None:
+            gobject.source_remove(self._archive_prefetch_timeout)
+            self._archive_prefetch_timeout = None
+
+    def _prefetch_archives(self):
+        """ Passes the current selection to the backend's prefetch.
+
+        :returns: False, so the timeout is not repeated.
+        """
+        self._archive_prefetch_timeout = None
+        if self._solver is None:
+            return False
+        app = self._ui._application
+        selected = []
+        for row in self._store:
+            pkg_info = row[LIST_COL.PKG_INFO]
+            if pkg_info and pkg_info.active:
+                selected.append(pkg_info)
+        app.prefetch(selected)
+        return False
+
     def clear_store(self):
         """ Empties the store """
+        if self._prefetcher:
+            self._prefetcher.cancel()
+        self._cancel_archive_prefetch()
         self._store.clear()
+        self._rows = {}
+        self._preview = None
         LOG.debug('Update list store cleared.')
 
     def _store_append(self, description, pkg_name, pkg_info, origin_id):
@@ -222,7 +333,11 @@ class UpdateListControl(ChangelogHandler):
         """
         assert(not (pkg_info and origin_id))
         def append_helper():
-            self._store.append([description, pkg_name, pkg_info, origin_id])
+            iterator = self._store.append([description, pkg_name, pkg_info,
+                                           origin_id])
+            if pkg_info:
+                self._rows[pkg_info.get_package_name()] = \
+                    self._store.get_path(iterator)
         gobject.idle_add(append_helper)
 
     def store_get_update_count(self):
@@ -358,41 +473,22 @@ class UpdateListControl(ChangelogHandler):
 
             # TODO: handle packages which are being held back
 
-    def set_package_selection(self, pkg_info, selected=True, handled=[]):
-        pkg_info.active = selected
+    def set_package_selection(self, pkg_info, selected=True):
+        """ Selects or deselects a package, its dependencies and
+        conflicting packages.
 
-        # Check for circular dependency.
-        # Not handling this case would lead to set_package_selection
-        # being invoked in an endless loop, so this is really important.
-        if pkg_info in handled:
-            return
+        :param pkg_info: :class:`UpdateManager.Backend.PackageInfoBase`
+          object
+        :param selected: Whether to select or to deselect the package.
+        :returns: A list of
+          :class:`UpdateManager.Backend.PackageInfoBase` objects whose
+          selection changed.
 
-        # IMPORTANT: Get a *copy* of the handled parameter. Not doing this
-        # would modify the contents of the default value of this keyword
-        # argument!
-        h = handled[:]
-        h.append(pkg_info)
-        if selected:
-            # Package was selected. We now have to select all dependencies
-            # and deselect all conflicting packages.    
-            for dep in pkg_info.get_dependencies():
-                self.set_package_selection(dep, selected=True, handled=h)
-            for sdep in pkg_info.get_strict_dependencies():
-                self.set_package_selection(sdep, selected=True, handled=h)
-            for rsdep in pkg_info.get_strict_reverse_dependencies():
-                self.set_package_selection(rsdep, selected=True, handled=h)
-            for cpkg in pkg_info.get_conflicts():
-                self.set_package_selection(cpkg, selected=False, handled=h)
-        else:
-            # The second possible case is that the package was deselected.
-            # Basically this means that we have to deselect all reverse
-            # dependencies.
-            for rdep in pkg_info.get_reverse_dependencies():
-                self.set_package_selection(rdep, selected=False, handled=h)
-            for rsdep in pkg_info.get_strict_reverse_dependencies():
-                self.set_package_selection(rsdep, selected=False, handled=h)
-            for sdep in pkg_info.get_strict_dependencies():
-                self.set_package_selection(sdep, selected=False, handled=h)
+        .. versionchanged:: 0.200.6
+          The selection is computed by
+          :class:`UpdateManager.Backend.SelectionSolver`.
+        """
+        return self._solver.set_selection([pkg_info], selected)
             
     def cursor_changed(self, treeview):
         """ Cursor change handler. """
@@ -421,21 +517,33 @@ class UpdateListControl(ChangelogHandler):
         
         active_new = not pkg.active
         LOG.debug('Updated selection of %s (new: %s).', pkg, active_new)
-        self.set_package_selection(pkg, active_new)
+        self.apply_selection_changes(
+            self.set_package_selection(pkg, active_new))
 
         self.update_download_size()
         self._ui.update_install_button()
-        self._treeview.queue_draw()
 
     def update_download_size(self):
-        """ Handler method that updates the download size label """
-        downsize = 0
-        for row in self._store:
-            pkg_info = row[LIST_COL.PKG_INFO]
-            if pkg_info and pkg_info.active:
-                downsize += pkg_info.get_download_size()
-                for udep in pkg_info.get_uninstalled_dependencies():
-                    downsize += pkg_info.get_download_size()
+        """ Handler method that updates the download size label
+
+        .. versionchanged:: 0.200.6
+           The backend's download size preview is shown if available.
+           Otherwise uninstalled dependencies are counted once, with their
+           own size.
+        """
+        if self._preview is not None:
+            downsize = self._preview.get_download_size()
+        else:
+            downsize = 0
+            counted = {}
+            for row in self._store:
+                pkg_info = row[LIST_COL.PKG_INFO]
+                if pkg_info and pkg_info.active:
+                    for pkg in [pkg_info] + \
+                            list(pkg_info.get_uninstalled_dependencies()):
+                        if not counted.has_key(pkg.get_package_name()):
+                            counted[pkg.get_package_name()] = True
+                            downsize += pkg.get_download_size()
             
         downsize_str = _("None")
         if downsize > 0:
@@ -468,6 +576,52 @@ class UpdateListControl(ChangelogHandler):
             details_ctrl.set_description_text("")
             details_ctrl.set_changelog_text("")
             details_ctrl.set_sensitive(False)
+        self.schedule_changelog_prefetch()
+
+    def schedule_changelog_prefetch(self, *args):
+        """ Schedules :meth:`prefetch_changelogs` in the main loop, once
+        for any number of calls.
+
+        .. versionadded:: 0.200.6
+        """
+        if not self._prefetch_scheduled:
+            self._prefetch_scheduled = True
+            gobject.idle_add(self.prefetch_changelogs)
+
+    def prefetch_changelogs(self):
+        """ Prefetches the changelogs of the visible rows and of the
+        :data:`CHANGELOG_PREFETCH_AHEAD` rows below them, security updates
+        first, while the details are shown.
+
+        .. versionadded:: 0.200.6
+        """
+        self._prefetch_scheduled = False
+        app = self._ui._application
+        if app is None or not self._ui.expander_details.get_expanded():
+            return False
+        visible_range = self._treeview.get_visible_range()
+        if not visible_range:
+            return False
+
+        start_path, end_path = visible_range
+        last = min(end_path[0] + CHANGELOG_PREFETCH_AHEAD,
+                   len(self._store) - 1)
+        security_updates = []
+        other_updates = []
+        for index in xrange(start_path[0], last + 1):
+            pkg_info = self._store[index][LIST_COL.PKG_INFO]
+            if not pkg_info or self._changelogs.has_key(
+                pkg_info.get_source_package_name()):
+                continue
+            if pkg_info.get_update_category() == UPDATE_CATEGORY.SECURITY:
+                security_updates.append(pkg_info)
+            else:
+                other_updates.append(pkg_info)
+
+        if self._prefetcher is None:
+            self._prefetcher = ChangelogPrefetcher(app.get_changelog, self)
+        self._prefetcher.prefetch(security_updates + other_updates)
+        return False
 
     def _update_pkg_changelog(self, pkg_info, text):
         """ Helper function that updates the changelog text if
@@ -770,6 +924,59 @@ class GtkUI(SimpleGtkbuilderApp):
         LOG.debug("Reload button clicked.")
         self._application.reload_package_list()
 
+    def _append_packages(self, pkg_info_store):
+        """ Sets the selection store and appends its packages to the update
+        list, grouped by category.
+
+        :param pkg_info_store:
+          :class:`UpdateManager.Backend.PackageInfoStoreBase` object
+        :returns: True if at least one package has been appended.
+        """
+        self.update_list.set_package_store(pkg_info_store)
+        pkg_tree = pkg_info_store.get_packages()
+        found_update = False
+        
+        for cat_id in pkg_tree.keys():
+            cat_name = self._application.get_update_category_name(cat_id)
+            self.update_list.store_append_category(cat_name, cat_id)
+            
+            pkgs = pkg_tree[cat_id]
+            
+            for pkg_info in map(pkgs.get, sorted(pkgs.keys())):
+                self.update_list.store_append_pkg(pkg_info)
+                found_update = True
+        return found_update
+
+    def show_cached_updates(self):
+        """ Shows the updates found by the previous run while the package
+        cache is being opened.
+
+        The list stays insensitive until :meth:`update_package_list`
+        replaces it with the current updates.
+
+        :returns: True if cached updates are shown, False otherwise.
+
+        .. versionadded:: 0.200.6
+        """
+        dist_upgrade = self._dist_upgrade
+        if dist_upgrade is None:
+            dist_upgrade = True
+        pkg_info_store = self._application.get_cached_updates(dist_upgrade)
+        if not pkg_info_store or pkg_info_store.package_count() == 0:
+            return False
+
+        LOG.debug('Showing %d cached updates.',
+                  pkg_info_store.package_count())
+        self.update_list.clear_store()
+        self._append_packages(pkg_info_store)
+        self.update_list.set_sensitive(False)
+        self.button_install.set_sensitive(False)
+        self.label_header.set_markup(
+            '<big><b>%s</b></big>'
+            % _('Gathering information about updates...'))
+        gobject.idle_add(self.update_list.update_download_size)
+        return True
+
     def update_package_list(self):
         """ Package list updater. """
         if self._package_list_update:
@@ -835,26 +1042,10 @@ class GtkUI(SimpleGtkbuilderApp):
             else:
                 self._dist_upgrade = True
 
-        pkg_tree = pkg_info_store.get_packages()
-        categories = {}
         text_label_main = ""
-        found_update = False
-        
-        for cat_id in pkg_tree.keys():
-            cat_name = self._application.get_update_category_name(cat_id)
-            self.update_list.store_append_category(cat_name, cat_id)
-            
-            pkgs = pkg_tree[cat_id]
-            
-            for pkg_info in map(pkgs.get, sorted(pkgs.keys())):
-                if getattr(pkg_info, 'active', None) is None:
-                    selected = False
-                    if pkg_info.is_installed():
-                        selected = True
-                    self.update_list.set_package_selection(pkg_info,
-                                                           selected)
-                self.update_list.store_append_pkg(pkg_info)
-                found_update = True
+        found_update = self._append_packages(pkg_info_store)
+        if found_update:
+            self.update_list.prefetch_selection()
 
         # Update the main window
         text_header = ""
@@ -912,6 +1103,11 @@ class GtkUI(SimpleGtkbuilderApp):
         self._package_list_update = False
         gobject.idle_add(self.clear_busy_status)
 
+        def save_snapshot():
+            self._application.save_update_snapshot()
+            return False
+        gobject.idle_add(save_snapshot)
+
     def on_button_about_clicked(self, source):
         """ Callback method for about button that shows the about dialog.
 
@@ -0,0 +1,597 @@
+# UpdateManager/Frontend/JSONLines.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+""" JSON lines event frontend
+
+This frontend has no user interface. Every backend event is written as
+a JSON object on a line of its own, to stdout or to the file descriptor
+given in the UPDATE_MANAGER_EVENT_FD environment variable. Each object
+has an ``event`` member naming the
+:class:`UpdateManager.Backend.BackendProgressHandler` method, a ``time``
+member and the method's arguments.
+
+Progress updates (the ``*_update`` events) are coalesced: only the
+latest update per item is written in each batch. Batches are written
+every :data:`FLUSH_INTERVAL` seconds and whenever an operation begins,
+finishes or fails.
+
+Commands are read from stdin, one JSON object per line:
+
+``{"command": "updates", "dist_upgrade": true}``
+  Writes an ``updates`` event listing the available updates.
+``{"command": "list"}``
+  Downloads the package lists and reloads the cache.
+``{"command": "plan", "packages": [...]}``
+  Writes a ``commit_plan`` event describing the downloads, installations
+  and removals committing the named updates, or all updates if packages
+  is not given, would result in.
+``{"command": "prefetch", "packages": [...]}``
+  Downloads the named updates, or all updates if packages is not given,
+  in the background, reporting ``prefetch_*`` events. A later commit, for
+  example in a maintenance window, then only installs them. Other
+  commands are accepted while the prefetch is running.
+``{"command": "commit", "packages": [...], "allow_changes": false}``
+  Installs the named updates, or all updates if packages is not given.
+  allow_changes defines whether additional removals or installations
+  are accepted.
+``{"command": "abort"}``
+  Aborts the current operation.
+``{"command": "quit"}``
+  Exits once the current operation has finished, as does closing stdin.
+
+.. versionadded:: 0.200.6
+"""
+
+import json
+import logging
+import os
+import Queue
+import select
+import sys
+import time
+
+from UpdateManager.Backend import BackendProgressHandler
+from UpdateManager.Backend import CommitProgressHandler
+from UpdateManager.Frontend import FrontendBase
+from UpdateManager.Util.eventbus import ProgressEventBus
+
+LOG = logging.getLogger('UpdateManager.Frontend.JSONLines')
+
+EVENT_FD_VARIABLE = 'UPDATE_MANAGER_EVENT_FD'
+""" Environment variable holding the file descriptor events are written to
+"""
+
+FLUSH_INTERVAL = 0.5
+""" Maximum time in seconds events are held back before being written """
+
+READ_SIZE = 4096
+""" Maximum number of bytes read from stdin at once """
+
+class JSONLinesWriter(object):
+    """ Writes events as JSON lines in batches.
+
+    Events are queued on a
+    :class:`UpdateManager.Util.eventbus.ProgressEventBus`, which is
+    dispatched in the writing thread once the flush interval has passed.
+
+    :param stream: File-like object the events are written to.
+    :param flush_interval: Maximum time in seconds events are held back.
+    """
+    def __init__(self, stream, flush_interval=FLUSH_INTERVAL):
+        self._stream = stream
+        frame_rate = None
+        if flush_interval:
+            frame_rate = 1.0 / flush_interval
+        self._bus = ProgressEventBus(self._write_batch, frame_rate=frame_rate)
+
+    def write(self, event, key=None, flush=False, **fields):
+        """ Queues an event.
+
+        :param event: Event name.
+        :param key: Coalescing key. A pending event with the same key is
+          replaced instead of a new line being added.
+        :param flush: Whether to write the pending events immediately.
+        :param **fields: Event data, must be serializable to JSON.
+        """
+        self._bus.post_event(event, fields, key=key, urgent=flush)
+
+    def _write_batch(self, batch):
+        """ Writes a batch of events delivered by the event bus.
+
+        :param batch: List of (name, fields, time) tuples.
+        """
+        lines = []
+        for event, fields, event_time in batch:
+            fields['event'] = event
+            fields['time'] = round(event_time, 3)
+            lines.append(json.dumps(fields, separators=(',', ':')))
+        try:
+            self._stream.write('\n'.join(lines) + '\n')
+            self._stream.flush()
+        except IOError, e:
+            LOG.error('Could not write events: %s', e)
+
+    def flush(self):
+        """ Writes the pending events. """
+        self._bus.dispatch()
+
+    def flush_if_due(self):
+        """ Writes the pending events if they have been held back for
+        longer than the flush interval.
+        """
+        self._bus.dispatch_if_due()
+
+def _package_data(pkg_info):
+    """ Returns a dictionary describing a package, for use in events.
+
+    :param pkg_info: :class:`UpdateManager.Backend.PackageInfoBase` object
+    """
+    return {'name': pkg_info.get_package_name(),
+            'installed_version': pkg_info.get_installed_version(),
+            'candidate_version': pkg_info.get_candidate_version(),
+            'category': pkg_info.get_update_category(),
+            'download_size': pkg_info.get_download_size()}
+
+class JSONLinesProgressHandler(BackendProgressHandler):
+    """ Progress handler writing all events.
+
+    Operations ending are reported to the frontend's main loop through
+    a queue.
+
+    :param writer: :class:`JSONLinesWriter` object.
+    :param completions: Queue.Queue object operation results are put in.
+    """
+    def __init__(self, writer, completions):
+        self._writer = writer
+        self._completions = completions
+        self.allow_changes = False
+
+    ### Cache progress
+    def cache_begin(self):
+        self._writer.write('cache_begin', flush=True)
+
+    def cache_update(self, progress):
+        self._writer.write('cache_update', key='cache_update',
+                           progress=progress)
+
+    def cache_operation(self, operation):
+        self._writer.write('cache_operation', key='cache_operation',
+                           operation=operation)
+
+    def cache_finished(self):
+        self._writer.write('cache_finished', flush=True)
+        self._completions.put('cache_finished')
+
+    def cache_failed(self, failure_message):
+        self._writer.write('cache_failed', flush=True,
+                           message=failure_message)
+        self._completions.put('cache_failed')
+
+    ### List progress
+    def list_begin(self):
+        self._writer.write('list_begin', flush=True)
+
+    def list_item_begin(self, uri, item_size, downloaded_size):
+        self._writer.write('list_item_begin', uri=uri, size=item_size,
+                           downloaded=downloaded_size)
+
+    def list_item_update(self, item_uri, file_size, downloaded_size):
+        self._writer.write('list_item_update',
+                           key=('list_item_update', item_uri),
+                           uri=item_uri, size=file_size,
+                           downloaded=downloaded_size)
+
+    def list_item_finished(self, item_uri):
+        self._writer.write('list_item_finished', uri=item_uri)
+
+    def list_update(self, download_speed, eta_seconds, percent_done):
+        self._writer.write('list_update', key='list_update',
+                           speed=download_speed, eta=eta_seconds,
+                           percent=percent_done)
+
+    def list_finished(self):
+        self._writer.write('list_finished', flush=True)
+        self._completions.put('list_finished')
+
+    def list_aborted(self):
+        self._writer.write('list_aborted', flush=True)
+        self._completions.put('list_aborted')
+
+    def list_failed(self, failure_message):
+        self._writer.write('list_failed', flush=True,
+                           message=failure_message)
+        self._completions.put('list_failed')
+
+    ### Commit progress
+    def preparation_begin(self):
+        self._writer.write('preparation_begin', flush=True)
+
+    def requires_removal_or_installation(self, removals, installs):
+        self._writer.write('requires_removal_or_installation', flush=True,
+                           removals=[_package_data(pkg) for pkg in removals],
+                           installs=[_package_data(pkg) for pkg in installs],
+                           allowed=self.allow_changes)
+        if not self.allow_changes:
+            self._completions.put('commit_rejected')
+        return self.allow_changes
+
+    def download_begin(self, download_size, package_count, download_count):
+        self._writer.write('download_begin', flush=True, size=download_size,
+                           package_count=package_count,
+                           download_count=download_count)
+
+    def download_item_begin(self, uri, item_size, downloaded_size):
+        self._writer.write('download_item_begin', uri=uri, size=item_size,
+                           downloaded=downloaded_size)
+
+    def download_item_update(self, uri, item_size, downloaded_size):
+        self._writer.write('download_item_update',
+                           key=('download_item_update', uri),
+                           uri=uri, size=item_size,
+                           downloaded=downloaded_size)
+
+    def download_item_finished(self, uri):
+        self._writer.write('download_item_finished', uri=uri)
+
+    def download_update(self, download_speed, eta_seconds, percent):
+        self._writer.write('download_update', key='download_update',
+                           speed=download_speed, eta=eta_seconds,
+                           percent=percent)
+
+    def download_finished(self):
+        self._writer.write('download_finished', flush=True)
+
+    def download_aborted(self):
+        self._writer.write('download_aborted', flush=True)
+        self._completions.put('download_aborted')
+
+    def download_failed(self, failure_message):
+        self._writer.write('download_failed', flush=True,
+                           message=failure_message)
+        self._completions.put('download_failed')
+
+    def install_begin(self):
+        self._writer.write('install_begin', flush=True)
+
+    def install_update(self, package, percent, status_message):
+        self._writer.write('install_update', key='install_update',
+                           package=str(package), percent=percent,
+                           message=status_message)
+
+    def install_finished(self):
+        self._writer.write('install_finished', flush=True)
+        self._completions.put('install_finished')
+
+    def install_failed(self, error_message):
+        self._writer.write('install_failed', flush=True,
+                           message=error_message)
+        self._completions.put('install_failed')
+
+class JSONLinesPrefetchHandler(CommitProgressHandler):
+    """ Writes the download events of a prefetch as ``prefetch_*`` events,
+    which do not end any operation.
+
+    :param writer: :class:`JSONLinesWriter` object.
+    """
+    def __init__(self, writer):
+        self._writer = writer
+
+    def download_begin(self, download_size, package_count, download_count):
+        self._writer.write('prefetch_begin', flush=True, size=download_size,
+                           package_count=package_count,
+                           download_count=download_count)
+
+    def download_item_begin(self, uri, item_size, downloaded_size):
+        self._writer.write('prefetch_item_begin', uri=uri, size=item_size,
+                           downloaded=downloaded_size)
+
+    def download_item_update(self, uri, item_size, downloaded_size):
+        self._writer.write('prefetch_item_update',
+                           key=('prefetch_item_update', uri),
+                           uri=uri, size=item_size,
+                           downloaded=downloaded_size)
+
+    def download_item_finished(self, uri):
+        self._writer.write('prefetch_item_finished', uri=uri)
+
+    def download_update(self, download_speed, eta_seconds, percent):
+        self._writer.write('prefetch_update', key='prefetch_update',
+                           speed=download_speed, eta=eta_seconds,
+                           percent=percent)
+
+    def download_finished(self):
+        self._writer.write('prefetch_finished', flush=True)
+
+    def download_aborted(self):
+        self._writer.write('prefetch_aborted', flush=True)
+
+    def download_failed(self, failure_message):
+        self._writer.write('prefetch_failed', flush=True,
+                           message=failure_message)
+
+class JSONLinesFrontend(FrontendBase):
+    """ Frontend writing backend events as JSON lines, driven by commands
+    read from stdin.
+    """
+    def __init__(self, *args, **kwargs):
+        FrontendBase.__init__(self, *args, **kwargs)
+        self._app = None
+        self._input = sys.stdin
+        self._input_buffer = ''
+        self._writer = None
+        self._handler = None
+        self._completions = Queue.Queue()
+        # The application reloads the cache before invoking main.
+        self._busy = True
+        self._quit = False
+
+    def _open_output(self):
+        """ Returns the stream events are written to. """
+        event_fd = os.environ.get(EVENT_FD_VARIABLE)
+        if event_fd:
+            return os.fdopen(int(event_fd), 'w')
+        return sys.stdout
+
+    def init_frontend(self):
+        """ Sets up the event writer. """
+        self._writer = JSONLinesWriter(self._open_output())
+        self._handler = JSONLinesProgressHandler(self._writer,
+                                                 self._completions)
+
+    def main(self, application):
+        """ Processes commands until stdin is closed or quit is requested.
+
+        :param application: :class:`UpdateManager.Application.Application`
+          object
+        """
+        self._app = application
+        application.first_window_shown()
+        while not (self._quit and not self._busy):
+            self._process_completions()
+            if not self._quit:
+                command = self._read_command()
+                if command is not None:
+                    self._run_command(command)
+            else:
+                time.sleep(FLUSH_INTERVAL)
+            self._writer.flush_if_due()
+        self._writer.flush()
+        return 0
+
+    def _read_command(self):
+        """ Reads a command from stdin, waiting at most the flush interval.
+
+        :returns: The command as dictionary or None.
+        """
+        line = self._read_line()
+        if line is None:
+            return None
+        if not line:
+            self._quit = True
+            return None
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            command = json.loads(line)
+        except ValueError, e:
+            self._error('Invalid command: %s' % (e))
+            return None
+        if type(command) != dict or not command.has_key('command'):
+            self._error('Invalid command: %s' % (line))
+            return None
+        return command
+
+    def _read_line(self):
+        """ Reads a line from stdin, waiting at most the flush interval.
+
+        stdin is read unbuffered and split into lines here, as lines held
+        back in a file object's buffer would not wake up select().
+
+        :returns: The line, an empty string at the end of input or None if
+          no complete line is available yet.
+        """
+        pos = self._input_buffer.find('\n')
+        if pos < 0:
+            ready = select.select([self._input], [], [], FLUSH_INTERVAL)[0]
+            if not ready:
+                return None
+            data = os.read(self._input.fileno(), READ_SIZE)
+            if not data:
+                line = self._input_buffer
+                self._input_buffer = ''
+                return line
+            self._input_buffer += data
+            pos = self._input_buffer.find('\n')
+            if pos < 0:
+                return None
+        line = self._input_buffer[:pos + 1]
+        self._input_buffer = self._input_buffer[pos + 1:]
+        return line
+
+    def _run_command(self, command):
+        """ Starts the operation requested by a command.
+
+        :param command: Dictionary describing the command.
+        """
+        name = command['command']
+        if name == 'quit':
+            self._quit = True
+            return
+        elif name == 'abort':
+            self._app.abort_operation()
+            return
+        elif self._busy:
+            self._error('Another operation is in progress.')
+            return
+
+        if name == 'updates':
+            self._write_updates(command.get('dist_upgrade', True))
+        elif name == 'list':
+            self._start(self._app.reload_package_list())
+        elif name == 'plan':
+            self._plan(command)
+        elif name == 'prefetch':
+            self._prefetch(command)
+        elif name == 'commit':
+            self._commit(command)
+        else:
+            self._error('Unknown command: %s' % (name))
+
+    def _start(self, started):
+        """ Marks an operation as running if the backend started it. """
+        if started:
+            self._busy = True
+        else:
+            self._error('The operation could not be started.')
+
+    def _get_selection(self, command):
+        """ Returns the updates selected by a command.
+
+        :param command: Dictionary describing the command.
+        :returns: List of :class:`UpdateManager.Backend.PackageInfoBase`
+          objects, or None if the selection is invalid.
+        """
+        store = self._app.get_available_updates(
+            command.get('dist_upgrade', True))
+        if store is None:
+            return None
+        names = command.get('packages')
+        if names is None:
+            return store.get_package_list()
+        selected = []
+        for name in names:
+            pkg_info = store.get_package(name)
+            if pkg_info is None:
+                self._error('Unknown package: %s' % (name))
+                return None
+            selected.append(pkg_info)
+        return selected
+
+    def _plan(self, command):
+        """ Writes a ``commit_plan`` event describing what committing the
+        selected updates would do.
+
+        :param command: Dictionary describing the command.
+        """
+        selected = self._get_selection(command)
+        if selected is None:
+            return
+        plan = self._app.create_commit_plan(selected)
+        if plan is None:
+            self._error('The commit plan could not be created.')
+            return
+        self._writer.write(
+            'commit_plan', flush=True,
+            change_count=plan.get_change_count(),
+            download_count=plan.get_download_count(),
+            download_size=plan.get_download_size(),
+            installs=[_package_data(pkg) for pkg in plan.get_installs()],
+            removals=[_package_data(pkg) for pkg in plan.get_removals()],
+            error=plan.get_error())
+
+    def _prefetch(self, command):
+        """ Starts downloading the selected updates in the background.
+
+        :param command: Dictionary describing the command.
+        """
+        selected = self._get_selection(command)
+        if selected is None:
+            return
+        if not self._app.prefetch(selected,
+                                  JSONLinesPrefetchHandler(self._writer)):
+            self._error('The prefetch could not be started.')
+
+    def _commit(self, command):
+        """ Starts a commit operation.
+
+        :param command: Dictionary describing the command.
+        """
+        selected = self._get_selection(command)
+        if selected is None:
+            return
+        plan = self._app.create_commit_plan(selected)
+        if plan is not None:
+            selected = plan
+        self._handler.allow_changes = bool(command.get('allow_changes',
+                                                       False))
+        self._start(self._app.commit(selected))
+
+    def _process_completions(self):
+        """ Handles operations that have ended. """
+        while True:
+            try:
+                completion = self._completions.get_nowait()
+            except Queue.Empty:
+                return
+            if completion in ('list_finished', 'install_finished'):
+                # The backend only accepts new operations once the
+                # current one has returned from the handler.
+                while not self._app.reload_cache():
+                    time.sleep(0.1)
+            elif completion == 'cache_finished':
+                self._write_updates(True)
+                self._busy = False
+            else:
+                self._busy = False
+
+    def _write_updates(self, dist_upgrade):
+        """ Writes the available updates.
+
+        :param dist_upgrade: Defines whether to do a dist upgrade or not.
+        """
+        store = self._app.get_available_updates(dist_upgrade)
+        if store is None:
+            return
+        self._writer.write('updates', flush=True,
+                           dist_upgrade=bool(dist_upgrade),
+                           packages=[_package_data(pkg) for pkg in
+                                     store.get_package_list()],
+                           removals=[_package_data(pkg) for pkg in
+                                     store.get_removals()],
+                           download_size=store.get_download_size())
+        self._app.save_update_snapshot()
+
+    def _error(self, message):
+        """ Writes an error event. """
+        self._writer.write('error', flush=True, message=message)
+
+    def handle_unprivileged_invocation(self, app_args):
+        """ Reports that root privileges are required. """
+        JSONLinesWriter(self._open_output()).write(
+            'error', flush=True, message='Root privileges are required.')
+        return 1
+
+    def get_cache_handler(self):
+        return self._handler
+
+    def get_list_handler(self):
+        return self._handler
+
+    def get_commit_handler(self):
+        return self._handler
+
+    def handle_exception(self, exception):
+        """ Reports an exception raised by a backend operation. """
+        LOG.error('Exception: %s', exception)
+        self._error('%s: %s' % (exception.__class__.__name__, exception))
+        self._busy = False
@@ -36,27 +36,36 @@ from snack import snackArgs
 
 from UpdateManager.Backend import CacheProgressHandler
 from UpdateManager.Frontend import FrontendBase
+from UpdateManager.Util.eventbus import ProgressEventBus
 
 class NewtCacheProgressHandler(CacheProgressHandler):
     def __init__(self, ui):
         CacheProgressHandler.__init__(self)
         self._ui = ui
         self._op = ''
+        self._bus = ProgressEventBus(self._write_progress)
         
     def cache_begin(self):
         sys.stdout.write(_('Loading package cache.') + '\n')
         sys.stdout.flush()
 
     def cache_finished(self):
+        self._bus.dispatch()
         sys.stdout.write(_('Finished loading package cache.') + '\n')
         sys.stdout.flush()
         self._ui.get_updates()
                                         
     def cache_update(self, progress):
-        sys.stdout.write('[%2d] %s\r' % (progress, self._op))
+        self._bus.post('cache_update', progress)
+
+    def _write_progress(self, batch):
+        """ Writes the latest progress delivered by the event bus. """
+        name, args, event_time = batch[-1]
+        sys.stdout.write('[%2d] %s\r' % (args[0], self._op))
         sys.stdout.flush()
 
     def cache_operation(self, operation):
+        self._bus.dispatch()
         if self._op:
             sys.stdout.write('DONE: %s\n' % (self._op))
             sys.stdout.flush()
@@ -131,25 +140,18 @@ class NewtUI(object):
         sys.stdout.flush()
 
         packages = self._app.get_available_updates()
-        # download_size = 0
-        categories = {}
-
-        for pkg in packages:
-            catid = pkg.get_update_category()
-            if not catid in categories.keys():
-                categories[catid] = [pkg, ]
-            else:
-                categories[catid].append(pkg)
+        categories = packages.get_packages()
 
         for (i, cat_id) in enumerate(categories.keys()):
             cat_name = self._app.get_update_category_name(cat_id)
             self.checkbox_tree_updates.append(cat_name, selected=True)
-            for pkg in categories[cat_id]:
+            for pkg in categories[cat_id].values():
                 self.checkbox_tree_updates.addItem(pkg.get_package_name(),
                                                    (i, snackArgs['append']),
                                                    pkg,
                                                    selected=True)
         self._updates_received = True
+        self._app.save_update_snapshot()
 
     def update_ui(self):
         """ Redraws the UI """
@@ -188,6 +190,8 @@ class NewtFrontend(FrontendBase):
         :param application: :class:`UpdateManager.Application.Application`
           object
         """
+        # The screen has been drawn by init_frontend().
+        application.first_window_shown()
         return self._ui.main(application)
 
     def handle_unprivileged_invocation(self, app_args):
@@ -0,0 +1,208 @@
+# UpdateManager/Util/eventbus.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+""" Rate-limited progress event bus
+
+Backend helpers report progress far more often than any user interface
+can show it. :class:`ProgressEventBus` sits between the progress handler
+methods called by the backend and the code presenting them: it keeps only
+the latest state of every progress value and delivers the queued events
+in batches, at most :data:`FRAME_RATE` times per second.
+
+Events changing the state of an operation (everything not listed in
+:data:`COALESCED_EVENTS`) are never dropped, and the events in
+:data:`URGENT_EVENTS` are delivered without waiting for the next frame.
+
+.. versionadded:: 0.200.6
+"""
+
+import logging
+import threading
+import time
+
+LOG = logging.getLogger('UpdateManager.Util.eventbus')
+
+FRAME_RATE = 15
+""" Default maximum number of batches delivered per second """
+
+COALESCED_EVENTS = {
+    'cache_update': None,
+    'cache_operation': None,
+    'list_update': None,
+    'list_item_update': 0,
+    'download_update': None,
+    'download_item_update': 0,
+    }
+""" Events of which only the latest state is delivered, mapped to the
+index of the argument identifying the item they describe, or None for
+events describing a whole operation.
+"""
+
+URGENT_EVENTS = ('cache_finished', 'cache_failed',
+                 'list_finished', 'list_aborted', 'list_failed',
+                 'download_finished', 'download_aborted', 'download_failed',
+                 'install_finished', 'install_failed',
+                 'requires_removal_or_installation')
+""" Events delivered as soon as possible, together with everything queued
+before them.
+"""
+
+def get_coalescing_key(name, args):
+    """ Returns the key events are coalesced by.
+
+    :param name: Event name.
+    :param args: Event arguments.
+    :returns: The key, or None if the event must not be coalesced.
+    """
+    if not COALESCED_EVENTS.has_key(name):
+        return None
+    index = COALESCED_EVENTS[name]
+    if index is None:
+        return name
+    return (name, args[index])
+
+class ProgressEventBus(object):
+    """ Coalesces progress events and delivers them in batches.
+
+    Events may be posted from any thread. Batches are passed to the
+    deliver function as lists of (name, args, time) tuples, in the order
+    the events have been posted. Coalescing replaces a queued event with
+    a newer one of the same key only as long as no other event has been
+    queued after it, so the order of state changes is preserved.
+
+    With a schedule function, dispatching is left to it: it is called as
+    ``schedule(delay, func)`` and has to call func, typically in a main
+    loop, after delay seconds. Without one, batches are delivered in the
+    posting thread once a frame has passed, and :meth:`dispatch_if_due`
+    has to be called periodically to deliver the events held back.
+
+    :param deliver: Function called with every batch.
+    :param frame_rate: Maximum number of batches delivered per second,
+      None for no limit.
+    :param schedule: Function scheduling dispatches.
+    """
+    def __init__(self, deliver, frame_rate=FRAME_RATE, schedule=None):
+        self._deliver = deliver
+        if frame_rate:
+            self._interval = 1.0 / frame_rate
+        else:
+            self._interval = 0.0
+        self._schedule = schedule
+        self._lock = threading.Lock()
+        self._dispatch_lock = threading.Lock()
+        self._pending = []
+        self._keys = {}
+        self._scheduled = False
+        self._urgent_scheduled = False
+        self._last_dispatch = 0.0
+
+    def post(self, name, *args):
+        """ Queues a progress handler event, coalescing and prioritizing
+        it as defined by :data:`COALESCED_EVENTS` and
+        :data:`URGENT_EVENTS`.
+
+        :param name: Event name, usually the handler method's name.
+        :param args: Event arguments.
+        """
+        self.post_event(name, args, key=get_coalescing_key(name, args),
+                        urgent=name in URGENT_EVENTS)
+
+    def post_event(self, name, args, key=None, urgent=False):
+        """ Queues an event.
+
+        :param name: Event name.
+        :param args: Event arguments, passed on unchanged.
+        :param key: Coalescing key. A queued event with the same key is
+          replaced, unless another event has been queued after it.
+        :param urgent: Whether to deliver the event without waiting for
+          the next frame.
+        """
+        now = time.time()
+        self._lock.acquire()
+        try:
+            event = (name, args, now)
+            if key is not None and self._keys.has_key(key):
+                self._pending[self._keys[key]] = event
+            else:
+                if key is None:
+                    self._keys = {}
+                else:
+                    self._keys[key] = len(self._pending)
+                self._pending.append(event)
+
+            delay = max(0.0, self._last_dispatch + self._interval - now)
+            if self._schedule is None:
+                run_now = urgent or delay == 0.0
+            elif urgent and not self._urgent_scheduled:
+                self._urgent_scheduled = True
+                delay = 0.0
+            elif not self._scheduled:
+                self._scheduled = True
+            else:
+                return
+        finally:
+            self._lock.release()
+
+        if self._schedule is None:
+            if run_now:
+                self.dispatch()
+        else:
+            self._schedule(delay, self.dispatch)
+
+    def dispatch(self):
+        """ Delivers all queued events. """
+        self._dispatch_lock.acquire()
+        try:
+            self._lock.acquire()
+            try:
+                batch = self._pending
+                self._pending = []
+                self._keys = {}
+                self._scheduled = False
+                self._urgent_scheduled = False
+                self._last_dispatch = time.time()
+            finally:
+                self._lock.release()
+            if batch:
+                self._deliver(batch)
+        finally:
+            self._dispatch_lock.release()
+
+    def dispatch_if_due(self):
+        """ Delivers all queued events if a frame has passed since the
+        last batch.
+        """
+        self._lock.acquire()
+        try:
+            due = time.time() >= self._last_dispatch + self._interval
+        finally:
+            self._lock.release()
+        if due:
+            self.dispatch()
+
+    def has_pending(self):
+        """ Returns whether events are queued. """
+        self._lock.acquire()
+        try:
+            return len(self._pending) > 0
+        finally:
+            self._lock.release()
@@ -44,8 +44,46 @@ class InvalidImplementationName(LoaderException):
         msg = 'Invalid implementation name %s' % (impl_name)
         LoaderException.__init__(self, msg)
 
+MANIFEST_MODULE = 'manifest'
+""" Name of the implementation manifest module of each package.
+
+.. versionadded:: 0.200.6
+"""
+
+MANIFEST_TEMPLATE = \
+"""# %(module_name)s
+#
+# Implementation manifest, generated by generate_manifests.py when the
+# package is built. Do not edit.
+
+\"\"\" %(loader_name)s manifest \"\"\"
+
+MODULES = %(modules)s
+\"\"\" Modules found when the manifest was generated \"\"\"
+
+IMPLEMENTATIONS = %(implementations)s
+\"\"\" Implementation name to (module name, class name) mapping \"\"\"
+"""
+""" Template used by :meth:`LoaderBase.write_manifest`.
+
+.. versionadded:: 0.200.6
+"""
+
 class LoaderBase(object):
-    """ Base symbol loader class """
+    """ Base symbol loader class
+
+    Implementations are looked up in the package's manifest module
+    (see :data:`MANIFEST_MODULE`) first, so only the selected
+    implementation's module is imported. The manifests are generated when
+    the package is built. Modules listed in the manifest may be missing,
+    as binary packages may ship parts of a package directory only. If
+    there is no manifest, if the package directory holds a module it does
+    not list or if one of its entries cannot be loaded all modules are
+    imported and scanned for implementations instead.
+
+    .. versionchanged:: 0.200.6
+      Implementations are loaded lazily using the package's manifest.
+    """
     def __init__(self, module_prefix, interface_class, basedir):
         self._module_prefix = module_prefix
         self._interface_class = interface_class
@@ -57,11 +95,17 @@ class LoaderBase(object):
         self._name_suffix = self._cls_name[:-6]
         self._basedir = basedir
         self._modules = {}
-        self._find_modules()
+        self._manifest = None
+        self._scanned = False
+        self._load_manifest()
+        if self._manifest is None:
+            self._find_modules()
 
-    def _find_modules(self):
-        """ Tries to find all available modules and adds them to
-        the module list.
+    def _list_modules(self):
+        """ Returns the sorted names of all modules in the package
+        directory.
+
+        .. versionadded:: 0.200.6
         """
         mod_names = []
 
@@ -70,7 +114,8 @@ class LoaderBase(object):
                       self._cls_name, dir, prefix)
             for name in os.listdir(dir):
                 full_path = os.path.join(dir, name)
-                if name == '__init__.py' or name == 'loader.py':
+                if name == '__init__.py' or name == 'loader.py' or \
+                       name == '%s.py' % (MANIFEST_MODULE):
                     continue
                 if os.path.isdir(full_path) or \
                        (name.endswith('.py') and os.path.isfile(full_path)):
@@ -81,8 +126,78 @@ class LoaderBase(object):
                     LOG.debug('[%s] Found module %s.%s',
                               self._cls_name, prefix, name)
         __recursive_mod_find(self._basedir, self._module_prefix)
+        mod_names.sort()
+        return mod_names
+
+    def _load_manifest(self):
+        """ Loads the package's manifest, if it exists and lists all
+        modules found in the package directory. Implementations of modules
+        not found are dropped.
+
+        .. versionadded:: 0.200.6
+        """
+        manifest_name = '%s.%s' % (self._module_prefix, MANIFEST_MODULE)
+        try:
+            manifest = __import__(manifest_name, fromlist=['*',])
+        except ImportError, e:
+            LOG.debug('[%s] No manifest %s (%s).', self._cls_name,
+                      manifest_name, e)
+            return
+
+        modules = getattr(manifest, 'MODULES', ())
+        found = self._list_modules()
+        for mod_name in found:
+            if not mod_name in modules:
+                LOG.debug('[%s] Manifest %s is stale, %s is not listed.',
+                          self._cls_name, manifest_name, mod_name)
+                return
+        self._manifest = {}
+        for name, entry in getattr(manifest, 'IMPLEMENTATIONS', {}).items():
+            # Implementations may be defined in a module of a subpackage.
+            top_module = '.'.join(entry[0].split('.')[
+                :len(self._module_prefix.split('.')) + 1])
+            if top_module in found:
+                self._manifest[name] = entry
+
+    def _load_from_manifest(self, name):
+        """ Imports the implementation named in the manifest.
+
+        :param name: Implementation name
+        :returns: The implementation's class or None if the manifest entry
+          is missing or does not match the module's contents.
+
+        .. versionadded:: 0.200.6
+        """
+        if not self._manifest.has_key(name):
+            return None
+        mod_name, symbol_name = self._manifest[name]
+        try:
+            LOG.debug('[%s] Importing %s', self._cls_name, mod_name)
+            module = __import__(mod_name, fromlist=[symbol_name,])
+        except ImportError, e:
+            LOG.debug('[%s] Could not load module %s (%s).',
+                      self._cls_name, mod_name, e)
+            return None
 
-        for mod_name in mod_names:
+        sym = getattr(module, symbol_name, None)
+        try:
+            if sym is self._interface_class or \
+                   not issubclass(sym, self._interface_class):
+                return None
+        except TypeError:
+            return None
+        return sym
+
+    def _find_modules(self):
+        """ Tries to find all available modules and adds them to
+        the module list.
+
+        .. versionchanged:: 0.200.6
+          Only invoked if there is no usable manifest.
+        """
+        self._manifest = None
+        self._scanned = True
+        for mod_name in self._list_modules():
             try:
                 LOG.debug('[%s] Importing %s', self._cls_name, mod_name)
                 module = __import__(mod_name, fromlist=['*',])
@@ -114,16 +229,101 @@ class LoaderBase(object):
 
     def get_implementations(self):
         """ Returns list of implementation names """
+        if self._manifest is not None:
+            return self._manifest.keys()
         return self._modules.keys()
 
     def get_class(self, name):
         """ Returns symbol for given implementation name
 
         :param name: Implementation name
+
+        .. versionchanged:: 0.200.6
+          Only the implementation's module is imported if the manifest is
+          up to date.
         """
+        if self._modules.has_key(name):
+            return self._modules[name]
+
+        if self._manifest is not None:
+            sym = self._load_from_manifest(name)
+            if sym is not None:
+                self._modules[name] = sym
+                return sym
+            LOG.debug('[%s] Manifest entry for %s unusable, scanning '
+                      'modules.', self._cls_name, name)
+            self._find_modules()
+
         if not name in self._modules.keys():
             LOG.debug('[%s] Unknown implementation: %s',
                       self._cls_name, name)
             raise InvalidImplementationName(name)
         return self._modules[name]
-            
+
+    def get_manifest(self):
+        """ Scans all modules and returns the package's manifest data.
+
+        :returns: A (modules, implementations) tuple. modules is the
+          sorted list of module names, implementations maps implementation
+          names to (module name, class name) tuples.
+
+        .. versionadded:: 0.200.6
+        """
+        if not self._scanned:
+            self._modules = {}
+            self._find_modules()
+        implementations = {}
+        for name, sym in self._modules.items():
+            implementations[name] = (sym.__module__, sym.__name__)
+        return self._list_modules(), implementations
+
+    def write_manifest(self, path=None):
+        """ Scans all modules and writes the package's manifest module.
+
+        :param path: Path of the manifest module. Defaults to the manifest
+          module in the package directory.
+
+        .. versionadded:: 0.200.6
+        """
+        if path is None:
+            path = os.path.join(self._basedir, '%s.py' % (MANIFEST_MODULE))
+        modules, implementations = self.get_manifest()
+        f = open(path, 'w')
+        try:
+            f.write(format_manifest('%s.%s' % (self._module_prefix,
+                                               MANIFEST_MODULE),
+                                    self._cls_name, modules,
+                                    implementations))
+        finally:
+            f.close()
+        LOG.debug('[%s] Wrote manifest %s', self._cls_name, path)
+
+def format_manifest(module_name, loader_name, modules, implementations):
+    """ Formats a manifest module.
+
+    :param module_name: Full name of the manifest module.
+    :param loader_name: Name of the loader class using the manifest.
+    :param modules: List of module names.
+    :param implementations: Implementation name to (module name, class name)
+      mapping.
+    :returns: The manifest module's source code.
+
+    .. versionadded:: 0.200.6
+    """
+    module_lines = ['(']
+    for mod_name in modules:
+        module_lines.append('    %r,' % (mod_name))
+    module_lines.append(')')
+
+    impl_lines = ['{']
+    names = implementations.keys()
+    names.sort()
+    for name in names:
+        impl_lines.append('    %r: %r,' % (name, implementations[name]))
+    impl_lines.append('}')
+
+    return MANIFEST_TEMPLATE % {'module_name': module_name.replace('.', '/')
+                                + '.py',
+                                'loader_name': loader_name,
+                                'modules': '\n'.join(module_lines),
+                                'implementations': '\n'.join(impl_lines)}
@@ -20,16 +20,52 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
 #  USA.
 
-""" Wrappers around lsb_release """
+""" Distribution detection
+
+The distribution name, release and codename are read from
+/etc/os-release, /etc/lsb-release and /etc/debian_version. lsb_release is
+only invoked for values none of these files provide. All values are
+looked up once per process.
+
+.. versionchanged:: 0.200.6
+  Reads the release files instead of invoking lsb_release.
+"""
 
 import logging
 import subprocess
+import threading
 
 LOG = logging.getLogger('UpdateManager.Util.lsb')
 
 LSB_RELEASE_PATH = "/usr/bin/lsb_release"
 """ Path to the lsb_release binary """
 
+OS_RELEASE_PATHS = ('/etc/os-release', '/usr/lib/os-release')
+""" os-release files, in order of precedence
+
+.. versionadded:: 0.200.6
+"""
+
+LSB_RELEASE_FILE_PATH = '/etc/lsb-release'
+""" Path to the lsb-release file
+
+.. versionadded:: 0.200.6
+"""
+
+DEBIAN_VERSION_PATH = '/etc/debian_version'
+""" Path to the debian_version file
+
+.. versionadded:: 0.200.6
+"""
+
+_FIELD_ARGS = {'name': '-si', 'release': '-sr', 'codename': '-sc'}
+""" lsb_release arguments for each field """
+
+_RELEASE_INFO = None
+""" Memoized distribution information """
+
+_RELEASE_INFO_LOCK = threading.Lock()
+
 class LSBError(Exception):
     """ lsb_release error representation """
     def __init__(self, err):
@@ -56,32 +92,173 @@ def _invoke_lsb_release(args):
         raise LSBError(err)
     return str(out).strip()
 
+def _parse_release_file(path):
+    """ Parses a file of shell variable assignments like /etc/os-release.
+
+    :param path: Path to the file
+    :returns: Dictionary of variables, empty if the file cannot be read.
+
+    .. versionadded:: 0.200.6
+    """
+    values = {}
+    try:
+        f = open(path)
+        try:
+            lines = f.readlines()
+        finally:
+            f.close()
+    except IOError:
+        return values
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#') or not '=' in line:
+            continue
+        key, value = line.split('=', 1)
+        value = value.strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'':
+            quote = value[0]
+            value = value[1:-1]
+            if quote == '"':
+                for char in ('\\', '"', '$', '`'):
+                    value = value.replace('\\' + char, char)
+        values[key.strip()] = value
+    return values
+
+def read_release_info(os_release_paths=OS_RELEASE_PATHS,
+                      lsb_release_path=LSB_RELEASE_FILE_PATH,
+                      debian_version_path=DEBIAN_VERSION_PATH):
+    """ Reads the distribution information from the release files.
+
+    Values are derived the same way lsb_release derives them: from
+    os-release first, overridden by lsb-release. debian_version is used
+    for values still missing on Debian systems.
+
+    :param os_release_paths: os-release files, in order of precedence.
+    :param lsb_release_path: Path to the lsb-release file.
+    :param debian_version_path: Path to the debian_version file.
+    :returns: Dictionary with the keys name, release and codename. Values
+      that could not be determined are missing.
+
+    .. versionadded:: 0.200.6
+    """
+    info = {}
+    os_release = {}
+    for path in os_release_paths:
+        os_release = _parse_release_file(path)
+        if os_release:
+            break
+
+    dist_id = os_release.get('ID', '')
+    if dist_id:
+        dist_id = dist_id[0].upper() + dist_id[1:]
+        # lsb_release prefers NAME if it only differs in capitalization.
+        name = os_release.get('NAME', '')
+        if name.lower() == dist_id.lower():
+            dist_id = name
+        info['name'] = dist_id
+    if os_release.get('VERSION_ID'):
+        info['release'] = os_release['VERSION_ID']
+    if os_release.get('VERSION_CODENAME'):
+        info['codename'] = os_release['VERSION_CODENAME']
+
+    lsb_release = _parse_release_file(lsb_release_path)
+    for key, field in (('DISTRIB_ID', 'name'),
+                       ('DISTRIB_RELEASE', 'release'),
+                       ('DISTRIB_CODENAME', 'codename')):
+        if lsb_release.get(key):
+            info[field] = lsb_release[key]
+
+    if not info.has_key('release') or not info.has_key('codename'):
+        try:
+            f = open(debian_version_path)
+            try:
+                debian_version = f.read().strip()
+            finally:
+                f.close()
+        except IOError:
+            debian_version = ''
+
+        if debian_version:
+            if not info.has_key('name'):
+                info['name'] = 'Debian'
+            if debian_version[0].isdigit():
+                # Stable releases, like 5.0.3.
+                info.setdefault('release', debian_version)
+            elif '/' in debian_version:
+                # Testing and unstable, like squeeze/sid.
+                info.setdefault('codename', debian_version.split('/')[0])
+    return info
+
+def _get_field(field):
+    """ Returns a memoized distribution information field.
+
+    Reads the release files on first use and invokes lsb_release for
+    fields they do not provide.
+
+    :param field: One of name, release and codename.
+    :returns: The field's value.
+    :raises: :exc:`LSBError` if lsb_release fails.
+
+    .. versionadded:: 0.200.6
+    """
+    global _RELEASE_INFO
+    _RELEASE_INFO_LOCK.acquire()
+    try:
+        if _RELEASE_INFO is None:
+            _RELEASE_INFO = read_release_info()
+        if not _RELEASE_INFO.has_key(field):
+            LOG.debug('%s not found in release files, invoking lsb_release',
+                      field)
+            _RELEASE_INFO[field] = _invoke_lsb_release(_FIELD_ARGS[field])
+        return _RELEASE_INFO[field]
+    finally:
+        _RELEASE_INFO_LOCK.release()
+
+def clear_cache():
+    """ Forgets the memoized distribution information.
+
+    .. versionadded:: 0.200.6
+    """
+    global _RELEASE_INFO
+    _RELEASE_INFO_LOCK.acquire()
+    try:
+        _RELEASE_INFO = None
+    finally:
+        _RELEASE_INFO_LOCK.release()
+
 def get_distribution_name():
-    """ Gets the distribution name via lsb_release
+    """ Gets the distribution name
 
     :returns: Distribution name
+
+    .. versionchanged:: 0.200.6
+      Read from the release files and memoized.
     """
-    distribution_name = _invoke_lsb_release('-si')
-    LOG.debug('lsb_release reported distribution name %s'
-              % (distribution_name))
+    distribution_name = _get_field('name')
+    LOG.debug('Detected distribution name %s' % (distribution_name))
     return distribution_name
 
 def get_distribution_release():
-    """ Gets the distribution release via lsb_release
+    """ Gets the distribution release
 
     :returns: Distribution release
+
+    .. versionchanged:: 0.200.6
+      Read from the release files and memoized.
     """
-    release = _invoke_lsb_release('-sr')
-    LOG.debug('lsb_release reported distribution release %s'
-              % (release))
+    release = _get_field('release')
+    LOG.debug('Detected distribution release %s' % (release))
     return release
 
 def get_distribution_codename():
-    """ Gets the distribution codename via lsb_release
+    """ Gets the distribution codename
 
     :returns: Distribution codename
+
+    .. versionchanged:: 0.200.6
+      Read from the release files and memoized.
     """
-    codename = _invoke_lsb_release('-sc')
-    LOG.debug('lsb_release reported distribution codename %s'
-              % (codename))
+    codename = _get_field('codename')
+    LOG.debug('Detected distribution codename %s' % (codename))
     return codename
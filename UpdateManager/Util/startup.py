@@ -0,0 +1,179 @@
+# UpdateManager/Util/startup.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+""" Startup phase scheduler
+
+.. versionadded:: 0.200.6
+"""
+
+import logging
+import sys
+import threading
+import time
+
+LOG = logging.getLogger('UpdateManager.Util.startup')
+
+class StartupPhase(object):
+    """ A single startup phase and its result.
+
+    :param name: The phase's name.
+    :param func: Function implementing the phase.
+    """
+    def __init__(self, name, func, args, kwargs):
+        self.name = name
+        self.thread_name = None
+        self.start_time = None
+        self.end_time = None
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._result = None
+        self._exc_info = None
+        self._thread = None
+
+    def run(self):
+        """ Runs the phase, recording its start and end time. """
+        self.thread_name = threading.currentThread().getName()
+        self.start_time = time.time()
+        try:
+            try:
+                self._result = self._func(*self._args, **self._kwargs)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except:
+                self._exc_info = sys.exc_info()
+        finally:
+            self.end_time = time.time()
+
+    def start(self):
+        """ Runs the phase in a new thread. """
+        self._thread = threading.Thread(target=self.run,
+                                        name='Startup-%s' % (self.name))
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def wait(self):
+        """ Waits for the phase to finish.
+
+        :returns: The phase function's return value.
+        :raises: The exception raised by the phase function, if any.
+        """
+        if self._thread is not None:
+            self._thread.join()
+        if self._exc_info is not None:
+            exc_type, exc_value, exc_tb = self._exc_info
+            raise exc_type, exc_value, exc_tb
+        return self._result
+
+class StartupScheduler(object):
+    """ Runs startup phases, in the calling thread or in parallel, and
+    records a timeline of all phases.
+
+    Phases that do not depend on each other are started with
+    :meth:`start` and collected with :meth:`wait`, so they overlap with
+    the phases run in the main thread.
+    """
+    def __init__(self):
+        self._start_time = time.time()
+        self._phases = []
+        self._by_name = {}
+        self._marks = []
+
+    def _add_phase(self, name, func, args, kwargs):
+        """ Creates and registers a phase. """
+        phase = StartupPhase(name, func, args, kwargs)
+        self._phases.append(phase)
+        self._by_name[name] = phase
+        return phase
+
+    def run(self, name, func, *args, **kwargs):
+        """ Runs a phase in the calling thread.
+
+        :param name: The phase's name.
+        :param func: Function implementing the phase.
+        :returns: The function's return value.
+        """
+        phase = self._add_phase(name, func, args, kwargs)
+        phase.run()
+        return phase.wait()
+
+    def start(self, name, func, *args, **kwargs):
+        """ Starts a phase in a new thread.
+
+        :param name: The phase's name.
+        :param func: Function implementing the phase.
+        """
+        self._add_phase(name, func, args, kwargs).start()
+
+    def wait(self, name):
+        """ Waits for a phase started with :meth:`start`.
+
+        :param name: The phase's name.
+        :returns: The phase function's return value.
+        :raises: The exception raised by the phase function, if any.
+        """
+        return self._by_name[name].wait()
+
+    def mark(self, name):
+        """ Records a point in time, like the first window being shown.
+
+        :param name: The mark's name.
+        """
+        self._marks.append((name, time.time()))
+
+    def get_timeline(self):
+        """ Returns the recorded timeline.
+
+        :returns: A list of (name, thread name, start, end) tuples with
+          times in seconds since the scheduler has been created, ordered
+          by start time. Marks have the same start and end time and
+          unfinished phases an end time of None.
+        """
+        timeline = []
+        for phase in self._phases:
+            if phase.start_time is None:
+                continue
+            end = None
+            if phase.end_time is not None:
+                end = phase.end_time - self._start_time
+            timeline.append((phase.name, phase.thread_name,
+                             phase.start_time - self._start_time, end))
+        for name, mark_time in self._marks:
+            offset = mark_time - self._start_time
+            timeline.append((name, None, offset, offset))
+        timeline.sort(key=lambda entry: entry[2])
+        return timeline
+
+    def format_timeline(self):
+        """ Returns the timeline as human-readable text. """
+        lines = ['Startup timeline (seconds):']
+        for name, thread_name, start, end in self.get_timeline():
+            if thread_name is None:
+                lines.append('  %7.3f          %s' % (start, name))
+            elif end is None:
+                lines.append('  %7.3f -   ...    %s [%s]' % (start, name,
+                                                            thread_name))
+            else:
+                lines.append('  %7.3f - %7.3f  %s (%.3f) [%s]'
+                             % (start, end, name, end - start,
+                                thread_name))
+        return '\n'.join(lines)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# generate_manifests.py
+#
+#  Copyright (c) 2009 Canonical
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+""" Regenerates the frontend, backend and distribution manifests.
+
+The manifests are generated by the build_py command of setup.py, in the
+build directory. Running this script writes them to the source tree
+instead. All implementations need to be importable.
+"""
+
+import os
+
+SCRIPT_ABSPATH=os.path.abspath(__file__)
+DIR_ABSPATH=os.path.abspath(os.path.dirname(SCRIPT_ABSPATH))
+
+import sys
+
+sys.path.insert(0, DIR_ABSPATH)
+
+from UpdateManager.Backend.loader import BackendLoader
+from UpdateManager.DistSpecific.loader import DistLoader
+from UpdateManager.Frontend.loader import FrontendLoader
+from UpdateManager.Util.loader import MANIFEST_MODULE
+
+LOADER_CLASSES = (FrontendLoader, BackendLoader, DistLoader)
+""" Loaders a manifest is generated for """
+
+def write_manifests(build_dir=None):
+    """ Scans the packages of all loaders and writes their manifests.
+
+    :param build_dir: Directory the UpdateManager package is built in.
+      Defaults to the source tree.
+    """
+    for loader_class in LOADER_CLASSES:
+        loader = loader_class()
+        path = None
+        if build_dir is not None:
+            package = loader_class.__module__.rsplit('.', 1)[0]
+            path = os.path.join(build_dir, *package.split('.'))
+            path = os.path.join(path, '%s.py' % (MANIFEST_MODULE))
+        loader.write_manifest(path)
+        print '%s: %s' % (loader_class.__name__,
+                          ' '.join(loader.get_implementations()))
+
+if __name__ == '__main__':
+    write_manifests()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 from distutils.core import setup, Extension
+from distutils.command.build_py import build_py
 import glob
 import os
 from DistUtilsExtra.command import *
@@ -9,6 +10,15 @@ from UpdateManager import __version__
 
 disabled = []
 
+class build_py_manifests(build_py):
+    """ Builds the modules and generates the implementation manifests of
+    the built packages, see generate_manifests.py.
+    """
+    def run(self):
+        build_py.run(self)
+        from generate_manifests import write_manifests
+        write_manifests(self.build_lib)
+
 setup(name='update-manager',
       version=__version__,
       url="http://update-manager.alioth.debian.org",
@@ -32,6 +42,7 @@ setup(name='update-manager',
       scripts=[
                'update-manager', 
                'update-manager-text', 
+               'update-manager-events',
                ],
       data_files=[
                   ('share/update-manager/ui',
@@ -45,6 +56,7 @@ setup(name='update-manager',
                   ),
                   ],
       cmdclass = { "build" : build_extra.build_extra,
+                   "build_py" : build_py_manifests,
                    "build_i18n" :  build_i18n.build_i18n,
                    "build_help" :  build_help.build_help,
                    "build_icons" :  build_icons.build_icons }
@@ -26,6 +26,7 @@ loader = unittest.TestLoader()
 
 import logging
 import sys
+from StringIO import StringIO
 
 MOCK_UID = 0
 
@@ -51,10 +52,11 @@ from tests._mock.DistSpecific import MockDistGenerator
 from UpdateManager.Application import Application, InvalidBaseClass
 from UpdateManager.Application import ExitProgramException
 from UpdateManager.Application import LoadingFailedException
+from UpdateManager.Application import CHECK_STATUS_CODES
 
 from UpdateManager.Frontend import FrontendBase
-from UpdateManager.Backend import BackendBase
-from UpdateManager.DistSpecific import DistBase
+from UpdateManager.Backend import BackendBase, UpdateSummary
+from UpdateManager.DistSpecific import DistBase, UPDATE_CATEGORY
 from UpdateManager.Util.log import LOGLEVEL_NAME_MAP
 
 ### custom logging handler to suppress all log output
@@ -192,5 +194,67 @@ class ApplicationCase(unittest.TestCase):
                               app_args=['-d'])
         except ExitProgramException:
             self.fail('ExitProgramException raised.')
+
+    def test12_summary(self):
+        # -c still starts an update check in the frontend.
+        app = Application("update-manager", "/usr/share/locale",
+                          frontend=MockFrontend, backend=MockBackend,
+                          app_args=['-c'])
+        self.failIf(app._frontend is None)
+        self.failUnless(app.get_option('run_check'))
+
+        MOCK_GETUID.set_uid(1000)
+        BackendGenerator.set_requires_root(True)
+        FrontendGenerator.set_uses_privileged_funcs(True)
+        app = Application("update-manager", "/usr/share/locale",
+                          frontend=MockFrontend, backend=MockBackend,
+                          app_args=['--summary'])
+        # Neither a frontend nor root privileges are needed.
+        self.failUnless(app._frontend is None)
+
+        for counts, removals, status in (
+            ({}, 0, CHECK_STATUS_CODES.NO_UPDATES),
+            ({UPDATE_CATEGORY.DEFAULT: 2}, 0,
+             CHECK_STATUS_CODES.UPDATES_AVAILABLE),
+            ({}, 1, CHECK_STATUS_CODES.UPDATES_AVAILABLE),
+            ({UPDATE_CATEGORY.SECURITY: 1, UPDATE_CATEGORY.DEFAULT: 2}, 0,
+             CHECK_STATUS_CODES.SECURITY_UPDATES_AVAILABLE)):
+            BackendGenerator.set_update_summary(
+                UpdateSummary(counts, removals, 1024))
+            stdout = sys.stdout
+            sys.stdout = StringIO()
+            try:
+                try:
+                    app.main()
+                except ExitProgramException, e:
+                    self.assertEquals(e.status, status)
+                else:
+                    self.fail('ExitProgramException not raised.')
+                output = sys.stdout.getvalue()
+            finally:
+                sys.stdout = stdout
+            self.failUnless('security: %d\n' % (
+                counts.get(UPDATE_CATEGORY.SECURITY, 0)) in output)
+            self.failUnless('removals: %d\n' % (removals) in output)
+            self.failUnless('download-bytes: 1024\n' in output)
+
+        MOCK_GETUID.set_uid(0)
+        BackendGenerator.set_requires_root(False)
+        FrontendGenerator.set_uses_privileged_funcs(False)
+
+    def test13_first_window_shown(self):
+        app = Application("update-manager", "/usr/share/locale",
+                          frontend=MockFrontend, backend=MockBackend,
+                          app_args=['--startup-trace'])
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            app.first_window_shown()
+            app.first_window_shown()
+            output = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertEquals(output.count('Startup timeline'), 1)
+        self.failUnless('first-window' in output)
         
 ApplicationSuite = loader.loadTestsFromTestCase(ApplicationCase)
@@ -0,0 +1,122 @@
+# tests/Backend/PackageInfoBenchmark.py
+#
+#  Copyright (c) 2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+
+""" PackageInfo memory and construction time benchmark.
+
+Run this module directly to print the results for 10000 packages.
+"""
+
+import sys
+import time
+import unittest
+
+loader = unittest.TestLoader()
+
+from UpdateManager.Backend import EMPTY_RELATION_VIEW, DependencyGraph
+from UpdateManager.Backend.PythonApt import PackageInfo, RELATION
+
+BENCHMARK_PACKAGE_COUNT = 10000
+
+class FakeApplication(object):
+    def get_update_category(self, pkg_info):
+        return 0
+
+class FakePackage(object):
+    def __init__(self, name):
+        self.name = name
+        self.installed = None
+        self.candidate = None
+
+class LegacyPackageInfo(object):
+    """ Attribute layout of PackageInfo before __slots__ were introduced """
+    def __init__(self, package_obj, app):
+        self._pyapt_package = package_obj
+        self._app = app
+        self._dependencies = []
+        self._rdependencies = []
+        self._sdependencies = []
+        self._rsdependencies = []
+        self._conflicts = []
+        self._uninst_dependencies = []
+        self._update_category = app.get_update_category(self)
+        self._broken = False
+        self._download_size = None
+
+def object_size(obj):
+    """ Returns the size of an object including its attribute containers. """
+    size = sys.getsizeof(obj)
+    attrs = getattr(obj, '__dict__', None)
+    if attrs is not None:
+        size += sys.getsizeof(attrs)
+        values = attrs.values()
+    else:
+        values = [getattr(obj, name, None) for name in obj.__slots__]
+    for value in values:
+        if isinstance(value, list):
+            size += sys.getsizeof(value)
+        elif isinstance(value, dict):
+            size += sys.getsizeof(value)
+            for item in value.values():
+                size += sys.getsizeof(item)
+    return size
+
+def run_benchmark(cls, count=BENCHMARK_PACKAGE_COUNT):
+    """ Creates count objects of cls and returns the average object size
+    in bytes and the construction time in seconds.
+    """
+    app = FakeApplication()
+    packages = [FakePackage('package%d' % i) for i in xrange(count)]
+    start = time.time()
+    objects = [cls(pkg, app) for pkg in packages]
+    duration = time.time() - start
+    size = sum([object_size(obj) for obj in objects]) / float(count)
+    return size, duration
+
+class PackageInfoBenchmarkCase(unittest.TestCase):
+    def test0_no_instance_dict(self):
+        pkg_info = PackageInfo(FakePackage('test'), FakeApplication())
+        self.assertFalse(hasattr(pkg_info, '__dict__'))
+
+    def test1_lazy_relations(self):
+        pkg_info = PackageInfo(FakePackage('test'), FakeApplication())
+        self.assertTrue(pkg_info.get_dependencies() is EMPTY_RELATION_VIEW)
+        dep = PackageInfo(FakePackage('dep'), FakeApplication())
+        graph = DependencyGraph()
+        graph.add_edge(RELATION.DEPENDS, graph.add_node(pkg_info),
+                       graph.add_node(dep))
+        self.assertEquals(list(pkg_info.get_dependencies()), [dep])
+        self.assertFalse(pkg_info.get_conflicts())
+        self.assertRaises(AttributeError, getattr, pkg_info.get_dependencies(),
+                          'append')
+
+    def test2_smaller_than_legacy(self):
+        slots_size, slots_time = run_benchmark(PackageInfo)
+        legacy_size, legacy_time = run_benchmark(LegacyPackageInfo)
+        self.assertTrue(slots_size < legacy_size)
+
+PackageInfoBenchmarkSuite = loader.loadTestsFromTestCase(
+    PackageInfoBenchmarkCase)
+
+if __name__ == '__main__':
+    for cls in (LegacyPackageInfo, PackageInfo):
+        size, duration = run_benchmark(cls)
+        print '%-20s %8.1f bytes/object %8.3f s for %d objects' \
+              % (cls.__name__, size, duration, BENCHMARK_PACKAGE_COUNT)
@@ -0,0 +1,172 @@
+# tests/Backend/PackageInfoStore.py
+#
+#  Copyright (c) 2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+
+import unittest
+
+loader = unittest.TestLoader()
+
+from UpdateManager.Backend import PackageInfoBase, PackageInfoStoreBase
+from UpdateManager.Backend import PackageDependencyBase, DEP_RELATION
+
+class FakePackageInfo(PackageInfoBase):
+    def __init__(self, name, source, archive, category, installed=True,
+                 size=100, origin='Debian', depends=()):
+        self._name = name
+        self._source = source
+        self._archive = archive
+        self._origin = origin
+        self._category = category
+        self._installed = installed
+        self._size = size
+        self._broken = False
+        self._depends = depends
+        self._graph = None
+        self._node_id = None
+
+    def _set_graph_node(self, graph, node_id):
+        self._graph = graph
+        self._node_id = node_id
+
+    def _resolve_dependencies(self, pkginfo_store):
+        for name in self._depends:
+            pkg_dep, inst_matches, cand_matches = \
+                     pkginfo_store.check_dependency(name, DEP_RELATION.GTE,
+                                                    '1.0')
+            if cand_matches:
+                target_id = self._graph.get_node_id(name)
+                self._graph.add_edge('depends', self._node_id, target_id)
+                self._graph.add_edge('rdepends', target_id, self._node_id)
+
+    def get_candidate_version(self):
+        return '1.0'
+
+    def get_package_name(self):
+        return self._name
+
+    def get_source_package_name(self):
+        return self._source
+
+    def get_candidate_archive_name(self):
+        return self._archive
+
+    def get_candidate_origin_name(self):
+        return self._origin
+
+    def get_update_category(self):
+        return self._category
+
+    def is_installed(self):
+        return self._installed
+
+    def get_download_size(self):
+        return self._size
+
+class CountingStore(PackageInfoStoreBase):
+    def __init__(self):
+        PackageInfoStoreBase.__init__(self)
+        self.created = 0
+
+    def _create_dependency(self, name, relation, version):
+        self.created += 1
+        return PackageDependencyBase(name, relation, version)
+
+def names(pkg_list):
+    return sorted([pkg.get_package_name() for pkg in pkg_list])
+
+class PackageInfoStoreCase(unittest.TestCase):
+    def setUp(self):
+        self.store = PackageInfoStoreBase()
+        self.pkgs = [
+            FakePackageInfo('libfoo1', 'foo', 'stable', 0),
+            FakePackageInfo('foo-bin', 'foo', 'stable-security', 1,
+                            size=50),
+            FakePackageInfo('bar', 'bar', 'stable', 0, installed=False,
+                            size=10, origin='Other'),
+            ]
+        for pkg in self.pkgs:
+            self.store.add_package(pkg)
+
+    def test0_counters(self):
+        self.assertEquals(self.store.package_count(), 3)
+        self.assertEquals(self.store.get_install_count(), 1)
+        self.assertEquals(self.store.get_upgrade_count(), 2)
+        self.assertEquals(self.store.get_download_size(), 160)
+
+    def test1_indexes(self):
+        self.assertEquals(names(self.store.get_packages_by_source('foo')),
+                          ['foo-bin', 'libfoo1'])
+        self.assertEquals(names(self.store.get_packages_by_archive('stable')),
+                          ['bar', 'libfoo1'])
+        self.assertEquals(names(self.store.get_packages_by_origin('Other')),
+                          ['bar'])
+        self.assertEquals(names(self.store.get_packages_by_category(1)),
+                          ['foo-bin'])
+        self.assertEquals(
+            names(self.store.get_packages_by_installed_state(False)),
+            ['bar'])
+        self.assertEquals(self.store.get_packages_by_source('none'), [])
+
+    def test2_replace_package(self):
+        replacement = FakePackageInfo('bar', 'bar2', 'testing', 1, size=20)
+        self.store.add_package(replacement)
+        self.assertEquals(self.store.package_count(), 3)
+        self.assertEquals(self.store.get_install_count(), 0)
+        self.assertEquals(self.store.get_upgrade_count(), 3)
+        self.assertEquals(self.store.get_download_size(), 170)
+        self.assertEquals(self.store.get_packages_by_source('bar'), [])
+        self.assertEquals(names(self.store.get_packages_by_category(0)),
+                          ['libfoo1'])
+
+    def test3_removals(self):
+        removal = FakePackageInfo('old', 'old', 'now', 0)
+        self.store.add_removal(removal)
+        self.assertEquals(self.store.get_removal_count(), 1)
+        self.assertEquals(self.store.package_count(), 3)
+
+    def test4_dependency_graph(self):
+        store = CountingStore()
+        pkgs = [FakePackageInfo('libfoo1', 'foo', 'stable', 0),
+                FakePackageInfo('foo-bin', 'foo', 'stable', 0,
+                                depends=('libfoo1', 'missing')),
+                FakePackageInfo('foo-doc', 'foo', 'stable', 0,
+                                depends=('libfoo1',))]
+        for pkg in pkgs:
+            store.add_package(pkg)
+        store.resolve_dependencies()
+
+        graph = store.get_dependency_graph()
+        self.assertEquals(graph.node_count(), 3)
+        # Both packages depend on libfoo1, which is checked only once.
+        self.assertEquals(store.created, 2)
+        libfoo_id = graph.get_node_id('libfoo1')
+        self.assertEquals(names(graph.get_view('rdepends', libfoo_id)),
+                          ['foo-bin', 'foo-doc'])
+        view = graph.get_view('depends', graph.get_node_id('foo-bin'))
+        self.assertEquals(len(view), 1)
+        self.assertTrue(pkgs[0] in view)
+        self.assertFalse(graph.get_view('depends', libfoo_id))
+
+        # Resolving again rebuilds the graph.
+        store.resolve_dependencies()
+        self.assertFalse(graph is store.get_dependency_graph())
+        self.assertEquals(store.created, 4)
+
+PackageInfoStoreSuite = loader.loadTestsFromTestCase(PackageInfoStoreCase)
@@ -19,20 +19,467 @@
 #  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
 #  USA
 
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 
 loader = unittest.TestLoader()
 
 from tests._helpers import InterfaceValidator, ValidationFailed
 
-from UpdateManager.Backend.PythonApt import PythonAptBackend
-from UpdateManager.Backend import BackendBase
+from UpdateManager.Backend import PythonApt
+from UpdateManager.Backend.PythonApt import PythonAptBackend, PackageInfo, \
+     ArchiveSnapshot, _get_conflicts
+from UpdateManager.Backend import BackendBase, OriginInfo, DEP_RELATION
+
+class FakeOrigin(object):
+    def __init__(self, archive, trusted=True):
+        self.archive = archive
+        self.label = 'Debian'
+        self.origin = 'Debian'
+        self.component = 'main'
+        self.site = 'ftp.debian.org'
+        self.trusted = trusted
+
+class FakeCandidate(object):
+    def __init__(self, origins):
+        self.lookups = 0
+        self._origins = origins
+
+    @property
+    def origins(self):
+        self.lookups += 1
+        return self._origins
+
+class FakeBaseDependency(object):
+    def __init__(self, name, relation='', version=''):
+        self.name = name
+        self.relation = relation
+        self.version = version
+
+class FakeDependency(object):
+    def __init__(self, *or_dependencies):
+        self.or_dependencies = or_dependencies
+
+class FakeConflictsCandidate(object):
+    def __init__(self, version, conflicts, breaks):
+        self.version = version
+        self.requested = []
+        self._deps = {'Conflicts': conflicts, 'Breaks': breaks}
+
+    def get_dependencies(self, *types):
+        self.requested.append(types)
+        deps = []
+        for dep_type in types:
+            deps.extend(self._deps[dep_type])
+        return deps
+
+class FakePackage(object):
+    def __init__(self, name, origins):
+        self.name = name
+        self.candidate = FakeCandidate(origins)
+
+class FakeApplication(object):
+    def get_update_category(self, pkg_info):
+        return 0
+
+    def uses_privileged_functions(self):
+        return False
+
+class FakeUpgradeCandidate(FakeConflictsCandidate):
+    def __init__(self, version):
+        FakeConflictsCandidate.__init__(self, version, [], [])
+        self.origins = [FakeOrigin('stable')]
+        self.dependencies = []
+        self.source_name = 'source'
+        self.architecture = 'all'
+        self.size = 0
+
+class FakeUpgradePackage(object):
+    def __init__(self, name, dist_upgrade_only=False):
+        self.name = name
+        self.dist_upgrade_only = dist_upgrade_only
+        self.candidate = FakeUpgradeCandidate('2.0')
+        self.installed = FakeUpgradeCandidate('1.0')
+        self.marked_upgrade = True
+        self.marked_install = False
+        self.marked_downgrade = False
+        self.marked_delete = False
+        self.marked_reinstall = False
+        self.marked_keep = False
+        self.is_installed = True
+        self._pkg = self
+
+    def mark_keep(self):
+        self.marked_keep = True
+
+    def mark_install(self, auto_fix=True, auto_inst=True):
+        self.marked_keep = False
+
+class FakeDepCache(object):
+    broken_count = 0
+
+class FakePreviewDepCache(object):
+    def __init__(self, packages):
+        self._packages = packages
+        self.marked = {}
+
+    def upgrade(self, dist_upgrade=False):
+        for pkg in self._packages:
+            if dist_upgrade or not pkg.dist_upgrade_only:
+                self.marked[pkg.name] = pkg
+
+    def mark_install(self, pkg, auto_inst=True):
+        self.marked[pkg.name] = pkg
+
+    def mark_keep(self, pkg):
+        self.marked.pop(pkg.name, None)
+
+    @property
+    def deb_size(self):
+        return sum([pkg.candidate.size for pkg in self.marked.values()])
+
+    @property
+    def usr_size(self):
+        return 10 * len(self.marked)
+
+class FakeActionGroup(object):
+    def __init__(self, depcache):
+        pass
+
+    def release(self):
+        pass
+
+class FakeConfig(object):
+    def find_dir(self, name):
+        return tempfile.gettempdir()
+
+class FakeAcquire(object):
+    def __init__(self, progress):
+        self.progress = progress
+
+    def run(self):
+        # Downloads until the prefetch is cancelled.
+        for i in xrange(500):
+            if self.progress._abort:
+                return
+            time.sleep(0.01)
+
+class FakePackageManager(object):
+    fetched = []
+
+    def __init__(self, depcache):
+        self._depcache = depcache
+
+    def get_archives(self, fetcher, source_list, records):
+        assert isinstance(source_list, FakeSourceList)
+        assert source_list.read
+        assert isinstance(records, FakePackageRecords)
+        FakePackageManager.fetched.append(sorted(self._depcache.marked))
+
+class FakePackageRecords(object):
+    def __init__(self, cache):
+        self._cache = cache
+
+class FakeSourceList(object):
+    def __init__(self):
+        self.read = False
+
+    def read_main_list(self):
+        self.read = True
+
+class FakeAptPkg(object):
+    """ Replaces the parts of apt_pkg that require a real cache. """
+    ActionGroup = FakeActionGroup
+    Acquire = FakeAcquire
+    PackageManager = FakePackageManager
+    PackageRecords = FakePackageRecords
+    SourceList = FakeSourceList
+    config = FakeConfig()
+
+    def __init__(self, apt_pkg):
+        self._apt_pkg = apt_pkg
+
+    def get_lock(self, path):
+        return os.open(os.devnull, os.O_RDONLY)
+
+    def __getattr__(self, name):
+        return getattr(self._apt_pkg, name)
+
+class FakeCache(object):
+    def __init__(self, packages):
+        self.packages = packages
+        self.upgrades = []
+        self.dist_upgrade = None
+        self.required_download = 2048
+        self._depcache = FakeDepCache()
+        self._cache = None
+        self._list = None
+        self._records = None
+
+    def clear(self):
+        self.dist_upgrade = None
+        for pkg in self.packages:
+            pkg.marked_keep = False
+
+    def upgrade(self, dist_upgrade=False):
+        self.upgrades.append(dist_upgrade)
+        self.dist_upgrade = dist_upgrade
+
+    def get_changes(self):
+        return [pkg for pkg in self.packages
+                if (self.dist_upgrade or not pkg.dist_upgrade_only)
+                and not pkg.marked_keep]
 
 class PythonAptCase(unittest.TestCase):
+    def setUp(self):
+        self._apt_pkg = PythonApt.apt_pkg
+        PythonApt.apt_pkg = FakeAptPkg(self._apt_pkg)
+
+    def tearDown(self):
+        PythonApt.apt_pkg = self._apt_pkg
+
     def test0_implements_interface(self):
         try:
             InterfaceValidator(BackendBase, PythonAptBackend).validate()
         except ValidationFailed, v_failed:
             self.fail(v_failed.message)
 
+    def test1_candidate_origin(self):
+        app = FakeApplication()
+        pkg0 = PackageInfo(FakePackage('a', [FakeOrigin('now'),
+                                             FakeOrigin('stable')]), app)
+        pkg1 = PackageInfo(FakePackage('b', [FakeOrigin('stable')]), app)
+        origin = pkg0.get_candidate_origin()
+        self.assertEquals(origin.archive, 'stable')
+        self.assertTrue(origin is pkg1.get_candidate_origin())
+        self.assertEquals(pkg0.get_candidate_archive_name(), 'stable')
+        self.assertTrue(pkg0.candidate_origin_is_trusted())
+        self.assertEquals(pkg0._pyapt_package.candidate.lookups, 1)
+        self.assertRaises(TypeError, setattr, origin, 'archive', 'testing')
+
+    def test2_local_origin(self):
+        pkg = PackageInfo(FakePackage('a', [FakeOrigin('now')]),
+                          FakeApplication())
+        self.assertEquals(pkg.get_candidate_origin(), None)
+        self.assertFalse(pkg.candidate_origin_is_trusted())
+
+    def test3_archive_snapshot(self):
+        archive_dir = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(archive_dir, 'partial'))
+            open(os.path.join(archive_dir, 'a_1_all.deb'), 'w').close()
+            f = open(os.path.join(archive_dir, 'partial', 'b_1_all.deb'),
+                     'w')
+            f.write('x' * 10)
+            f.close()
+
+            snapshot = ArchiveSnapshot(archive_dir)
+            self.assertEquals(snapshot.get_download_size('a_1_all.deb', 100),
+                              0)
+            self.assertEquals(snapshot.get_download_size('b_1_all.deb', 100),
+                              90)
+            self.assertEquals(snapshot.get_download_size('c_1_all.deb', 100),
+                              100)
+
+            open(os.path.join(archive_dir, 'c_1_all.deb'), 'w').close()
+            snapshot.invalidate()
+            self.assertEquals(snapshot.get_download_size('c_1_all.deb', 100),
+                              0)
+        finally:
+            shutil.rmtree(archive_dir)
+
+    def test4_conflicts(self):
+        pkg = FakePackage('a', [])
+        pkg.candidate = FakeConflictsCandidate(
+            '1.0', [FakeDependency(FakeBaseDependency('b'))],
+            [FakeDependency(FakeBaseDependency('c', '<<', '2.0'))])
+        conflicts_cache = {}
+        conflicts = _get_conflicts(pkg, conflicts_cache)
+        self.assertEquals(conflicts, (('b', None, None),
+                                      ('c', DEP_RELATION.LT, '2.0')))
+        self.assertTrue(_get_conflicts(pkg, conflicts_cache) is conflicts)
+        self.assertEquals(len(pkg.candidate.requested), 1)
+
+    def test5_update_plans(self):
+        app = FakeApplication()
+        backend = PythonAptBackend(app)
+        backend.init_backend(app)
+        backend._cache = FakeCache([FakeUpgradePackage('a'),
+                                    FakeUpgradePackage('b', True)])
+
+        dist_store = backend.get_available_updates(True)
+        self.assertEquals(dist_store.package_count(), 2)
+        self.assertEquals(backend._cache.upgrades, [False, True])
+        self.assertTrue(dist_store._conflicts_cache
+                        is backend._conflicts_cache)
+
+        safe_store = backend.get_available_updates(False)
+        self.assertEquals(safe_store.package_count(), 1)
+        self.assertTrue(backend.get_available_updates(True) is dist_store)
+        self.assertEquals(backend._cache.upgrades, [False, True])
+
+    def test11_snapshot_deferred(self):
+        app = FakeApplication()
+        app.uses_privileged_functions = lambda: True
+        backend = PythonAptBackend(app)
+        backend.init_backend(app)
+        backend._cache = FakeCache([FakeUpgradePackage('a')])
+        backend.is_locked = lambda by_us=False: True
+        saved = []
+        done = threading.Event()
+        def fake_save_snapshot(plans, key):
+            saved.append(sorted(plans.keys()))
+            done.set()
+        orig_save_snapshot = PythonApt.save_snapshot
+        PythonApt.save_snapshot = fake_save_snapshot
+        try:
+            backend.get_available_updates(True)
+            self.assertEquals(saved, [])
+            self.assertTrue(backend.save_update_snapshot())
+            done.wait(5)
+            self.assertEquals(saved, [[0, 1]])
+            self.assertFalse(backend.save_update_snapshot())
+        finally:
+            PythonApt.save_snapshot = orig_save_snapshot
+
+    def test6_incremental_refresh(self):
+        app = FakeApplication()
+        backend = PythonAptBackend(app)
+        backend.init_backend(app)
+        backend._cache = FakeCache([FakeUpgradePackage('a'),
+                                    FakeUpgradePackage('b')])
+        old_a = backend.get_available_updates(False).get_packages()[0]['a']
+
+        # Simulate reopening the cache with b gone and c added.
+        backend._previous_plans = backend._update_plans
+        backend._update_plans = None
+        new_a = FakeUpgradePackage('a')
+        backend._cache = FakeCache([new_a, FakeUpgradePackage('c')])
+        store = backend.get_available_updates(False)
+
+        self.assertTrue(store.get_packages()[0]['a'] is old_a)
+        self.assertTrue(old_a._pyapt_package is new_a)
+        diff = store.get_diff()
+        self.assertEquals([pkg.get_package_name()
+                           for pkg in diff.get_added()], ['c'])
+        self.assertEquals([pkg.get_package_name()
+                           for pkg in diff.get_removed()], ['b'])
+        self.assertEquals(diff.get_changed(), [])
+
+    def test7_update_summary(self):
+        app = FakeApplication()
+        backend = PythonAptBackend(app)
+        backend.init_backend(app)
+        removal = FakeUpgradePackage('c', True)
+        removal.marked_upgrade = False
+        removal.marked_delete = True
+        backend._cache = FakeCache([FakeUpgradePackage('a'),
+                                    FakeUpgradePackage('b', True), removal])
+
+        summary = backend.get_update_summary(False)
+        self.assertEquals(summary.get_category_counts(), {0: 1})
+        self.assertEquals(summary.get_removal_count(), 0)
+        summary = backend.get_update_summary(True)
+        self.assertEquals(summary.get_update_count(), 2)
+        self.assertEquals(summary.get_removal_count(), 1)
+        self.assertEquals(summary.get_download_size(), 2048)
+        # No update plans are built for the summary.
+        self.assertTrue(backend._update_plans is None)
+
+    def test8_commit_plan(self):
+        app = FakeApplication()
+        backend = PythonAptBackend(app)
+        backend.init_backend(app)
+        new = FakeUpgradePackage('c', True)
+        new.marked_upgrade = False
+        new.marked_install = True
+        new.is_installed = False
+        new.installed = None
+        new.candidate.size = 100
+        backend._cache = FakeCache([FakeUpgradePackage('a'),
+                                    FakeUpgradePackage('b'), new])
+        packages = backend.get_available_updates(True).get_packages()[0]
+
+        plan = backend.create_commit_plan([packages['a'], packages['c']])
+        self.assertEquals(plan.get_selected_names(), frozenset(['a', 'c']))
+        self.assertEquals(plan.get_change_count(), 2)
+        self.assertEquals(plan.get_download_count(), 1)
+        self.assertEquals(plan.get_download_size(), 100)
+        # Packages of the update plan are reused.
+        self.assertTrue(plan.get_installs()[0] is packages['c'])
+        self.assertEquals(plan.get_removals(), [])
+        self.assertTrue(plan.requires_confirmation())
+        self.assertTrue(backend._commit_plan is plan)
+
+        # A new selection starts from the unmarked update plan again.
+        plan = backend.create_commit_plan([packages['b']])
+        self.assertEquals(plan.get_change_count(), 1)
+        self.assertEquals(plan.get_download_count(), 0)
+        self.assertFalse(plan.requires_confirmation())
+        self.assertEquals(backend._cache.upgrades, [False, True, True])
+
+    def test9_selection_preview(self):
+        app = FakeApplication()
+        backend = PythonAptBackend(app)
+        backend.init_backend(app)
+        packages = [FakeUpgradePackage('a'), FakeUpgradePackage('b'),
+                    FakeUpgradePackage('c', True)]
+        for pkg in packages:
+            pkg.candidate.size = 100
+        backend._cache = FakeCache(packages)
+        depcache = FakePreviewDepCache(packages)
+        backend._create_preview_depcache = lambda: depcache
+        self.assertEquals(backend.update_selection_preview([]), None)
+
+        infos = backend.get_available_updates(False).get_packages()[0]
+        preview = backend.reset_selection_preview([(infos['a'], True),
+                                                   (infos['b'], False)])
+        # c is not part of the safe upgrade.
+        self.assertEquals(preview.get_download_size(), 100)
+        self.assertEquals(preview.get_installed_size_delta(), 10)
+
+        preview = backend.update_selection_preview([(infos['b'], True)])
+        self.assertEquals(preview.get_download_size(), 200)
+        preview = backend.update_selection_preview([(infos['a'], False),
+                                                    (infos['b'], False)])
+        self.assertEquals(preview.get_download_size(), 0)
+
+    def test10_prefetch(self):
+        app = FakeApplication()
+        backend = PythonAptBackend(app)
+        backend.init_backend(app)
+        packages = [FakeUpgradePackage('a'), FakeUpgradePackage('b')]
+        backend._cache = FakeCache(packages)
+        backend._create_preview_depcache = \
+            lambda: FakePreviewDepCache(packages)
+        infos = backend.get_available_updates(False).get_packages()[0]
+        FakePackageManager.fetched = []
+
+        self.assertTrue(backend.prefetch([infos['a']]))
+        thread, helper, names = backend._prefetch
+        # The same selection keeps the running prefetch.
+        self.assertTrue(backend.prefetch([infos['a']]))
+        self.assertTrue(backend._prefetch[1] is helper)
+
+        # A changed selection cancels it and starts over, once the
+        # cancelled prefetch has stopped.
+        self.assertTrue(backend.prefetch([infos['a'], infos['b']]))
+        self.assertTrue(helper._abort)
+        new_thread = backend._prefetch[0]
+        self.assertFalse(new_thread is thread)
+        for i in xrange(500):
+            if FakePackageManager.fetched[-1:] == [['a', 'b']]:
+                break
+            time.sleep(0.01)
+        self.assertFalse(thread.isAlive())
+        self.assertEquals(FakePackageManager.fetched[-1], ['a', 'b'])
+
+        backend.cancel_prefetch()
+        self.assertFalse(new_thread.isAlive())
+        self.assertTrue(backend._prefetch is None)
+
 PythonAptSuite = loader.loadTestsFromTestCase(PythonAptCase)
@@ -0,0 +1,146 @@
+# tests/Backend/SelectionSolver.py
+#
+#  Copyright (c) 2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+
+import unittest
+
+loader = unittest.TestLoader()
+
+from UpdateManager.Backend import PackageInfoBase, PackageInfoStoreBase
+from UpdateManager.Backend import SelectionSolver
+
+class FakePackageInfo(PackageInfoBase):
+    def __init__(self, name, installed=True, category=0):
+        self._name = name
+        self._installed = installed
+        self._category = category
+        self.depends = []
+        self.rdepends = []
+        self.sdepends = []
+        self.rsdepends = []
+        self.conflicts = []
+
+    def depend(self, other, strict=False):
+        if strict:
+            self.sdepends.append(other)
+            other.rsdepends.append(self)
+        else:
+            self.depends.append(other)
+            other.rdepends.append(self)
+
+    def get_package_name(self):
+        return self._name
+
+    def get_update_category(self):
+        return self._category
+
+    def is_installed(self):
+        return self._installed
+
+    def get_download_size(self):
+        return 0
+
+    def get_source_package_name(self):
+        return self._name
+
+    def get_candidate_archive_name(self):
+        return 'stable'
+
+    def get_candidate_origin_name(self):
+        return 'Debian'
+
+    def get_dependencies(self):
+        return self.depends
+
+    def get_reverse_dependencies(self):
+        return self.rdepends
+
+    def get_strict_dependencies(self):
+        return self.sdepends
+
+    def get_strict_reverse_dependencies(self):
+        return self.rsdepends
+
+    def get_conflicts(self):
+        return self.conflicts
+
+def names(pkg_list):
+    return sorted([pkg.get_package_name() for pkg in pkg_list])
+
+class SelectionSolverCase(unittest.TestCase):
+    def setUp(self):
+        # app depends on lib, lib and lib-data depend strictly on each
+        # other, new is not installed yet and conflicts with old.
+        self.pkgs = {}
+        for name, installed, category in (('app', True, 0),
+                                          ('lib', True, 0),
+                                          ('lib-data', True, 0),
+                                          ('new', False, 1),
+                                          ('old', True, 1)):
+            self.pkgs[name] = FakePackageInfo(name, installed, category)
+        self.pkgs['app'].depend(self.pkgs['lib'])
+        self.pkgs['lib'].depend(self.pkgs['lib-data'], strict=True)
+        self.pkgs['lib-data'].depend(self.pkgs['lib'], strict=True)
+        self.pkgs['new'].conflicts.append(self.pkgs['old'])
+
+        store = PackageInfoStoreBase()
+        for pkg in self.pkgs.values():
+            store.add_package(pkg)
+        self.solver = SelectionSolver(store)
+
+    def selected(self):
+        return names([pkg for pkg in self.pkgs.values()
+                      if getattr(pkg, 'active', None)])
+
+    def test0_groups(self):
+        self.assertEquals(names(self.solver.get_group(self.pkgs['lib'])),
+                          ['lib', 'lib-data'])
+        self.assertEquals(names(self.solver.get_group(self.pkgs['app'])),
+                          ['app'])
+
+    def test1_default_selection(self):
+        changed = self.solver.apply_default_selection()
+        self.assertEquals(len(changed), 5)
+        self.assertEquals(self.selected(), ['app', 'lib', 'lib-data', 'old'])
+
+    def test2_select_closure(self):
+        self.solver.deselect_all()
+        changed = self.solver.set_selection([self.pkgs['app']])
+        self.assertEquals(names(changed), ['app', 'lib', 'lib-data'])
+
+    def test3_deselect_closure(self):
+        self.solver.select_all()
+        changed = self.solver.set_selection([self.pkgs['lib-data']], False)
+        self.assertEquals(names(changed), ['app', 'lib', 'lib-data'])
+        self.assertEquals(self.solver.set_selection([self.pkgs['lib']],
+                                                    False), [])
+
+    def test4_conflicts(self):
+        self.solver.apply_default_selection()
+        changed = self.solver.set_selection([self.pkgs['new']])
+        self.assertEquals(names(changed), ['new', 'old'])
+        self.assertEquals(self.selected(), ['app', 'lib', 'lib-data', 'new'])
+
+    def test5_select_category(self):
+        self.solver.deselect_all()
+        changed = self.solver.select_category(0)
+        self.assertEquals(names(changed), ['app', 'lib', 'lib-data'])
+
+SelectionSolverSuite = loader.loadTestsFromTestCase(SelectionSolverCase)
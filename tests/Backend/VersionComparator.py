@@ -0,0 +1,60 @@
+# tests/Backend/VersionComparator.py
+#
+#  Copyright (c) 2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+
+import unittest
+
+loader = unittest.TestLoader()
+
+from UpdateManager.Backend import VersionComparator, DEP_RELATION
+
+class VersionComparatorCase(unittest.TestCase):
+    def test0_satisfies(self):
+        comparator = VersionComparator()
+        self.assertTrue(comparator.satisfies('1.0', DEP_RELATION.EQ, '1.0'))
+        self.assertTrue(comparator.satisfies('1.0', DEP_RELATION.LT, '2.0'))
+        self.assertTrue(comparator.satisfies('2.0', DEP_RELATION.GTE, '1.0'))
+        self.assertFalse(comparator.satisfies('2.0', DEP_RELATION.LTE,
+                                              '1.0'))
+        self.assertFalse(comparator.satisfies('1.0', None, '1.0'))
+        self.assertTrue(comparator.satisfies('1.0', None, None))
+
+    def test1_hits_and_misses(self):
+        comparator = VersionComparator()
+        comparator.compare('1.0', '2.0')
+        comparator.compare('1.0', '2.0')
+        comparator.compare('2.0', '1.0')
+        self.assertEquals(comparator.get_hits(), 1)
+        self.assertEquals(comparator.get_misses(), 2)
+
+    def test2_bounded(self):
+        comparator = VersionComparator(max_size=2)
+        comparator.compare('1.0', '2.0')
+        comparator.compare('1.0', '3.0')
+        # Use the first pair, so the second one is dropped next.
+        comparator.compare('1.0', '2.0')
+        comparator.compare('1.0', '4.0')
+        self.assertEquals(comparator.get_size(), 2)
+        comparator.compare('1.0', '2.0')
+        self.assertEquals(comparator.get_hits(), 2)
+        comparator.compare('1.0', '3.0')
+        self.assertEquals(comparator.get_misses(), 4)
+
+VersionComparatorSuite = loader.loadTestsFromTestCase(VersionComparatorCase)
@@ -21,6 +21,14 @@
 
 import unittest
 
+from tests.Backend.PackageInfoBenchmark import PackageInfoBenchmarkSuite
+from tests.Backend.PackageInfoStore import PackageInfoStoreSuite
 from tests.Backend.PythonApt import PythonAptSuite
+from tests.Backend.SelectionSolver import SelectionSolverSuite
+from tests.Backend.snapshot import SnapshotSuite
+from tests.Backend.VersionComparator import VersionComparatorSuite
 
-BackendSuite = unittest.TestSuite([PythonAptSuite])
+BackendSuite = unittest.TestSuite([PackageInfoBenchmarkSuite,
+                                   PackageInfoStoreSuite, PythonAptSuite,
+                                   SelectionSolverSuite, SnapshotSuite,
+                                   VersionComparatorSuite])
@@ -0,0 +1,120 @@
+# tests/Backend/snapshot.py
+#
+#  Copyright (c) 2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+
+import os
+import shutil
+import tempfile
+import unittest
+
+loader = unittest.TestLoader()
+
+from UpdateManager.Backend import PackageInfoStoreBase, OriginInfo
+from UpdateManager.Backend.snapshot import get_cache_key, save_snapshot
+from UpdateManager.Backend.snapshot import load_snapshot
+
+from tests.Backend.SelectionSolver import FakePackageInfo
+
+class FakeSnapshotPackageInfo(FakePackageInfo):
+    def get_installed_version(self):
+        if self._installed:
+            return '1.0'
+        return None
+
+    def get_candidate_version(self):
+        return '2.0'
+
+    def get_summary(self):
+        return 'Summary of %s' % (self._name)
+
+    def get_description(self):
+        return 'Description of %s' % (self._name)
+
+    def get_candidate_uri(self):
+        return 'http://example.com/%s_2.0_i386.deb' % (self._name)
+
+    def get_candidate_origin(self):
+        return OriginInfo.intern('stable', 'Debian', 'Debian', 'main',
+                                 'ftp.debian.org', True)
+
+    def is_broken(self):
+        return False
+
+    def get_uninstalled_dependencies(self):
+        return []
+
+class SnapshotCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'plans', 'snapshot')
+        key_file = os.path.join(self.tmp_dir, 'status')
+        open(key_file, 'w').close()
+        self.key_paths = (key_file,)
+
+        app = FakeSnapshotPackageInfo('app')
+        lib = FakeSnapshotPackageInfo('lib', installed=False, category=1)
+        app.depend(lib)
+        app.conflicts.append(FakeSnapshotPackageInfo('old'))
+        self.store = PackageInfoStoreBase()
+        self.store.add_package(app)
+        self.store.add_package(lib)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test0_roundtrip(self):
+        key = get_cache_key(self.key_paths)
+        self.assertTrue(save_snapshot({1: self.store}, key, self.path))
+        plans = load_snapshot(key, self.path)
+        store = plans[1]
+
+        self.assertEquals(store.package_count(), 2)
+        self.assertEquals(store.get_install_count(), 1)
+        app = store.get_package('app')
+        self.assertEquals(app.get_candidate_version(), '2.0')
+        self.assertEquals(app.get_installed_version(), '1.0')
+        self.assertEquals(app.get_summary(), 'Summary of app')
+        self.assertEquals(app.get_candidate_archive_name(), 'stable')
+        self.assertEquals(app.get_candidate_architecture(), 'i386')
+        self.assertEquals([pkg.get_package_name()
+                           for pkg in app.get_dependencies()], ['lib'])
+        conflicts = app.get_conflicts()
+        self.assertEquals([pkg.get_package_name()
+                           for pkg in conflicts], ['old'])
+        # Records are only stored for the packages of the plan.
+        self.assertEquals(app.get_description(), 'Summary of app')
+        self.assertEquals(conflicts[0].get_summary(), None)
+        lib = store.get_package('lib')
+        self.assertEquals([pkg.get_package_name()
+                           for pkg in lib.get_reverse_dependencies()],
+                          ['app'])
+        self.assertEquals(lib.get_update_category(), 1)
+
+    def test1_outdated(self):
+        key = get_cache_key(self.key_paths)
+        save_snapshot({1: self.store}, key, self.path)
+        f = open(self.key_paths[0], 'w')
+        f.write('changed')
+        f.close()
+        self.assertEquals(load_snapshot(get_cache_key(self.key_paths),
+                                        self.path), None)
+        self.assertEquals(load_snapshot(key, self.path + '.missing'), None)
+
+SnapshotSuite = loader.loadTestsFromTestCase(SnapshotCase)
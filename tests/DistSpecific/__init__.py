@@ -24,5 +24,10 @@ import unittest
 from tests.DistSpecific.Auto import AutoSuite
 from tests.DistSpecific.Debian import DebianSuite
 from tests.DistSpecific.Ubuntu import UbuntuSuite
+from tests.DistSpecific.changelog import ChangelogSuite
+from tests.DistSpecific.changelogcache import ChangelogCacheSuite
+from tests.DistSpecific.localchangelog import LocalChangelogSuite
 
-DistSuite = unittest.TestSuite([AutoSuite, DebianSuite, UbuntuSuite])
+DistSuite = unittest.TestSuite([AutoSuite, DebianSuite, UbuntuSuite,
+                               ChangelogSuite, ChangelogCacheSuite,
+                               LocalChangelogSuite])
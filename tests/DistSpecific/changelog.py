@@ -0,0 +1,272 @@
+# tests/DistSpecific/changelog.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+
+import threading
+import time
+import unittest
+
+loader = unittest.TestLoader()
+
+from UpdateManager.DistSpecific.changelog import ChangelogFetcher, \
+     ChangelogFetcherException, ChangelogFetchPool, ChangelogHandler, \
+     ChangelogPrefetcher, get_changelog_key
+
+class FakePackageInfo(object):
+    def __init__(self, name, source_name=None, version='1.0'):
+        self._name = name
+        self._source_name = source_name or name
+        self._version = version
+
+    def get_package_name(self):
+        return self._name
+
+    def get_source_package_name(self):
+        return self._source_name
+
+    def get_candidate_version(self):
+        return self._version
+
+class RecordingHandler(ChangelogHandler):
+    def __init__(self, low_priority=False):
+        self.low_priority = low_priority
+        self.finished = []
+        self.failures = []
+        self.done = threading.Event()
+
+    def changelog_finished(self, pkg_info, raw_changelog):
+        self.finished.append((pkg_info, raw_changelog))
+        self.done.set()
+
+    def changelog_failure(self, pkg_info, error_message):
+        self.failures.append((pkg_info, error_message))
+        self.done.set()
+
+class RaisingHandler(ChangelogHandler):
+    def changelog_finished(self, pkg_info, raw_changelog):
+        raise RuntimeError('handler failed')
+
+    def changelog_failure(self, pkg_info, error_message):
+        raise RuntimeError('handler failed')
+
+class BlockingFetcher(ChangelogFetcher):
+    """ Fetcher blocking until released, recording concurrency """
+    release = None
+    state_lock = threading.Lock()
+    fetched = []
+    running = 0
+    max_running = 0
+
+    def _do_fetch(self):
+        cls = BlockingFetcher
+        cls.state_lock.acquire()
+        cls.running += 1
+        cls.max_running = max(cls.max_running, cls.running)
+        cls.fetched.append(get_changelog_key(self._pkg_info))
+        cls.state_lock.release()
+        try:
+            cls.release.wait(5)
+            if self._pkg_info.get_source_package_name() == 'broken':
+                raise ChangelogFetcherException('not found')
+            return 'changes of %s' % self._pkg_info.get_source_package_name()
+        finally:
+            cls.state_lock.acquire()
+            cls.running -= 1
+            cls.state_lock.release()
+
+class ImmediateFetcher(ChangelogFetcher):
+    def _do_fetch(self):
+        return 'changes'
+
+class ChangelogFetchPoolCase(unittest.TestCase):
+    def setUp(self):
+        BlockingFetcher.release = threading.Event()
+        BlockingFetcher.fetched = []
+        BlockingFetcher.running = 0
+        BlockingFetcher.max_running = 0
+
+    def test0_dedupe_fans_out(self):
+        pool = ChangelogFetchPool(2)
+        handler_a = RecordingHandler()
+        handler_b = RecordingHandler()
+        pkg_a = FakePackageInfo('libfoo1', 'foo')
+        pkg_b = FakePackageInfo('foo-bin', 'foo')
+        BlockingFetcher(pkg_a, handler_a, pool=pool)
+        BlockingFetcher(pkg_b, handler_b, pool=pool)
+        self.assertTrue(pool.is_in_flight(('foo', '1.0')))
+        BlockingFetcher.release.set()
+        handler_a.done.wait(5)
+        handler_b.done.wait(5)
+        self.assertEqual([('foo', '1.0')], BlockingFetcher.fetched)
+        self.assertEqual([(pkg_a, 'changes of foo')], handler_a.finished)
+        self.assertEqual([(pkg_b, 'changes of foo')], handler_b.finished)
+        self.assertFalse(pool.is_in_flight(('foo', '1.0')))
+
+    def test1_different_versions_not_merged(self):
+        pool = ChangelogFetchPool(2)
+        BlockingFetcher(FakePackageInfo('foo', version='1.0'),
+                        RecordingHandler(), pool=pool)
+        BlockingFetcher(FakePackageInfo('foo', version='2.0'),
+                        RecordingHandler(), pool=pool)
+        handler = RecordingHandler()
+        ImmediateFetcher(FakePackageInfo('foo', version='2.0'), handler,
+                         pool=pool)
+        BlockingFetcher.release.set()
+        handler.done.wait(5)
+        fetched = BlockingFetcher.fetched[:]
+        fetched.sort()
+        self.assertEqual([('foo', '1.0'), ('foo', '2.0')], fetched)
+        self.assertEqual('changes of foo', handler.finished[0][1])
+
+    def test2_bounded_concurrency(self):
+        pool = ChangelogFetchPool(2)
+        handlers = []
+        for i in range(6):
+            handler = RecordingHandler()
+            handlers.append(handler)
+            BlockingFetcher(FakePackageInfo('pkg%d' % (i)), handler,
+                            pool=pool)
+        self.assertEqual(0, pool.get_idle_capacity())
+        BlockingFetcher.release.set()
+        for handler in handlers:
+            handler.done.wait(5)
+            self.assertEqual(1, len(handler.finished))
+        self.assertEqual(6, len(BlockingFetcher.fetched))
+        self.assertTrue(BlockingFetcher.max_running <= 2)
+
+    def test3_failure_fans_out(self):
+        pool = ChangelogFetchPool(1)
+        handler_a = RecordingHandler()
+        handler_b = RecordingHandler()
+        pkg = FakePackageInfo('broken')
+        BlockingFetcher(pkg, handler_a, pool=pool)
+        BlockingFetcher(pkg, handler_b, pool=pool)
+        BlockingFetcher(pkg, handler_b, pool=pool)
+        BlockingFetcher.release.set()
+        handler_a.done.wait(5)
+        handler_b.done.wait(5)
+        self.assertEqual([(pkg, 'not found')], handler_a.failures)
+        self.assertEqual([(pkg, 'not found')], handler_b.failures)
+        self.assertEqual(1, len(BlockingFetcher.fetched))
+
+    def test4_low_priority_fetched_last(self):
+        pool = ChangelogFetchPool(1)
+        handlers = [RecordingHandler(), RecordingHandler(True),
+                    RecordingHandler(), RecordingHandler()]
+        BlockingFetcher(FakePackageInfo('a'), handlers[0], pool=pool)
+        BlockingFetcher(FakePackageInfo('low'), handlers[1], pool=pool)
+        BlockingFetcher(FakePackageInfo('b'), handlers[2], pool=pool)
+        # A user request for a queued speculative fetch promotes it.
+        BlockingFetcher(FakePackageInfo('c'), handlers[1], pool=pool)
+        BlockingFetcher(FakePackageInfo('c'), handlers[3], pool=pool)
+        BlockingFetcher.release.set()
+        for handler in handlers:
+            handler.done.wait(5)
+        self.assertEqual(['a', 'b', 'c', 'low'],
+                         [key[0] for key in BlockingFetcher.fetched])
+
+    def test5_withdraw(self):
+        pool = ChangelogFetchPool(1)
+        handler = RecordingHandler()
+        low_handler = RecordingHandler(True)
+        BlockingFetcher(FakePackageInfo('a'), handler, pool=pool)
+        BlockingFetcher(FakePackageInfo('low'), low_handler, pool=pool)
+        pool.withdraw(low_handler)
+        self.assertFalse(pool.is_in_flight(('low', '1.0')))
+        BlockingFetcher.release.set()
+        handler.done.wait(5)
+        self.assertEqual([('a', '1.0')], BlockingFetcher.fetched)
+
+    def test6_raising_handler(self):
+        pool = ChangelogFetchPool(1)
+        raising_handler = RaisingHandler()
+        handler = RecordingHandler()
+        pkg = FakePackageInfo('a')
+        BlockingFetcher(pkg, raising_handler, pool=pool)
+        BlockingFetcher(pkg, handler, pool=pool)
+        BlockingFetcher.release.set()
+        handler.done.wait(5)
+        self.assertEqual([(pkg, 'changes of a')], handler.finished)
+        # The worker survived and still serves requests.
+        handler = RecordingHandler()
+        BlockingFetcher(FakePackageInfo('b'), handler, pool=pool)
+        handler.done.wait(5)
+        self.assertEqual(1, len(handler.finished))
+        self.assertEqual(1, pool.get_idle_capacity())
+
+class ChangelogPrefetcherCase(unittest.TestCase):
+    def setUp(self):
+        BlockingFetcher.release = threading.Event()
+        BlockingFetcher.fetched = []
+        BlockingFetcher.running = 0
+        BlockingFetcher.max_running = 0
+        self.pool = ChangelogFetchPool(3)
+        self.handler = RecordingHandler()
+
+    def get_changelog(self, pkg_info, changelog_handler):
+        BlockingFetcher(pkg_info, changelog_handler, pool=self.pool)
+
+    def wait_for(self, condition):
+        for i in xrange(500):
+            if condition():
+                return
+            time.sleep(0.01)
+        self.fail('Timeout')
+
+    def test0_throttled_by_idle_capacity(self):
+        prefetcher = ChangelogPrefetcher(self.get_changelog, self.handler,
+                                         pool=self.pool)
+        pkg_infos = []
+        for i in range(5):
+            pkg_infos.append(FakePackageInfo('pkg%d' % (i)))
+        prefetcher.prefetch(pkg_infos + pkg_infos[:2])
+        self.assertTrue(self.pool.is_in_flight(('pkg1', '1.0')))
+        self.assertFalse(self.pool.is_in_flight(('pkg2', '1.0')))
+        self.assertEqual(1, self.pool.get_idle_capacity())
+
+        BlockingFetcher.release.set()
+        self.wait_for(lambda: len(self.handler.finished) == 5)
+        fetched = BlockingFetcher.fetched[:]
+        fetched.sort()
+        self.assertEqual([('pkg0', '1.0'), ('pkg1', '1.0'), ('pkg2', '1.0'),
+                          ('pkg3', '1.0'), ('pkg4', '1.0')], fetched)
+        self.assertTrue(BlockingFetcher.max_running <= 2)
+
+    def test1_cancel(self):
+        prefetcher = ChangelogPrefetcher(self.get_changelog, self.handler,
+                                         pool=self.pool)
+        prefetcher.prefetch([FakePackageInfo('a'), FakePackageInfo('b'),
+                             FakePackageInfo('c')])
+        prefetcher.cancel()
+        BlockingFetcher.release.set()
+        self.wait_for(lambda: self.pool.get_idle_capacity() == 3)
+        self.assertEqual([], self.handler.finished)
+        self.assertFalse(self.pool.is_in_flight(('c', '1.0')))
+
+        prefetcher.prefetch([FakePackageInfo('c')])
+        self.wait_for(lambda: len(self.handler.finished) == 1)
+        self.assertEqual('c', self.handler.finished[0][0].get_package_name())
+
+ChangelogSuite = unittest.TestSuite([
+    loader.loadTestsFromTestCase(ChangelogFetchPoolCase),
+    loader.loadTestsFromTestCase(ChangelogPrefetcherCase),
+    ])
@@ -0,0 +1,234 @@
+# tests/DistSpecific/changelogcache.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+
+import os
+import shutil
+import StringIO
+import tempfile
+import time
+import unittest
+import urllib2
+
+loader = unittest.TestLoader()
+
+from UpdateManager.DistSpecific import DistBase
+from UpdateManager.DistSpecific import changelog
+from UpdateManager.DistSpecific.changelog import HTTPChangelogFetcher, \
+     ChangelogFetcher
+from UpdateManager.DistSpecific.changelogcache import ChangelogCache
+
+from tests.DistSpecific.changelog import FakePackageInfo, RecordingHandler
+
+class FakeResponse(StringIO.StringIO):
+    def __init__(self, text, headers):
+        StringIO.StringIO.__init__(self, text)
+        self._headers = headers
+
+    def info(self):
+        return self
+
+    def getheader(self, name):
+        return self._headers.get(name)
+
+class FakeURLOpener(object):
+    """ urlopen replacement answering with queued responses """
+    def __init__(self):
+        self.requests = []
+        self.responses = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+class FakeHTTPFetcher(HTTPChangelogFetcher):
+    local_source = None
+
+    def _get_changelog_url(self, pkg_info):
+        return 'http://changelogs.example.org/%s' % (
+            pkg_info.get_source_package_name())
+
+class InlinePool(object):
+    """ Pool running fetches in the submitting thread """
+    def submit(self, key, fetcher, pkg_info, handler):
+        try:
+            handler.changelog_finished(pkg_info, fetcher._do_fetch())
+        except changelog.ChangelogFetcherException, exc:
+            handler.changelog_failure(pkg_info, str(exc))
+        return True
+
+class ChangelogCacheCase(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test0_store_and_get(self):
+        cache = ChangelogCache(self.path)
+        self.assertEqual(None, cache.get(('foo', '1.0')))
+        cache.store(('foo', '1.0'), 'changes', '"abc"')
+        self.assertEqual('changes', cache.get(('foo', '1.0')))
+        self.assertEqual(None, cache.get(('foo', '2.0')))
+
+        cache = ChangelogCache(self.path)
+        entry = cache.lookup(('foo', '1.0'))
+        self.assertEqual('changes', entry.text)
+        self.assertEqual({'If-None-Match': '"abc"'}, entry.get_validators())
+
+    def test1_lru_eviction(self):
+        cache = ChangelogCache(self.path, max_size=25)
+        cache.store(('a', '1'), 'x' * 10)
+        cache.store(('b', '1'), 'x' * 10)
+        # Using a makes b the least recently used entry.
+        time.sleep(0.01)
+        self.assertNotEqual(None, cache.get(('a', '1')))
+        cache.store(('c', '1'), 'x' * 10)
+        self.assertNotEqual(None, cache.get(('a', '1')))
+        self.assertEqual(None, cache.get(('b', '1')))
+        self.assertNotEqual(None, cache.get(('c', '1')))
+        self.assertEqual(3, len(os.listdir(self.path)))
+
+    def test2_stale_entries(self):
+        cache = ChangelogCache(self.path, max_age=0)
+        cache.store(('foo', '1.0'), 'changes')
+        self.assertEqual(None, cache.get(('foo', '1.0')))
+        self.assertEqual('changes', cache.lookup(('foo', '1.0')).text)
+
+    def test3_broken_index(self):
+        index_file = open(os.path.join(self.path, 'index'), 'wb')
+        index_file.write('garbage')
+        index_file.close()
+        cache = ChangelogCache(self.path)
+        self.assertEqual(None, cache.get(('foo', '1.0')))
+        cache.store(('foo', '1.0'), 'changes')
+        self.assertEqual('changes', ChangelogCache(self.path).get(
+            ('foo', '1.0')))
+
+    def test4_lookup_defers_index_write(self):
+        index_path = os.path.join(self.path, 'index')
+        cache = ChangelogCache(self.path, max_size=25)
+        cache.store(('a', '1'), 'x' * 10)
+        cache.store(('b', '1'), 'x' * 10)
+        index = open(index_path, 'rb').read()
+        time.sleep(0.01)
+        self.assertNotEqual(None, cache.get(('a', '1')))
+        self.assertEqual(index, open(index_path, 'rb').read())
+
+        # The access time is written by flush and used by later sessions.
+        cache.flush()
+        self.assertNotEqual(index, open(index_path, 'rb').read())
+        cache = ChangelogCache(self.path, max_size=25)
+        cache.store(('c', '1'), 'x' * 10)
+        self.assertNotEqual(None, cache.get(('a', '1')))
+        self.assertEqual(None, cache.get(('b', '1')))
+
+class HTTPRevalidationCase(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.opener = FakeURLOpener()
+        self.orig_urlopen = changelog.urllib2.urlopen
+        changelog.urllib2.urlopen = self.opener
+
+    def tearDown(self):
+        changelog.urllib2.urlopen = self.orig_urlopen
+        shutil.rmtree(self.path)
+
+    def fetch(self, cache, pkg_info):
+        handler = RecordingHandler()
+        FakeHTTPFetcher(pkg_info, handler, pool=InlinePool(), cache=cache)
+        return handler
+
+    def test0_store_and_revalidate(self):
+        cache = ChangelogCache(self.path, max_age=0)
+        pkg_info = FakePackageInfo('foo')
+        self.opener.responses.append(FakeResponse(
+            'foo (1.0) unstable\n -- A <a@example.org>\nolder\n',
+            {'ETag': '"v1"', 'Last-Modified': 'Sat, 01 Aug 2009'}))
+        handler = self.fetch(cache, pkg_info)
+        text = 'foo (1.0) unstable\n -- A <a@example.org>\n'
+        self.assertEqual([(pkg_info, text)], handler.finished)
+
+        self.opener.responses.append(urllib2.HTTPError(
+            'http://changelogs.example.org/foo', 304, 'Not Modified', {},
+            None))
+        handler = self.fetch(cache, pkg_info)
+        self.assertEqual([(pkg_info, text)], handler.finished)
+        request = self.opener.requests[-1]
+        self.assertEqual('"v1"', request.get_header('If-none-match'))
+        self.assertEqual('Sat, 01 Aug 2009',
+                         request.get_header('If-modified-since'))
+
+    def test1_offline_fallback(self):
+        cache = ChangelogCache(self.path, max_age=0)
+        pkg_info = FakePackageInfo('foo')
+        cache.store(('foo', '1.0'), 'cached')
+        self.opener.responses.append(urllib2.URLError('offline'))
+        handler = self.fetch(cache, pkg_info)
+        self.assertEqual([(pkg_info, 'cached')], handler.finished)
+
+        self.opener.responses.append(urllib2.URLError('offline'))
+        handler = self.fetch(cache, FakePackageInfo('bar'))
+        self.assertEqual(1, len(handler.failures))
+
+    def test2_cache_hit_does_not_fetch(self):
+        cache = ChangelogCache(self.path)
+        cache.store(('foo', '1.0'), 'cached')
+        fetchers = []
+        class RecordingFetcher(ChangelogFetcher):
+            def __init__(self, *args, **kwargs):
+                fetchers.append(args)
+        dist = DistBase(name='test', changelog_fetcher=RecordingFetcher,
+                        changelog_cache=cache)
+        pkg_info = FakePackageInfo('foo')
+        handler = RecordingHandler()
+        dist.get_changelog(pkg_info, handler)
+        self.assertEqual([(pkg_info, 'cached')], handler.finished)
+        self.assertEqual([], self.opener.requests)
+        self.assertEqual([], fetchers)
+
+        dist.get_changelog(FakePackageInfo('bar'), handler)
+        self.assertEqual(1, len(fetchers))
+
+    def test3_server_error_fallback(self):
+        cache = ChangelogCache(self.path, max_age=0)
+        pkg_info = FakePackageInfo('foo')
+        cache.store(('foo', '1.0'), 'cached')
+        self.opener.responses.append(urllib2.HTTPError(
+            'http://changelogs.example.org/foo', 503, 'Service Unavailable',
+            {}, None))
+        handler = self.fetch(cache, pkg_info)
+        self.assertEqual([(pkg_info, 'cached')], handler.finished)
+
+        self.opener.responses.append(urllib2.HTTPError(
+            'http://changelogs.example.org/bar', 503, 'Service Unavailable',
+            {}, None))
+        handler = self.fetch(cache, FakePackageInfo('bar'))
+        self.assertEqual(1, len(handler.failures))
+
+ChangelogCacheSuite = unittest.TestSuite([
+    loader.loadTestsFromTestCase(ChangelogCacheCase),
+    loader.loadTestsFromTestCase(HTTPRevalidationCase),
+    ])
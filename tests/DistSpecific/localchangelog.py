@@ -0,0 +1,200 @@
+# tests/DistSpecific/localchangelog.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+
+import gzip
+import os
+import shutil
+import StringIO
+import subprocess
+import tarfile
+import tempfile
+import time
+import unittest
+
+loader = unittest.TestLoader()
+
+from UpdateManager.DistSpecific.changelog import HTTPChangelogFetcher
+from UpdateManager.DistSpecific.localchangelog import LocalChangelogSource, \
+     get_archive_names, read_archive_changelog, read_installed_changelog
+
+from tests.DistSpecific.changelog import RecordingHandler
+from tests.DistSpecific.changelogcache import InlinePool
+
+CHANGELOG = '''foo (1:2.0-1) unstable; urgency=low
+
+  * New upstream release.
+
+ -- Jane Doe <jane@example.org>  Sat, 01 Aug 2009 12:00:00 +0200
+
+foo (1:1.0-1) unstable; urgency=low
+
+  * Initial release.
+
+ -- Jane Doe <jane@example.org>  Fri, 01 May 2009 12:00:00 +0200
+'''
+
+ENTRY = CHANGELOG[:CHANGELOG.find('\n\nfoo (1:1.0-1)') + 1]
+
+class FakePackageInfo(object):
+    def __init__(self, name='foo', version='1:2.0-1', architecture='i386'):
+        self._name = name
+        self._version = version
+        self._architecture = architecture
+
+    def get_package_name(self):
+        return self._name
+
+    def get_source_package_name(self):
+        return self._name
+
+    def get_candidate_version(self):
+        return self._version
+
+    def get_candidate_uri(self):
+        raise AssertionError('package records must not be read')
+
+    def get_candidate_architecture(self):
+        return self._architecture
+
+def gzip_data(data):
+    output = StringIO.StringIO()
+    gzip_file = gzip.GzipFile(fileobj=output, mode='wb')
+    gzip_file.write(data)
+    gzip_file.close()
+    return output.getvalue()
+
+def make_tar(files, mode):
+    output = StringIO.StringIO()
+    tar = tarfile.open(fileobj=output, mode=mode)
+    for name, data in files:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = time.time()
+        tar.addfile(info, StringIO.StringIO(data))
+    tar.close()
+    return output.getvalue()
+
+def write_deb(path, data_name, data):
+    members = [('debian-binary', '2.0\n'),
+               ('control.tar.gz', make_tar([('./control', 'Package: foo\n')],
+                                           'w:gz')),
+               (data_name, data)]
+    deb_file = open(path, 'wb')
+    deb_file.write('!<arch>\n')
+    for name, content in members:
+        deb_file.write('%-16s%-12d%-6d%-6d%-8s%-10d`\n' % (
+            name, 0, 0, 0, '100644', len(content)))
+        deb_file.write(content)
+        if len(content) % 2:
+            deb_file.write('\n')
+    deb_file.close()
+
+def get_data_files(name='foo'):
+    return [('./usr/share/doc/%s/copyright' % (name), 'Copyright\n' * 100),
+            ('./usr/share/doc/%s/changelog.Debian.gz' % (name),
+             gzip_data(CHANGELOG)),
+            ('./usr/bin/foo', '\0' * 10000)]
+
+class LocalChangelogCase(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.archive_dir = os.path.join(self.path, 'archives')
+        self.doc_dir = os.path.join(self.path, 'doc')
+        os.makedirs(self.archive_dir)
+        os.makedirs(os.path.join(self.doc_dir, 'foo'))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test0_archive_names(self):
+        self.assertEqual(['foo_1%3a2.0-1_i386.deb'],
+                         get_archive_names(FakePackageInfo()))
+        self.assertEqual(['foo_2.0-1_all.deb'],
+                         get_archive_names(FakePackageInfo(version='2.0-1',
+                                                           architecture='all')))
+        self.assertEqual([], get_archive_names(FakePackageInfo(
+            architecture=None)))
+
+    def test1_read_archive(self):
+        for extension, mode in (('.gz', 'w:gz'), ('.bz2', 'w:bz2'),
+                                ('', 'w')):
+            path = os.path.join(self.archive_dir, 'foo%s.deb' % (extension))
+            write_deb(path, 'data.tar' + extension,
+                      make_tar(get_data_files(), mode))
+            self.assertEqual(ENTRY, read_archive_changelog(path, 'foo'))
+            self.assertEqual(None, read_archive_changelog(path, 'bar'))
+
+    def test2_read_archive_with_command(self):
+        try:
+            subprocess.call(['xz', '--version'], stdout=open(os.devnull, 'w'))
+        except OSError:
+            return
+        tar_data = make_tar(get_data_files(), 'w')
+        process = subprocess.Popen(['xz', '--compress', '--stdout'],
+                                   stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE)
+        data = process.communicate(tar_data)[0]
+        path = os.path.join(self.archive_dir, 'foo.deb')
+        write_deb(path, 'data.tar.xz', data)
+        self.assertEqual(ENTRY, read_archive_changelog(path, 'foo'))
+
+    def test3_broken_archives(self):
+        path = os.path.join(self.archive_dir, 'foo.deb')
+        deb_file = open(path, 'wb')
+        deb_file.write('!<arch>\ndebian-binary   garbage')
+        deb_file.close()
+        self.assertEqual(None, read_archive_changelog(path, 'foo'))
+        self.assertEqual(None, read_archive_changelog(path + '.missing',
+                                                      'foo'))
+
+    def test4_installed_changelog(self):
+        changelog_file = open(os.path.join(self.doc_dir, 'foo',
+                                           'changelog.Debian.gz'), 'wb')
+        changelog_file.write(gzip_data(CHANGELOG))
+        changelog_file.close()
+        self.assertEqual(ENTRY, read_installed_changelog('foo', '1:2.0-1',
+                                                         self.doc_dir))
+        self.assertEqual(ENTRY, read_installed_changelog('foo', '1:2.0-1+b1',
+                                                         self.doc_dir))
+        self.assertEqual(None, read_installed_changelog('foo', '1:2.0-2',
+                                                        self.doc_dir))
+        self.assertEqual(None, read_installed_changelog('bar', '1:2.0-1',
+                                                        self.doc_dir))
+
+    def test5_fetcher_uses_local_source(self):
+        write_deb(os.path.join(self.archive_dir, 'foo_1%3a2.0-1_i386.deb'),
+                  'data.tar.gz', make_tar(get_data_files(), 'w:gz'))
+        urls = []
+        class LocalFetcher(HTTPChangelogFetcher):
+            local_source = LocalChangelogSource(self.archive_dir,
+                                                self.doc_dir)
+            def _get_changelog_url(self, pkg_info):
+                urls.append(pkg_info)
+                raise AssertionError('Network access')
+        handler = RecordingHandler()
+        pkg_info = FakePackageInfo()
+        LocalFetcher(pkg_info, handler, pool=InlinePool())
+        self.assertEqual([(pkg_info, ENTRY)], handler.finished)
+        self.assertEqual([], urls)
+
+LocalChangelogSuite = loader.loadTestsFromTestCase(LocalChangelogCase)
@@ -26,6 +26,7 @@ loader = unittest.TestLoader()
 from tests._helpers import InterfaceValidator, ValidationFailed
 
 from UpdateManager.Frontend.Gtk.GtkProgress import BackendProgressHandlerObject
+from UpdateManager.Frontend.Gtk.GtkProgress import GtkListProgress
 from UpdateManager.Backend import CommitProgressHandler, ListProgressHandler
 
 class CommitProgressHandlerCase(unittest.TestCase):
@@ -51,5 +52,33 @@ class ListProgressHandlerCase(unittest.TestCase):
 ListProgressHandlerSuite = loader.loadTestsFromTestCase(
     ListProgressHandlerCase)
 
+class ListItemMatchingCase(unittest.TestCase):
+    def test0_is_remote_uri(self):
+        self.failUnless(GtkListProgress._is_remote_uri(
+            'http://archive.ubuntu.com/ubuntu/dists/karmic/Release'))
+        self.failIf(GtkListProgress._is_remote_uri(
+            'bzip2:/var/lib/apt/lists/partial/archive.ubuntu.com_ubuntu_'
+            'dists_karmic_main_binary-i386_Packages'))
+        # Cached results are returned for repeated lookups.
+        self.failIf(GtkListProgress._is_remote_uri('gzip:/tmp/Packages'))
+        self.failIf(GtkListProgress._is_remote_uri('gzip:/tmp/Packages'))
+        # The cache is keyed by scheme, not by URI.
+        for index in xrange(100):
+            self.failUnless(GtkListProgress._is_remote_uri(
+                'http://archive.ubuntu.com/%d' % (index)))
+        self.failUnless(len(GtkListProgress._remote_uri_cache) <= 3)
+
+    def test1_list_key(self):
+        remote = 'archive.ubuntu.com/ubuntu/dists/karmic/main/' \
+                 'binary-i386/Packages'
+        local = 'archive.ubuntu.com_ubuntu_dists_karmic_main_' \
+                'binary-i386_Packages'
+        for suffix in ('', '.bz2', '.gz', '.xz'):
+            self.assertEquals(GtkListProgress._get_list_key(remote + suffix),
+                              GtkListProgress._get_list_key(local))
+
+ListItemMatchingSuite = loader.loadTestsFromTestCase(ListItemMatchingCase)
+
 GtkProgressSuite = unittest.TestSuite([CommitProgressHandlerSuite,
-                                      ListProgressHandlerSuite])
+                                      ListProgressHandlerSuite,
+                                      ListItemMatchingSuite])
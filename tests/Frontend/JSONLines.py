@@ -0,0 +1,205 @@
+# tests/Frontend/JSONLines.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+import unittest
+
+loader = unittest.TestLoader()
+
+import json
+import os
+import threading
+from StringIO import StringIO
+
+from tests._helpers import InterfaceValidator, ValidationFailed
+
+from UpdateManager.Backend import BackendBase
+from UpdateManager.Frontend import FrontendBase
+from UpdateManager.Frontend.JSONLines import JSONLinesFrontend
+from UpdateManager.Frontend.JSONLines import JSONLinesWriter
+
+def read_events(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+class FakePackageInfo(object):
+    def __init__(self, name):
+        self._name = name
+
+    def get_package_name(self):
+        return self._name
+
+    def get_installed_version(self):
+        return '1.0'
+
+    def get_candidate_version(self):
+        return '2.0'
+
+    def get_update_category(self):
+        return 0
+
+    def get_download_size(self):
+        return 100
+
+class FakeStore(object):
+    def __init__(self, names):
+        self._packages = [FakePackageInfo(name) for name in names]
+
+    def get_package_list(self):
+        return self._packages
+
+    def get_package(self, name):
+        for pkg_info in self._packages:
+            if pkg_info.get_package_name() == name:
+                return pkg_info
+        return None
+
+    def get_removals(self):
+        return []
+
+    def get_download_size(self):
+        return 100 * len(self._packages)
+
+class FakeApplication(object):
+    def __init__(self, frontend):
+        self._handler = frontend.get_commit_handler()
+        self.committed = None
+
+    def get_available_updates(self, dist_upgrade=True):
+        return FakeStore(['a', 'b'])
+
+    def save_update_snapshot(self):
+        return False
+
+    def first_window_shown(self):
+        pass
+
+    def reload_cache(self):
+        self._handler.cache_begin()
+        self._handler.cache_finished()
+        return True
+
+    def prefetch(self, selected, progress_handler):
+        progress_handler.download_begin(100 * len(selected), len(selected),
+                                        len(selected))
+        progress_handler.download_finished()
+        return True
+
+    def create_commit_plan(self, selected):
+        return BackendBase().create_commit_plan(selected)
+
+    def commit(self, plan):
+        self.committed = sorted(plan.get_selected_names())
+        self._handler.install_begin()
+        self._handler.install_finished()
+        return True
+
+class JSONLinesCase(unittest.TestCase):
+    def test0_implements_interface(self):
+        try:
+            InterfaceValidator(FrontendBase, JSONLinesFrontend).validate()
+        except ValidationFailed, v_failed:
+            self.fail(v_failed.message)
+
+    def test1_coalescing(self):
+        stream = StringIO()
+        writer = JSONLinesWriter(stream, flush_interval=60)
+        writer.write('list_begin', flush=True)
+        for downloaded in xrange(100):
+            for uri in ('http://a', 'http://b'):
+                writer.write('list_item_update', key=('update', uri),
+                             uri=uri, downloaded=downloaded)
+        self.assertEquals(len(read_events(stream)), 1)
+
+        writer.flush()
+        events = read_events(stream)
+        self.assertEquals([event['event'] for event in events],
+                          ['list_begin', 'list_item_update',
+                           'list_item_update'])
+        self.assertEquals(events[1]['uri'], 'http://a')
+        self.assertEquals(events[2]['downloaded'], 99)
+
+    def test2_flush_interval(self):
+        stream = StringIO()
+        writer = JSONLinesWriter(stream, flush_interval=0)
+        writer.write('list_item_finished', uri='http://a')
+        self.assertEquals(len(read_events(stream)), 1)
+
+    def test3_commands(self):
+        read_fd, write_fd = os.pipe()
+        commands = os.fdopen(write_fd, 'w')
+        commands.write('{"command": "updates"}\n'
+                       'invalid\n'
+                       '{"command": "plan"}\n'
+                       '{"command": "prefetch", "packages": ["a"]}\n'
+                       '{"command": "commit", "packages": ["b"]}\n')
+        commands.close()
+
+        stream = StringIO()
+        frontend = JSONLinesFrontend()
+        frontend._open_output = lambda: stream
+        frontend._input = os.fdopen(read_fd)
+        frontend.init_frontend()
+        app = FakeApplication(frontend)
+        # Application.main reloads the cache before invoking main.
+        app.reload_cache()
+        self.assertEquals(frontend.main(app), 0)
+
+        names = [event['event'] for event in read_events(stream)]
+        self.assertEquals(names, ['cache_begin', 'cache_finished',
+                                  'updates', 'updates', 'error',
+                                  'commit_plan', 'prefetch_begin',
+                                  'prefetch_finished', 'install_begin', 'install_finished',
+                                  'cache_begin', 'cache_finished',
+                                  'updates'])
+        self.assertEquals(app.committed, ['b'])
+        updates = read_events(stream)[2]
+        self.assertEquals([pkg['name'] for pkg in updates['packages']],
+                          ['a', 'b'])
+        plan = read_events(stream)[5]
+        self.assertEquals(plan['download_size'], 200)
+        self.assertEquals(plan['change_count'], 2)
+
+    def test4_pipelined_commands(self):
+        read_fd, write_fd = os.pipe()
+        stream = StringIO()
+        frontend = JSONLinesFrontend()
+        frontend._open_output = lambda: stream
+        frontend._input = os.fdopen(read_fd)
+        frontend.init_frontend()
+        app = FakeApplication(frontend)
+        app.reload_cache()
+
+        # All commands arrive in a single write and stdin stays open.
+        os.write(write_fd, '{"command": "updates"}\n'
+                 '{"command": "plan"}\n'
+                 '{"command": "quit"}\n')
+        thread = threading.Thread(target=frontend.main, args=(app,))
+        thread.setDaemon(True)
+        thread.start()
+        thread.join(5)
+        os.close(write_fd)
+        self.failIf(thread.isAlive())
+
+        names = [event['event'] for event in read_events(stream)]
+        self.assertEquals(names, ['cache_begin', 'cache_finished',
+                                  'updates', 'updates', 'commit_plan'])
+
+JSONLinesSuite = loader.loadTestsFromTestCase(JSONLinesCase)
@@ -22,5 +22,6 @@
 import unittest
 
 from tests.Frontend.Gtk import GtkSuite
+from tests.Frontend.JSONLines import JSONLinesSuite
 
-FrontendSuite = unittest.TestSuite([GtkSuite])
+FrontendSuite = unittest.TestSuite([GtkSuite, JSONLinesSuite])
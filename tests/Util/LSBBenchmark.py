@@ -0,0 +1,69 @@
+# tests/Util/LSBBenchmark.py
+#
+#  Copyright (c) 2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+
+""" Distribution detection benchmark.
+
+Run this module directly to print the results for 20 rounds.
+"""
+
+import time
+import unittest
+
+loader = unittest.TestLoader()
+
+from UpdateManager.Util import lsb
+
+BENCHMARK_ROUNDS = 20
+
+def detect_subprocess():
+    """ Detects the distribution by invoking lsb_release. """
+    return (lsb._invoke_lsb_release('-si'), lsb._invoke_lsb_release('-sr'),
+            lsb._invoke_lsb_release('-sc'))
+
+def detect_in_process():
+    """ Detects the distribution by reading the release files. """
+    lsb.clear_cache()
+    return (lsb.get_distribution_name(), lsb.get_distribution_release(),
+            lsb.get_distribution_codename())
+
+def run_benchmark(func, rounds=BENCHMARK_ROUNDS):
+    """ Runs func rounds times and returns the average time in seconds. """
+    start = time.time()
+    for i in xrange(rounds):
+        func()
+    return (time.time() - start) / rounds
+
+class LSBBenchmarkCase(unittest.TestCase):
+    def test0_same_result(self):
+        self.assertEqual(detect_in_process(), detect_subprocess())
+
+    def test1_faster_than_subprocess(self):
+        subprocess_time = run_benchmark(detect_subprocess, 3)
+        in_process_time = run_benchmark(detect_in_process, 3)
+        self.assertTrue(in_process_time < subprocess_time)
+
+LSBBenchmarkSuite = loader.loadTestsFromTestCase(LSBBenchmarkCase)
+
+if __name__ == '__main__':
+    for func in (detect_subprocess, detect_in_process):
+        duration = run_benchmark(func)
+        print '%-20s %8.3f ms per detection' % (func.__name__,
+                                                duration * 1000)
@@ -22,9 +22,15 @@
 import unittest
 
 from tests.Util.enum import EnumSuite, NegativeEnumSuite
+from tests.Util.eventbus import ProgressEventBusSuite
 from tests.Util.humanize import HumanizeSuite
 from tests.Util.lsb import LSBSuite
+from tests.Util.LSBBenchmark import LSBBenchmarkSuite
+from tests.Util.loader import LoaderSuite
 from tests.Util.log import LogSuite
+from tests.Util.startup import StartupSuite
 
 UtilSuite = unittest.TestSuite([EnumSuite, NegativeEnumSuite, LSBSuite, 
-                                LogSuite, HumanizeSuite])
+                                LogSuite, HumanizeSuite, StartupSuite,
+                                LoaderSuite, LSBBenchmarkSuite,
+                                ProgressEventBusSuite])
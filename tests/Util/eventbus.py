@@ -0,0 +1,105 @@
+# tests/Util/eventbus.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+
+import unittest
+
+loader = unittest.TestLoader()
+
+from UpdateManager.Util.eventbus import ProgressEventBus
+
+class Recorder(object):
+    """ Collects delivered batches and scheduled dispatches. """
+    def __init__(self):
+        self.batches = []
+        self.scheduled = []
+
+    def deliver(self, batch):
+        self.batches.append([(name, args) for name, args, t in batch])
+
+    def schedule(self, delay, func):
+        self.scheduled.append((delay, func))
+
+class ProgressEventBusCase(unittest.TestCase):
+    def test0_coalescing(self):
+        recorder = Recorder()
+        bus = ProgressEventBus(recorder.deliver, frame_rate=0.01)
+        bus.post('list_begin')
+        for downloaded in xrange(100):
+            for uri in ('http://a', 'http://b'):
+                bus.post('list_item_update', uri, 100, downloaded)
+            bus.post('list_update', 1000, 10, downloaded)
+        # The first event is delivered immediately, the others are held
+        # back for a frame.
+        self.assertEquals(recorder.batches, [[('list_begin', ())]])
+        bus.dispatch()
+        self.assertEquals(recorder.batches[1],
+                          [('list_item_update', ('http://a', 100, 99)),
+                           ('list_item_update', ('http://b', 100, 99)),
+                           ('list_update', (1000, 10, 99))])
+
+    def test1_order_preserved(self):
+        recorder = Recorder()
+        bus = ProgressEventBus(recorder.deliver, frame_rate=0.01)
+        bus.dispatch()
+        bus.post('list_item_update', 'http://a', 100, 10)
+        bus.post('list_item_finished', 'http://a')
+        bus.post('list_item_update', 'http://a', 100, 0)
+        bus.post('list_item_update', 'http://a', 100, 20)
+        bus.dispatch()
+        self.assertEquals(recorder.batches[0],
+                          [('list_item_update', ('http://a', 100, 10)),
+                           ('list_item_finished', ('http://a',)),
+                           ('list_item_update', ('http://a', 100, 20))])
+
+    def test2_urgent(self):
+        recorder = Recorder()
+        bus = ProgressEventBus(recorder.deliver, frame_rate=0.01)
+        bus.dispatch()
+        bus.post('list_update', 1000, 10, 50)
+        self.failIf(recorder.batches)
+        bus.post('list_finished')
+        self.assertEquals(recorder.batches,
+                          [[('list_update', (1000, 10, 50)),
+                            ('list_finished', ())]])
+        self.failIf(bus.has_pending())
+
+    def test3_schedule(self):
+        recorder = Recorder()
+        bus = ProgressEventBus(recorder.deliver, frame_rate=10,
+                               schedule=recorder.schedule)
+        bus.post('cache_update', 1)
+        bus.post('cache_update', 2)
+        # A single dispatch is scheduled per frame.
+        self.assertEquals(len(recorder.scheduled), 1)
+        self.failIf(recorder.batches)
+        bus.post('cache_failed', 'error')
+        self.assertEquals(len(recorder.scheduled), 2)
+        delay, func = recorder.scheduled[1]
+        self.assertEquals(delay, 0.0)
+        func()
+        self.assertEquals(recorder.batches,
+                          [[('cache_update', (2,)),
+                            ('cache_failed', ('error',))]])
+
+        bus.post('cache_update', 3)
+        delay, func = recorder.scheduled[2]
+        self.failUnless(0.0 < delay <= 0.1)
+
+ProgressEventBusSuite = loader.loadTestsFromTestCase(ProgressEventBusCase)
@@ -0,0 +1,163 @@
+# tests/Util/loader.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+import unittest
+
+loader = unittest.TestLoader()
+
+import os
+import shutil
+import sys
+import tempfile
+from StringIO import StringIO
+
+from generate_manifests import LOADER_CLASSES, write_manifests
+from UpdateManager.Util.loader import LoaderBase, InvalidImplementationName
+from UpdateManager.Util.loader import MANIFEST_MODULE
+
+PACKAGE = 'umloadertest'
+
+INIT_SOURCE = """
+class PluginBase(object):
+    pass
+"""
+
+MODULE_SOURCE = """
+from umloadertest import PluginBase
+
+class %sPlugin(PluginBase):
+    pass
+"""
+
+class LoaderCase(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._pkgdir = os.path.join(self._tmpdir, PACKAGE)
+        os.mkdir(self._pkgdir)
+        self._write('__init__', INIT_SOURCE)
+        self._write('First', MODULE_SOURCE % ('First'))
+        self._write('Second', MODULE_SOURCE % ('Second'))
+        sys.path.insert(0, self._tmpdir)
+
+    def tearDown(self):
+        sys.path.remove(self._tmpdir)
+        self._unload()
+        shutil.rmtree(self._tmpdir)
+
+    def _write(self, name, source):
+        path = os.path.join(self._pkgdir, '%s.py' % (name))
+        f = open(path, 'w')
+        f.write(source)
+        f.close()
+        # Byte-code written within the same second would be reused.
+        if os.path.exists(path + 'c'):
+            os.unlink(path + 'c')
+
+    def _unload(self):
+        for name in sys.modules.keys():
+            if name == PACKAGE or name.startswith(PACKAGE + '.'):
+                del sys.modules[name]
+
+    def _loader(self):
+        base = __import__(PACKAGE).PluginBase
+        pkgdir = self._pkgdir
+
+        class PluginLoader(LoaderBase):
+            def __init__(self):
+                LoaderBase.__init__(self, PACKAGE, base, pkgdir)
+        return PluginLoader()
+
+    def _write_manifest(self):
+        self._loader().write_manifest()
+        self._unload()
+
+    def test0_scan(self):
+        plugin_loader = self._loader()
+        implementations = plugin_loader.get_implementations()
+        implementations.sort()
+        self.failUnless(implementations == ['First', 'Second'])
+        self.failUnless(plugin_loader.get_class('First').__name__ ==
+                        'FirstPlugin')
+        self.failUnlessRaises(InvalidImplementationName,
+                              plugin_loader.get_class, 'Third')
+
+    def test1_manifest(self):
+        self._write_manifest()
+        plugin_loader = self._loader()
+        implementations = plugin_loader.get_implementations()
+        implementations.sort()
+        self.failUnless(implementations == ['First', 'Second'])
+        self.failUnless(plugin_loader.get_class('Second').__name__ ==
+                        'SecondPlugin')
+        # Only the selected implementation has been imported.
+        self.failIf(sys.modules.has_key('%s.First' % (PACKAGE)))
+
+    def test2_stale_manifest(self):
+        self._write_manifest()
+        self._write('Third', MODULE_SOURCE % ('Third'))
+        plugin_loader = self._loader()
+        self.failUnless(plugin_loader.get_class('Third').__name__ ==
+                        'ThirdPlugin')
+
+    def test3_invalid_entry(self):
+        self._write_manifest()
+        # Same modules, but the class has been renamed.
+        self._write('First', MODULE_SOURCE % ('Renamed'))
+        plugin_loader = self._loader()
+        self.failUnless(plugin_loader.get_class('Renamed').__name__ ==
+                        'RenamedPlugin')
+        self.failUnlessRaises(InvalidImplementationName,
+                              plugin_loader.get_class, 'First')
+
+    def test4_missing_module(self):
+        # Binary packages may only ship some of the modules.
+        self._write_manifest()
+        os.unlink(os.path.join(self._pkgdir, 'First.py'))
+        plugin_loader = self._loader()
+        self.failUnless(plugin_loader.get_implementations() == ['Second'])
+        self.failIf(plugin_loader._scanned)
+
+    def test5_build_manifests(self):
+        # build_py has copied the packages to the build directory.
+        for loader_class in LOADER_CLASSES:
+            package = loader_class.__module__.rsplit('.', 1)[0]
+            os.makedirs(os.path.join(self._tmpdir, *package.split('.')))
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            write_manifests(self._tmpdir)
+        finally:
+            sys.stdout = stdout
+        for loader_class in LOADER_CLASSES:
+            plugin_loader = loader_class()
+            path = os.path.join(self._tmpdir, *(
+                plugin_loader._module_prefix.split('.')
+                + ['%s.py' % (MANIFEST_MODULE)]))
+            manifest = {}
+            execfile(path, manifest)
+            modules = list(manifest['MODULES'])
+            modules.sort()
+            self.failUnless(modules == plugin_loader._list_modules())
+            for name in manifest['IMPLEMENTATIONS'].keys():
+                self.failUnless(plugin_loader.get_class(name))
+
+LoaderSuite = loader.loadTestsFromTestCase(LoaderCase)
@@ -25,7 +25,10 @@ loader = unittest.TestLoader()
 
 from UpdateManager.Util import lsb
 
+import os
+import shutil
 import subprocess
+import tempfile
 
 class LSBCase(unittest.TestCase):
     def test0_dist_name(self):
@@ -45,6 +48,67 @@ class LSBCase(unittest.TestCase):
 
     def test3_invalid_call(self):
         self.assertRaises(lsb.LSBError, lsb._invoke_lsb_release, '-Z')
+
+class ReleaseFileCase(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _write(self, name, content):
+        path = os.path.join(self._tmpdir, name)
+        f = open(path, 'w')
+        f.write(content)
+        f.close()
+        return path
+
+    def _read(self, os_release='', lsb_release='', debian_version=''):
+        return lsb.read_release_info(
+            (self._write('os-release', os_release),),
+            self._write('lsb-release', lsb_release),
+            self._write('debian_version', debian_version))
+
+    def test0_os_release(self):
+        info = self._read(os_release='# comment\n'
+                          'NAME="Debian GNU/Linux"\n'
+                          'ID=debian\n'
+                          "VERSION_ID='5.0'\n"
+                          'VERSION_CODENAME=lenny\n')
+        self.assertEqual(info, {'name': 'Debian', 'release': '5.0',
+                                'codename': 'lenny'})
+
+    def test1_name_capitalization(self):
+        info = self._read(os_release='NAME="Ubuntu"\nID=ubuntu\n')
+        self.assertEqual(info['name'], 'Ubuntu')
+        info = self._read(os_release='NAME="openSUSE"\nID=opensuse\n')
+        self.assertEqual(info['name'], 'openSUSE')
+
+    def test2_lsb_release_override(self):
+        info = self._read(os_release='ID=ubuntu\nVERSION_ID="9.04"\n',
+                          lsb_release='DISTRIB_ID=Ubuntu\n'
+                          'DISTRIB_RELEASE=9.10\n'
+                          'DISTRIB_CODENAME=karmic\n')
+        self.assertEqual(info, {'name': 'Ubuntu', 'release': '9.10',
+                                'codename': 'karmic'})
+
+    def test3_debian_version(self):
+        info = self._read(debian_version='squeeze/sid\n')
+        self.assertEqual(info, {'name': 'Debian', 'codename': 'squeeze'})
+        info = self._read(os_release='ID=debian\nVERSION_CODENAME=lenny\n',
+                          debian_version='5.0.3\n')
+        self.assertEqual(info, {'name': 'Debian', 'release': '5.0.3',
+                                'codename': 'lenny'})
+
+    def test4_missing_files(self):
+        self.assertEqual(lsb.read_release_info((), '/nonexistent',
+                                               '/nonexistent'), {})
+
+    def test5_memoized(self):
+        lsb.clear_cache()
+        name = lsb.get_distribution_name()
+        self.failUnless(lsb.get_distribution_name() is name)
                 
 
-LSBSuite = loader.loadTestsFromTestCase(LSBCase)
+LSBSuite = unittest.TestSuite([loader.loadTestsFromTestCase(LSBCase),
+                               loader.loadTestsFromTestCase(ReleaseFileCase)])
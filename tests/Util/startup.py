@@ -0,0 +1,80 @@
+# tests/Util/startup.py
+#
+#  Copyright (c) 2009 Canonical
+#                2009 Stephan Peijnik
+#
+#  Author: Stephan Peijnik <debian@sp.or.at>
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301,
+#  USA.
+
+import unittest
+
+loader = unittest.TestLoader()
+
+import threading
+
+from UpdateManager.Util.startup import StartupScheduler
+
+class StartupCase(unittest.TestCase):
+    def test0_run(self):
+        scheduler = StartupScheduler()
+        self.failUnless(scheduler.run('add', lambda a, b: a + b, 1, b=2) == 3)
+
+    def test1_start_wait(self):
+        scheduler = StartupScheduler()
+        event = threading.Event()
+
+        def background():
+            event.wait()
+            return 'done'
+
+        scheduler.start('background', background)
+        # The main thread phase runs while the background phase blocks.
+        scheduler.run('main', event.set)
+        self.failUnless(scheduler.wait('background') == 'done')
+
+        names = {}
+        for name, thread_name, start, end in scheduler.get_timeline():
+            names[name] = thread_name
+        self.failUnless(names['background'] == 'Startup-background')
+        self.failUnless(names['main'] == threading.currentThread().getName())
+
+    def test2_exception(self):
+        scheduler = StartupScheduler()
+
+        def fail():
+            raise ValueError('startup failed')
+
+        scheduler.start('fail', fail)
+        self.failUnlessRaises(ValueError, scheduler.wait, 'fail')
+        self.failUnlessRaises(ValueError, scheduler.run, 'fail-main', fail)
+
+    def test3_timeline(self):
+        scheduler = StartupScheduler()
+        scheduler.run('first', lambda: None)
+        scheduler.mark('window')
+        scheduler.run('second', lambda: None)
+        timeline = scheduler.get_timeline()
+        self.failUnless([entry[0] for entry in timeline]
+                        == ['first', 'window', 'second'])
+        self.failUnless(timeline[1][1] is None)
+        for name, thread_name, start, end in timeline:
+            self.failUnless(end >= start)
+        text = scheduler.format_timeline()
+        for name in ('first', 'window', 'second'):
+            self.failUnless(name in text)
+
+StartupSuite = loader.loadTestsFromTestCase(StartupCase)
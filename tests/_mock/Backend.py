@@ -21,13 +21,14 @@
 #  USA.
 
 from tests._mock import MockGenerator
-from UpdateManager.Backend import BackendBase
+from UpdateManager.Backend import BackendBase, UpdateSummary
 
 class MockBackendGenerator(MockGenerator):
     def __init__(self, *init_args, **init_kwargs):
         MockGenerator.__init__(self, BackendBase, *init_args, **init_kwargs)
         self._requires_root = False
         self._is_locked = False
+        self._update_summary = UpdateSummary({}, 0, 0)
 
     def _override__init_backend(self, application):
         self._app = application
@@ -43,3 +44,9 @@ class MockBackendGenerator(MockGenerator):
 
     def set_is_locked(self, value):
         self._is_locked = value
+
+    def _override__get_update_summary(self, dist_upgrade=True):
+        return self._update_summary
+
+    def set_update_summary(self, summary):
+        self._update_summary = summary
@@ -22,7 +22,8 @@
 
 from tests._mock import MockGenerator
 from UpdateManager.DistSpecific import DistBase
-from UpdateManager.DistSpecific.changelog import ChangelogFetcher
+from UpdateManager.DistSpecific.changelog import ChangelogFetcher, \
+     ChangelogFetcherException
 
 class MockChangelogFetcherGenerator(MockGenerator):
     def __init__(self, *init_args, **init_kwargs):
@@ -30,7 +31,7 @@ class MockChangelogFetcherGenerator(MockGenerator):
                                **init_kwargs)
 
     def _override__do_fetch(self):
-        self._handler.changelog_failure(self._pkg_info, exc.message)
+        raise ChangelogFetcherException("Mock changelog fetcher")
 
 class MockDistGenerator(MockGenerator):
     def __init__(self, *init_args, **init_kwargs):